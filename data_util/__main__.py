@@ -1,27 +1,61 @@
 """A tool to copy tasks from passes in CS:MOC."""
 
-import click
-
-from data_util.create_actor_messages import queue_person_create
-from data_util.create_reference_message import queue_create
-
-from .create_db_records import db_create
-
+import os
 
-@click.group()
+import click
+from dotenv import dotenv_values
+
+from data_util.lazy_group import LazyGroup
+from data_util.logging_config import CONSOLE_ONLY, LOG_LEVELS, configure_logging
+
+# Each command's module is only imported when the command runs, so --help and cron
+# invocations do not pay for pika, Faker and SQLAlchemy imports they do not use
+UTILITY_COMMANDS = {
+    "db-create": ("data_util.create_db_records:db_create", "Create records in the Kantin database."),
+    "queue-create": ("data_util.create_reference_message:queue_create", "Publish messages for a specific model type."),
+    "queue-person-create": (
+        "data_util.create_actor_messages:queue_person_create",
+        "Publish messages for a specific model type.",
+    ),
+    "queue-replay": ("data_util.replay_messages:queue_replay", "Publish the messages of a pre-generated file."),
+    "queue-measure": (
+        "data_util.measure_messages:queue_measure",
+        "Measure the end-to-end latency, gaps and duplicates of stamped messages.",
+    ),
+    "export": ("data_util.export:export", "Export generated records to a file."),
+    "bench": ("data_util.bench:bench", "Measure the throughput of each pipeline stage."),
+}
+
+
+@click.group(cls=LazyGroup, lazy_commands=UTILITY_COMMANDS)
 def utility() -> None:
     """Command group"""
 
 
 @click.group()
-def cli() -> None:
+@click.option(
+    "--log-level",
+    type=click.Choice(LOG_LEVELS, case_sensitive=False),
+    default=None,
+    help="Lowest level logged (defaults to $LOG_LEVEL, then INFO).",
+)
+@click.option(
+    "--log-file",
+    default=None,
+    help=f"File logged to besides the console, or {CONSOLE_ONLY} for the console only "
+    "(defaults to $LOG_FILE, then utility.log).",
+)
+def cli(log_level: str, log_file: str) -> None:
     """Command group"""
+    # Commands only load the .env file once they run, after logging is set up, so read its
+    # logging settings here. Environment variables still take precedence over the file.
+    settings = dotenv_values()
+    configure_logging(
+        log_level or os.getenv("LOG_LEVEL") or settings.get("LOG_LEVEL"),
+        log_file or os.getenv("LOG_FILE") or settings.get("LOG_FILE"),
+    )
 
 
-utility.add_command(db_create)
-utility.add_command(queue_create)
-utility.add_command(queue_person_create)
-
 cli.add_command(utility)
 
 
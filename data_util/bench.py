@@ -0,0 +1,380 @@
+"""Throughput benchmarks for each stage of the seeding and publishing pipelines."""
+
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator
+
+import click
+from dotenv import load_dotenv
+from faker import Faker
+
+from data_util.connections.rabbit_connection import close_connection_pool, get_connection_pool
+from data_util.generators import (
+    DEFAULT_VALUE_POOL_SIZE,
+    GENERATOR_BATCH,
+    GENERATOR_FAKER,
+    MODEL_FRANCHISES,
+    MODEL_LABELS,
+    NATURAL_KEYS,
+    BatchRecordGenerator,
+    generate_records,
+)
+from data_util.instrumentation import STAGE_GENERATE, STAGE_INSERT, STAGE_PUBLISH, STAGE_SERIALIZE
+from data_util.model.data_operations import copy_rows, dispose_engines, get_engine, insert_batches
+from data_util.model.kantin_models import Base, Franchise
+from data_util.queue_publishing import publish_records
+from data_util.serializers import SERIALIZERS, get_serializer
+from data_util.uniqueness import suffixed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BENCH_COUNT = 10000
+DEFAULT_ROUNDS = 3
+DEFAULT_INSERT_BATCH_SIZE = 1000
+# A stage counts as regressed when its best rate drops by more than this fraction
+DEFAULT_TOLERANCE = 0.2
+
+# Pipeline stages bench can measure
+STAGES = (STAGE_GENERATE, STAGE_SERIALIZE, STAGE_PUBLISH, STAGE_INSERT)
+
+
+@dataclass(frozen=True)
+class BenchResult:
+    """Timings of one benchmark over several rounds of count items."""
+
+    name: str
+    count: int
+    rounds: int
+    best: float
+    mean: float
+
+    @property
+    def rate(self) -> float:
+        """Items per second in the fastest round."""
+        return self.count / self.best if self.best else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        """The result as written to the JSON report."""
+        return {**asdict(self), "rate": self.rate}
+
+
+class StubChannel:
+    """An in-memory channel that accepts publishes without a broker."""
+
+    def __init__(self):
+        self.published = 0
+
+    def basic_publish(self, exchange: str, routing_key: str, body: bytes, properties: Any = None) -> None:
+        self.published += 1
+
+
+def consume(items: Iterator[Any]) -> None:
+    """Exhaust an iterator without keeping its items."""
+    deque(items, maxlen=0)
+
+
+def run_benchmark(name: str, func: Callable[[], Any], count: int, rounds: int = DEFAULT_ROUNDS) -> BenchResult:
+    """Time func over several rounds, log the best rate and return the timings."""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    result = BenchResult(name, count, rounds, min(timings), sum(timings) / rounds)
+    logger.info("%s: %.0f items/s (best %.4fs, mean %.4fs)", name, result.rate, result.best, result.mean)
+    return result
+
+
+def _seeded_faker(seed: int) -> Faker:
+    faker = Faker()
+    faker.seed_instance(seed)
+    return faker
+
+
+def _bench_generation(count: int, rounds: int, seed: int) -> Iterator[BenchResult]:
+    for model in MODEL_LABELS:
+        for generator in (GENERATOR_FAKER, GENERATOR_BATCH):
+            faker = _seeded_faker(seed)
+            batch_generator = None
+            if generator == GENERATOR_BATCH:
+                # Pools larger than a round would only add setup time; build them outside the timed rounds
+                batch_generator = BatchRecordGenerator(faker, min(count, DEFAULT_VALUE_POOL_SIZE))
+                batch_generator.generate(model, 1)
+            yield run_benchmark(
+                f"{STAGE_GENERATE}:{model}:{generator}",
+                lambda m=model, b=batch_generator, f=faker: consume(generate_records(m, count, f, b)),
+                count,
+                rounds,
+            )
+
+
+def _bench_serialization(records: list[dict[str, str]], rounds: int) -> Iterator[BenchResult]:
+    for name in SERIALIZERS:
+        try:
+            dumps = get_serializer(name).dumps
+        except ValueError as e:
+            logger.info("Skipping %s:%s: %s", STAGE_SERIALIZE, name, e)
+            continue
+        yield run_benchmark(
+            f"{STAGE_SERIALIZE}:{name}",
+            lambda d=dumps: consume(map(d, records)),
+            len(records),
+            rounds,
+        )
+
+
+def _bench_publishing(records: list[dict[str, str]], rounds: int, broker: bool) -> Iterator[BenchResult]:
+    serializer = get_serializer(SERIALIZERS[0])
+    channel = StubChannel()
+    yield run_benchmark(
+        f"{STAGE_PUBLISH}:stub",
+        lambda: publish_records(channel, MODEL_FRANCHISES, records, "bench", serializer),
+        len(records),
+        rounds,
+    )
+    if not broker:
+        return
+    try:
+        channel = get_connection_pool().channel(os.getenv("EXCHANGE"))
+        yield run_benchmark(
+            f"{STAGE_PUBLISH}:broker",
+            lambda: publish_records(channel, MODEL_FRANCHISES, records, os.getenv("EXCHANGE"), serializer),
+            len(records),
+            rounds,
+        )
+    finally:
+        close_connection_pool()
+
+
+def _round_rows(records: list[dict[str, str]], rounds: int) -> list[list[dict[str, str]]]:
+    """Copy the records for each round, with franchise names unique by round and record index."""
+    key, max_length = NATURAL_KEYS[MODEL_FRANCHISES]
+    return [
+        [
+            {**record, key: suffixed(record[key], f"r{number}.{index}", max_length)}
+            for index, record in enumerate(records)
+        ]
+        for number in range(rounds)
+    ]
+
+
+def _bench_inserts(
+    records: list[dict[str, str]],
+    rounds: int,
+    batch_size: int,
+    database_uri: str = None,
+) -> Iterator[BenchResult]:
+    # franchise_name is unique, so every round inserts rows with keys of its own, built before timing
+    table = Franchise.__table__
+    round_rows = _round_rows(records, rounds)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = get_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(engine, tables=[table])
+        try:
+            yield run_benchmark(
+                f"{STAGE_INSERT}:sqlite",
+                lambda rows=iter(round_rows): insert_batches(engine, table, iter(next(rows)), batch_size),
+                len(records),
+                rounds,
+            )
+        finally:
+            dispose_engines()
+
+    if not database_uri:
+        return
+    # Runs against a real database roll back so benchmarking leaves no rows behind
+    engine = get_engine(database_uri)
+    try:
+        yield run_benchmark(
+            f"{STAGE_INSERT}:{engine.dialect.name}",
+            lambda rows=iter(round_rows): insert_batches(engine, table, iter(next(rows)), batch_size, commit=False),
+            len(records),
+            rounds,
+        )
+        if engine.dialect.name == "postgresql":
+            now = datetime.now(timezone.utc)
+            copies = [[{**row, "created_on": now, "modified_on": now} for row in rows] for rows in round_rows]
+            yield run_benchmark(
+                f"{STAGE_INSERT}:postgresql-copy",
+                lambda rows=iter(copies): copy_rows(engine, table, iter(next(rows)), commit=False),
+                len(records),
+                rounds,
+            )
+    finally:
+        dispose_engines()
+
+
+def compare_results(results: list[dict[str, Any]], baseline: list[dict[str, Any]], tolerance: float) -> list[str]:
+    """Log each stage's change against a baseline report and return the names of regressed stages."""
+    baseline_rates = {result["name"]: result["rate"] for result in baseline}
+    regressed = []
+    for result in results:
+        previous = baseline_rates.get(result["name"])
+        if not previous:
+            continue
+        change = result["rate"] / previous - 1
+        if change < -tolerance:
+            regressed.append(result["name"])
+            logger.warning(
+                "%s regressed by %.1f%% (%.0f -> %.0f items/s)", result["name"], -change * 100, previous, result["rate"]
+            )
+        else:
+            logger.info("%s changed by %+.1f%%", result["name"], change * 100)
+    return regressed
+
+
+@click.command()
+@click.option(
+    "--config-file",
+    "-c",
+    default=None,
+    help="Choose a config file to load environment variables from.",
+)
+@click.option(
+    "--count",
+    "-n",
+    type=click.IntRange(min=1),
+    default=DEFAULT_BENCH_COUNT,
+    help="Number of items processed by each benchmark round.",
+)
+@click.option(
+    "--rounds",
+    "-r",
+    type=click.IntRange(min=1),
+    default=DEFAULT_ROUNDS,
+    help="Number of timed rounds per benchmark; the fastest is reported.",
+)
+@click.option(
+    "--stage",
+    "stages",
+    type=click.Choice(STAGES),
+    multiple=True,
+    help="Only run these stages (repeatable). All stages run by default.",
+)
+@click.option(
+    "--seed",
+    type=int,
+    default=0,
+    help="Seed for the fake data generators.",
+)
+@click.option(
+    "--batch-size",
+    "-b",
+    type=click.IntRange(min=1),
+    default=DEFAULT_INSERT_BATCH_SIZE,
+    help="Rows per INSERT batch in the insert stage.",
+)
+@click.option(
+    "--broker/--no-broker",
+    default=False,
+    help="Also publish to the RabbitMQ broker from the config file.",
+)
+@click.option(
+    "--database-uri",
+    default=None,
+    help="Also insert into this database (COPY as well for PostgreSQL). Changes are rolled back.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write the results as JSON to this file.",
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Compare against the JSON results of an earlier run and fail on regressions.",
+)
+@click.option(
+    "--tolerance",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_TOLERANCE,
+    help="Fraction a stage's rate may drop below the baseline before it counts as regressed.",
+)
+def bench(  # noqa: PLR0913
+    config_file: str,
+    count: int,
+    rounds: int,
+    stages: tuple[str, ...],
+    seed: int,
+    batch_size: int,
+    broker: bool,
+    database_uri: str,
+    output: str,
+    baseline: str,
+    tolerance: float,
+) -> None:
+    """
+    Measure the throughput of each pipeline stage.
+
+    Usage:
+    bench [OPTIONS]
+
+    Stages:
+    - generate: records per model with the faker and batch generators
+    - serialize: franchise records with each installed serializer
+    - publish: franchise messages to an in-memory channel (and a broker with --broker)
+    - insert: franchise rows into SQLite (and --database-uri)
+
+    Options:
+    -c, --config-file FILE Choose a config file to load environment variables from.
+    -n, --count N Number of items processed by each benchmark round.
+    -r, --rounds N Number of timed rounds per benchmark.
+    --stage STAGE Only run this stage (repeatable).
+    --seed N Seed for the fake data generators.
+    -b, --batch-size N Rows per INSERT batch.
+    --broker Also publish to the configured RabbitMQ broker.
+    --database-uri URI Also insert into this database.
+    -o, --output FILE Write the results as JSON.
+    --baseline FILE Compare against earlier JSON results and fail on regressions.
+    --tolerance FRACTION Allowed rate drop before a stage counts as regressed.
+    """
+    logger.info("Command: %s", " ".join(sys.argv))
+    if config_file:
+        load_dotenv(config_file)
+    else:
+        load_dotenv()
+
+    stages = stages or STAGES
+    results = []
+    if STAGE_GENERATE in stages:
+        results.extend(_bench_generation(count, rounds, seed))
+
+    records = list(generate_records(MODEL_FRANCHISES, count, _seeded_faker(seed)))
+    if STAGE_SERIALIZE in stages:
+        results.extend(_bench_serialization(records, rounds))
+    if STAGE_PUBLISH in stages:
+        results.extend(_bench_publishing(records, rounds, broker))
+    if STAGE_INSERT in stages:
+        results.extend(_bench_inserts(records, rounds, batch_size, database_uri))
+
+    report = {
+        "created_on": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "count": count,
+        "rounds": rounds,
+        "seed": seed,
+        "results": [result.to_dict() for result in results],
+    }
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+        logger.info("Wrote %s benchmark results to %s", len(results), output)
+
+    if baseline:
+        with open(baseline, "r") as file:
+            regressed = compare_results(report["results"], json.load(file)["results"], tolerance)
+        if regressed:
+            logger.error("%s stages regressed: %s", len(regressed), ", ".join(regressed))
+            sys.exit(1)
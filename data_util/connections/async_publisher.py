@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import time
+from itertools import islice
+from typing import Iterator
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.exceptions import AMQPConnectionError
+
+from data_util.connections.rabbit_connection import (
+    DEFAULT_CONFIRM_TIMEOUT,
+    EXCHANGE_TYPE,
+    ConfirmTracker,
+    set_future_exception,
+    set_future_result,
+)
+from data_util.instrumentation import STAGE_PUBLISH, get_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNELS = 4
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_CHUNK_SIZE = 500
+# Publishers pause while more than this many bytes wait in the connection's write buffer
+WRITE_BUFFER_HIGH_WATER = 4 * 1024 * 1024
+WRITE_BUFFER_POLL_INTERVAL = 0.001
+
+# A message ready to publish: routing key, body and properties
+Message = tuple[str, bytes, pika.BasicProperties]
+
+
+class AsyncPublisher:
+    """
+    Publish messages over several channels of one pika AsyncioConnection.
+
+    Messages are generated in chunks on a worker thread while the event loop publishes the
+    previous chunks, so generation and network I/O overlap. A bounded queue between them
+    applies backpressure to generation, and publishing pauses while the connection's write
+    buffer is above WRITE_BUFFER_HIGH_WATER or the broker has blocked the connection.
+    With confirm_window set, each channel uses publisher confirms and keeps at most that
+    many messages unconfirmed. When the connection closes while messages are published or
+    unconfirmed, publish raises AMQPConnectionError.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        parameters: pika.ConnectionParameters,
+        exchange: str,
+        channel_count: int = DEFAULT_CHANNELS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        confirm_window: int = 0,
+    ):
+        self.parameters = parameters
+        self.exchange = exchange
+        self.channel_count = channel_count
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.confirm_window = confirm_window
+        self.connection = None
+        self.channels = []
+        self.trackers = []
+        self._closed = None
+        self._close_reason = None
+        self._unblocked = None
+        self._confirmed = None
+
+    async def open(self) -> None:
+        """Open the connection and channels, and declare the exchange."""
+        loop = asyncio.get_running_loop()
+        self._unblocked = asyncio.Event()
+        self._unblocked.set()
+        self._confirmed = asyncio.Event()
+        self._closed = loop.create_future()
+        self._close_reason = None
+
+        opened = loop.create_future()
+        self.connection = AsyncioConnection(
+            self.parameters,
+            on_open_callback=lambda connection: set_future_result(opened, connection),
+            on_open_error_callback=lambda _connection, error: set_future_exception(opened, error),
+            on_close_callback=self._on_connection_closed,
+            custom_ioloop=loop,
+        )
+        await opened
+        self.connection.add_on_connection_blocked_callback(lambda *_: self._unblocked.clear())
+        self.connection.add_on_connection_unblocked_callback(lambda *_: self._unblocked.set())
+
+        for _ in range(self.channel_count):
+            channel_opened = loop.create_future()
+            self.connection.channel(on_open_callback=lambda channel, f=channel_opened: set_future_result(f, channel))
+            channel = await channel_opened
+            tracker = ConfirmTracker()
+            if self.confirm_window:
+                selected = loop.create_future()
+                channel.confirm_delivery(
+                    ack_nack_callback=lambda frame, t=tracker: self._on_confirm(t, frame),
+                    callback=lambda frame, f=selected: set_future_result(f, frame),
+                )
+                await selected
+            self.channels.append(channel)
+            self.trackers.append(tracker)
+
+        declared = loop.create_future()
+        self.channels[0].exchange_declare(
+            exchange=self.exchange,
+            exchange_type=EXCHANGE_TYPE,
+            durable=True,
+            callback=lambda frame: set_future_result(declared, frame),
+        )
+        await declared
+
+    def _on_connection_closed(self, _connection: AsyncioConnection, reason: BaseException) -> None:
+        self._close_reason = reason
+        if self._closed is not None:
+            set_future_result(self._closed, reason)
+        # Wake publishers waiting for confirms or an unblock, which then raise
+        if self._confirmed is not None:
+            self._confirmed.set()
+            self._unblocked.set()
+
+    def _check_open(self) -> None:
+        if self._close_reason is not None:
+            unconfirmed = sum(tracker.in_flight for tracker in self.trackers)
+            raise AMQPConnectionError(
+                f"Connection closed with {unconfirmed} messages unconfirmed: {self._close_reason!r}"
+            )
+
+    def _on_confirm(self, tracker: ConfirmTracker, frame: pika.frame.Method) -> None:
+        method = frame.method
+        tracker.on_confirm(method.delivery_tag, method.multiple, isinstance(method, pika.spec.Basic.Ack))
+        self._confirmed.set()
+
+    def _write_buffer_size(self) -> int:
+        # pika does not expose the transport's buffer size on AsyncioConnection
+        transport = getattr(self.connection, "_transport", None)
+        return transport.get_write_buffer_size() if transport is not None else 0
+
+    async def close(self) -> None:
+        """Close the channels and the connection."""
+        if self.connection is None or self.connection.is_closed:
+            return
+        if not self.connection.is_closing:
+            self.connection.close()
+        await self._closed
+
+    async def __aenter__(self) -> "AsyncPublisher":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def publish(self, messages: Iterator[Message]) -> int:
+        """
+        Publish every message from an iterator and return the number published.
+
+        The iterator is consumed on a worker thread in chunks of chunk_size.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[list[Message] | None] = asyncio.Queue(maxsize=max(1, self.queue_size // self.chunk_size))
+
+        async def produce() -> None:
+            try:
+                while chunk := await loop.run_in_executor(None, lambda: list(islice(messages, self.chunk_size))):
+                    await queue.put(chunk)
+            finally:
+                for _ in self.channels:
+                    await queue.put(None)
+
+        started = time.perf_counter()
+        counts = await asyncio.gather(
+            produce(),
+            *(
+                self._publish_from_queue(channel, tracker, queue)
+                for channel, tracker in zip(self.channels, self.trackers)
+            ),
+        )
+        published = sum(counts[1:])
+        if self.confirm_window:
+            try:
+                await asyncio.wait_for(self._wait_for_confirms(), DEFAULT_CONFIRM_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Timed out with %s messages unconfirmed", sum(t.in_flight for t in self.trackers))
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Published %s messages on %s channels in %.2fs (%.0f msg/s)",
+            published,
+            len(self.channels),
+            elapsed,
+            published / elapsed if elapsed else 0,
+        )
+        return published
+
+    async def _publish_from_queue(
+        self,
+        channel: pika.channel.Channel,
+        tracker: ConfirmTracker,
+        queue: asyncio.Queue,
+    ) -> int:
+        stats = get_stats()
+        published = 0
+        while (chunk := await queue.get()) is not None:
+            started = time.perf_counter()
+            for routing_key, body, properties in chunk:
+                await self._wait_until_writable(tracker)
+                channel.basic_publish(self.exchange, routing_key, body, properties)
+                tracker.on_publish()
+                published += 1
+            # Let the event loop write the chunk out before taking the next one
+            await asyncio.sleep(0)
+            stats.record(STAGE_PUBLISH, len(chunk), time.perf_counter() - started)
+        return published
+
+    async def _wait_until_writable(self, tracker: ConfirmTracker) -> None:
+        await self._unblocked.wait()
+        self._check_open()
+        while self._write_buffer_size() > WRITE_BUFFER_HIGH_WATER:
+            await asyncio.sleep(WRITE_BUFFER_POLL_INTERVAL)
+            self._check_open()
+        while self.confirm_window and tracker.in_flight >= self.confirm_window:
+            self._check_open()
+            self._confirmed.clear()
+            await self._confirmed.wait()
+
+    async def _wait_for_confirms(self) -> None:
+        while any(tracker.in_flight for tracker in self.trackers):
+            self._check_open()
+            self._confirmed.clear()
+            await self._confirmed.wait()
+
+    def log_summary(self) -> None:
+        """Log the confirmed and failed counts across all channels."""
+        published = sum(tracker.published for tracker in self.trackers)
+        confirmed = sum(tracker.confirmed for tracker in self.trackers)
+        failed = sum(tracker.failed for tracker in self.trackers)
+        level = logging.WARNING if failed else logging.INFO
+        logger.log(level, "Confirmed %s of %s messages (%s failed)", confirmed, published, failed)
+
+
+def publish_messages(  # noqa: PLR0913
+    messages: Iterator[Message],
+    exchange: str,
+    parameters: pika.ConnectionParameters,
+    channel_count: int = DEFAULT_CHANNELS,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    confirm_window: int = 0,
+) -> int:
+    """Open an AsyncPublisher, publish every message and close it again."""
+
+    async def run() -> int:
+        async with AsyncPublisher(
+            parameters,
+            exchange,
+            channel_count=channel_count,
+            queue_size=queue_size,
+            confirm_window=confirm_window,
+        ) as publisher:
+            published = await publisher.publish(messages)
+            if confirm_window:
+                publisher.log_summary()
+            return published
+
+    return asyncio.run(run())
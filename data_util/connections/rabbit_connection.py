@@ -1,15 +1,150 @@
+import asyncio
 import logging
 import os
+import threading
+import time
+from functools import partial
 
 import pika
 from dotenv import load_dotenv
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.adapters.blocking_connection import BlockingChannel
+from pika.exceptions import AMQPConnectionError
+
+from data_util.runs import DEFAULT_CHECKPOINT_INTERVAL, record_checkpoint
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CONFIRM_WINDOW = 1000
+DEFAULT_CONFIRM_TIMEOUT = 30.0
+EXCHANGE_TYPE = "topic"
+RABBITMQ_PORT = 5672
+DEFAULT_HEARTBEAT = 60
+
+# Headers of stamped messages: the run's seed, the message's index in the run and its
+# publish time in nanoseconds since the epoch
+HEADER_RUN = "x-run"
+HEADER_SEQUENCE = "x-sequence"
+HEADER_PUBLISHED_AT = "x-published-at"
+
+
+def get_connection_parameters(heartbeat: int = None) -> pika.ConnectionParameters:
+    """
+    Build RabbitMQ connection parameters from the RABBITMQ_* environment variables.
+
+    The heartbeat interval in seconds falls back to RABBITMQ_HEARTBEAT, then DEFAULT_HEARTBEAT.
+    """
+    if heartbeat is None:
+        heartbeat = int(os.getenv("RABBITMQ_HEARTBEAT", DEFAULT_HEARTBEAT))
+    return pika.ConnectionParameters(
+        host=os.getenv("RABBITMQ_HOST"),
+        port=RABBITMQ_PORT,
+        credentials=pika.PlainCredentials(os.getenv("RABBITMQ_USERNAME"), os.getenv("RABBITMQ_PASSWORD")),
+        heartbeat=heartbeat,
+    )
+
+
+class RabbitConnectionPool:
+    """
+    Hand out channels on a small set of shared blocking connections.
+
+    Connections are opened lazily, up to max_connections, and channels are spread over them
+    round-robin. Released channels are reused, and each exchange is declared only once per
+    pool. Blocking connections only answer heartbeats while pika processes I/O, so idle
+    waits between publishes should go through sleep() rather than time.sleep().
+    The pool can be used as a context manager, which closes every channel and connection.
+    """
+
+    def __init__(self, parameters: pika.ConnectionParameters = None, max_connections: int = 1):
+        self.parameters = parameters
+        self.max_connections = max_connections
+        self._connections: list[pika.BlockingConnection] = []
+        self._idle_channels: list[BlockingChannel] = []
+        self._declared_exchanges: set[str] = set()
+        self._next_connection = 0
+
+    def __enter__(self) -> "RabbitConnectionPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _connection(self) -> pika.BlockingConnection:
+        self._connections = [connection for connection in self._connections if connection.is_open]
+        if len(self._connections) < self.max_connections:
+            parameters = self.parameters if self.parameters is not None else get_connection_parameters()
+            self._connections.append(pika.BlockingConnection(parameters))
+            return self._connections[-1]
+
+        connection = self._connections[self._next_connection % len(self._connections)]
+        self._next_connection += 1
+        return connection
+
+    def channel(self, exchange: str = None) -> BlockingChannel:
+        """Return an open channel, declaring the exchange first if this pool has not yet."""
+        while self._idle_channels:
+            channel = self._idle_channels.pop()
+            if channel.is_open:
+                break
+        else:
+            channel = self._connection().channel()
+
+        if exchange and exchange not in self._declared_exchanges:
+            channel.exchange_declare(exchange=exchange, exchange_type=EXCHANGE_TYPE, durable=True)
+            self._declared_exchanges.add(exchange)
+        return channel
+
+    def release(self, channel: BlockingChannel) -> None:
+        """Return a channel to the pool for reuse."""
+        if channel.is_open:
+            self._idle_channels.append(channel)
+
+    def sleep(self, seconds: float) -> None:
+        """Wait while keeping heartbeats flowing on every pooled connection."""
+        if not self._connections:
+            time.sleep(seconds)
+            return
+        deadline = time.monotonic() + seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            for connection in self._connections:
+                connection.process_data_events(time_limit=0)
+            self._connections[0].sleep(min(remaining, 1))
+
+    def close(self) -> None:
+        """Close every channel and connection held by the pool."""
+        for connection in self._connections:
+            if connection.is_open:
+                try:
+                    connection.close()
+                except pika.exceptions.AMQPError as e:
+                    logger.warning("Failed to close RabbitMQ connection: %s", e)
+        self._connections.clear()
+        self._idle_channels.clear()
+        self._declared_exchanges.clear()
+
+
+_pool: RabbitConnectionPool = None
+
+
+def get_connection_pool() -> RabbitConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool  # noqa: PLW0603
+    if _pool is None:
+        _pool = RabbitConnectionPool()
+    return _pool
+
+
+def close_connection_pool() -> None:
+    """Close the process-wide connection pool, if one was created."""
+    global _pool  # noqa: PLW0603
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
 
 def publish_message_to_exchange(config_file: str = None) -> pika.channel.Channel:
     """
-    Establish a connection to a RabbitMQ server and declare an exchange.
+    Get a channel from the process-wide connection pool and declare an exchange.
 
     Parameters:
     config_file (str): The path to a .env file containing environment variables for the RabbitMQ server.
@@ -22,25 +157,348 @@ def publish_message_to_exchange(config_file: str = None) -> pika.channel.Channel
     else:
         load_dotenv()
 
-    username = os.getenv("RABBITMQ_USERNAME")
-    password = os.getenv("RABBITMQ_PASSWORD")
     exchange_name = os.getenv("ACTOR_EXCHANGE")
-    exchange_type = "topic"
-    port = 5672
-    host = os.getenv("RABBITMQ_HOST")
-    durable = True
 
     try:
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(
-                host=host,
-                port=port,
-                credentials=pika.PlainCredentials(username, password),
-            )
-        )
-        channel = connection.channel()
-        channel.exchange_declare(exchange=exchange_name, exchange_type=exchange_type, durable=durable)
-        return channel
+        return get_connection_pool().channel(exchange_name)
     except Exception as e:
         logger.error("Failed to connect to RabbitMQ: %s", e)
         raise
+
+
+class ConfirmTracker:
+    """Count publisher confirms for a channel's delivery tags, which the broker numbers from 1."""
+
+    def __init__(self):
+        self.published = 0
+        self.acked = 0
+        self.nacked = 0
+        self.returned = 0
+        self._outstanding: set[int] = set()
+        self._settled_up_to = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of published messages the broker has not confirmed yet."""
+        return len(self._outstanding)
+
+    @property
+    def confirmed(self) -> int:
+        """Number of messages acked by the broker and routed to at least one queue."""
+        return self.acked - self.returned
+
+    @property
+    def failed(self) -> int:
+        """Number of messages nacked by the broker or returned as unroutable."""
+        return self.nacked + self.returned
+
+    @property
+    def settled(self) -> int:
+        """Number of messages, in publish order, up to the first one the broker has not confirmed yet."""
+        return min(self._outstanding) - 1 if self._outstanding else self.published
+
+    def on_publish(self) -> int:
+        """Record a publish and return its delivery tag."""
+        self.published += 1
+        self._outstanding.add(self.published)
+        return self.published
+
+    def on_confirm(self, delivery_tag: int, multiple: bool, ack: bool) -> None:
+        """Settle one delivery tag, or every tag up to it when multiple is set."""
+        if multiple:
+            tags = range(self._settled_up_to + 1, delivery_tag + 1)
+            self._settled_up_to = max(self._settled_up_to, delivery_tag)
+        else:
+            tags = (delivery_tag,)
+
+        settled = 0
+        for tag in tags:
+            if tag in self._outstanding:
+                self._outstanding.remove(tag)
+                settled += 1
+
+        if ack:
+            self.acked += settled
+        else:
+            self.nacked += settled
+
+    def on_return(self) -> None:
+        """Record a mandatory message the broker could not route. Its ack still follows."""
+        self.returned += 1
+
+
+def set_future_result(future: asyncio.Future, result: object) -> None:
+    """Resolve a future from a pika callback, unless it is already done."""
+    if not future.done():
+        future.set_result(result)
+
+
+def set_future_exception(future: asyncio.Future, error: object) -> None:
+    """Fail a future from a pika error callback, which may pass an error message instead of an exception."""
+    if not future.done():
+        future.set_exception(error if isinstance(error, BaseException) else AMQPConnectionError(error))
+
+
+class ConfirmedPublisher:
+    """
+    Publish with publisher confirms and a window of unconfirmed messages, on a connection of its own.
+
+    BlockingChannel.confirm_delivery makes every basic_publish wait for its own confirm, and a
+    blocking channel has no public way to count confirms as they arrive. So the publisher runs an
+    AsyncioConnection on an event loop thread, which also answers heartbeats between publishes.
+    Confirms are counted by the channel's ack/nack callback, and basic_publish only waits once
+    window messages are unconfirmed. Messages are published as mandatory so unroutable ones come
+    back as returns. basic_publish takes the same arguments as a channel's, so the publisher can be
+    used wherever a channel is expected. Close it when done.
+    """
+
+    def __init__(
+        self,
+        exchange: str,
+        window: int = DEFAULT_CONFIRM_WINDOW,
+        timeout: float = DEFAULT_CONFIRM_TIMEOUT,
+        parameters: pika.ConnectionParameters = None,
+    ):
+        self.exchange = exchange
+        self.window = window
+        self.timeout = timeout
+        self.tracker = ConfirmTracker()
+        # Guards the tracker, which the event loop thread updates as confirms arrive
+        self._changed = threading.Condition()
+        self._close_reason = None
+        self._connection = None
+        self._channel = None
+        self._closed = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="confirmed-publisher", daemon=True)
+        self._thread.start()
+        try:
+            self._run(self._open(parameters if parameters is not None else get_connection_parameters()))
+        except BaseException:
+            self.close()
+            raise
+
+    def _run(self, coroutine) -> object:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(self.timeout)
+
+    async def _open(self, parameters: pika.ConnectionParameters) -> None:
+        loop = asyncio.get_running_loop()
+        self._closed = loop.create_future()
+        opened = loop.create_future()
+        self._connection = AsyncioConnection(
+            parameters,
+            on_open_callback=lambda connection: set_future_result(opened, connection),
+            on_open_error_callback=lambda _connection, error: set_future_exception(opened, error),
+            on_close_callback=self._on_connection_closed,
+            custom_ioloop=loop,
+        )
+        await opened
+
+        channel_opened = loop.create_future()
+        self._connection.channel(on_open_callback=lambda channel: set_future_result(channel_opened, channel))
+        channel = await channel_opened
+        channel.add_on_return_callback(self._on_return)
+        selected = loop.create_future()
+        channel.confirm_delivery(
+            ack_nack_callback=self._on_confirm, callback=lambda frame: set_future_result(selected, frame)
+        )
+        await selected
+        declared = loop.create_future()
+        channel.exchange_declare(
+            exchange=self.exchange,
+            exchange_type=EXCHANGE_TYPE,
+            durable=True,
+            callback=lambda frame: set_future_result(declared, frame),
+        )
+        await declared
+        self._channel = channel
+
+    def _on_confirm(self, frame: pika.frame.Method) -> None:
+        method = frame.method
+        with self._changed:
+            self.tracker.on_confirm(method.delivery_tag, method.multiple, isinstance(method, pika.spec.Basic.Ack))
+            self._changed.notify_all()
+
+    def _on_return(self, _channel, method: pika.spec.Basic.Return, _properties, _body: bytes) -> None:
+        logger.warning("Message returned by broker: %s %s", method.reply_code, method.reply_text)
+        with self._changed:
+            self.tracker.on_return()
+
+    def _on_connection_closed(self, _connection: AsyncioConnection, reason: BaseException) -> None:
+        with self._changed:
+            self._close_reason = reason
+            self._changed.notify_all()
+        if self._closed is not None:
+            set_future_result(self._closed, reason)
+
+    @property
+    def settled(self) -> int:
+        """Number of messages, in publish order, up to the first one the broker has not confirmed yet."""
+        with self._changed:
+            return self.tracker.settled
+
+    def basic_publish(
+        self,
+        exchange: str,
+        routing_key: str,
+        body: bytes,
+        properties: pika.BasicProperties = None,
+        mandatory: bool = True,
+    ) -> None:
+        """Publish a message, first waiting for confirms while the window is full."""
+        with self._changed:
+            if not self._changed.wait_for(
+                lambda: self.tracker.in_flight < self.window or self._close_reason is not None, self.timeout
+            ):
+                raise TimeoutError(f"No publisher confirms received for {self.timeout}s")
+            if self._close_reason is not None:
+                raise AMQPConnectionError(
+                    f"Connection closed with {self.tracker.in_flight} messages unconfirmed: {self._close_reason!r}"
+                )
+            # Track the tag first: the confirm can arrive as soon as the loop thread sends the frame
+            self.tracker.on_publish()
+        self._loop.call_soon_threadsafe(
+            partial(self._channel.basic_publish, exchange, routing_key, body, properties, mandatory)
+        )
+
+    def wait_for_confirms(self) -> ConfirmTracker:
+        """Wait up to the timeout for every outstanding confirm and return the tracker."""
+        with self._changed:
+            if not self._changed.wait_for(
+                lambda: self.tracker.in_flight == 0 or self._close_reason is not None, self.timeout
+            ):
+                logger.warning("Timed out with %s messages unconfirmed", self.tracker.in_flight)
+        return self.tracker
+
+    def log_summary(self) -> None:
+        """Log the confirmed and failed counts, as a warning when any message was not confirmed."""
+        tracker = self.tracker
+        level = logging.WARNING if tracker.failed or tracker.in_flight else logging.INFO
+        logger.log(
+            level,
+            "Confirmed %s of %s messages (%s nacked, %s returned, %s unconfirmed)",
+            tracker.confirmed,
+            tracker.published,
+            tracker.nacked,
+            tracker.returned,
+            tracker.in_flight,
+        )
+
+    async def _close_connection(self) -> None:
+        if self._connection is None or self._connection.is_closed:
+            return
+        if not self._connection.is_closing:
+            self._connection.close()
+        await self._closed
+
+    def close(self) -> None:
+        """Close the connection and stop the event loop thread."""
+        if self._loop.is_closed():
+            return
+        try:
+            self._run(self._close_connection())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def __enter__(self) -> "ConfirmedPublisher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CheckpointingPublisher:
+    """
+    Record a run's progress in its checkpoint file while publishing through a channel.
+
+    Progress is written every interval messages and by save. Through a ConfirmedPublisher it
+    only covers messages up to the first unconfirmed one; through a plain channel every
+    message handed to the channel counts, so a broken connection can lose a few that were
+    recorded. basic_publish takes the same arguments as the channel's.
+    """
+
+    def __init__(
+        self,
+        publisher: BlockingChannel | ConfirmedPublisher,
+        checkpoint: str,
+        start: int,
+        next_record: int = None,
+        interval: int = DEFAULT_CHECKPOINT_INTERVAL,
+    ):
+        self.publisher = publisher
+        self.checkpoint = checkpoint
+        self.start = start
+        # Where this publisher's messages begin within the part of the run starting at start
+        self.next_record = start if next_record is None else next_record
+        self.interval = interval
+        self.published = 0
+        self._saved = 0
+
+    @property
+    def completed(self) -> int:
+        """Number of this publisher's messages that count as done."""
+        settled = getattr(self.publisher, "settled", None)
+        return self.published if settled is None else settled
+
+    def basic_publish(self, *args, **kwargs) -> None:
+        """Publish a message, saving progress every interval messages."""
+        self.publisher.basic_publish(*args, **kwargs)
+        self.published += 1
+        if self.published % self.interval == 0:
+            self.save()
+
+    def save(self) -> None:
+        """Record the messages completed since the last save."""
+        completed = self.completed
+        if completed > self._saved:
+            record_checkpoint(self.checkpoint, self.start, self.next_record + completed)
+            self._saved = completed
+
+
+def stamp_properties(properties: pika.BasicProperties | None, run: int, sequence: int) -> pika.BasicProperties:
+    """Copy publish properties with a message's run, sequence number and the current time in its headers."""
+    properties = properties or pika.BasicProperties()
+    return pika.BasicProperties(
+        content_type=properties.content_type,
+        content_encoding=properties.content_encoding,
+        delivery_mode=properties.delivery_mode,
+        headers={
+            **(properties.headers or {}),
+            HEADER_RUN: run,
+            HEADER_SEQUENCE: sequence,
+            HEADER_PUBLISHED_AT: time.time_ns(),
+        },
+    )
+
+
+class StampingPublisher:
+    """
+    Stamp the headers of every message published through a channel for end-to-end measurements.
+
+    Messages are numbered in publish order from first_sequence, which callers set to the
+    index in the run of the first record they publish, so a run's sequence numbers stay
+    unique across shards, workers and resumes. The publish time is taken just before the
+    message is handed on. basic_publish takes the same arguments as the channel's.
+    """
+
+    def __init__(self, publisher: BlockingChannel | ConfirmedPublisher, run: int, first_sequence: int = 0):
+        self.publisher = publisher
+        self.run = run
+        self.next_sequence = first_sequence
+
+    def basic_publish(
+        self,
+        exchange: str,
+        routing_key: str,
+        body: bytes,
+        properties: pika.BasicProperties = None,
+        **kwargs,
+    ) -> None:
+        """Publish a message with the next sequence number and the current time in its headers."""
+        properties = stamp_properties(properties, self.run, self.next_sequence)
+        self.next_sequence += 1
+        self.publisher.basic_publish(
+            exchange=exchange, routing_key=routing_key, body=body, properties=properties, **kwargs
+        )
@@ -1,74 +1,20 @@
-import json
-import logging
-import os
-import sys
-import time
+from typing import Any
 
 import click
-import pika
-from dotenv import load_dotenv
-from faker import Faker
 
-from data_util.connections.rabbit_connection import publish_message_to_exchange
+from data_util.generators import MODEL_PERSON
+from data_util.generators import create_person_record as _create_person_message
+from data_util.queue_publishing import QueueCommand, publish_run, queue_options
 
-logger = logging.getLogger(__name__)
-
-# Model type constants
-MODEL_PERSON = "people"
-
-
-def _create_person_message(faker: Faker) -> dict[str, str]:
-    """Create a person message body."""
-    return {
-        "first_name": faker.first_name(),
-        "last_name": faker.last_name(),
-        "email": faker.email(),
-        "date_of_birth": faker.date_of_birth().isoformat(),
-        "gender": faker.passport_gender(),
-    }
-
-
-def _publish_messages_for_model(
-    channel: pika.channel.Channel,
-    model: str,
-    count: int,
-    faker: Faker,
-    exchange: str,
-) -> None:
-    """Publish messages for a specific model type."""
-    if model == MODEL_PERSON:
-        logger.info("Creating %s People", count)
-        for _ in range(count):
-            message = _create_person_message(faker)
-            channel.basic_publish(
-                exchange=exchange,
-                routing_key=model,
-                body=json.dumps(message),
-                properties=pika.BasicProperties(
-                    delivery_mode=pika.DeliveryMode.Persistent  # Mark message as persistent (delivery_mode=2)
-                ),
-            )
-        logger.info("Created %s People", count)
-    else:
-        logger.error("Unknown model: %s", model)
+# People are published as persistent messages to the actor exchange
+QUEUE_PERSON_CREATE = QueueCommand("queue-person-create", (MODEL_PERSON,), "ACTOR_EXCHANGE", persistent=True)
 
 
 @click.command()
 @click.argument("model", type=str, required=True)
 @click.argument("count", type=int, required=True)
-@click.option(
-    "--config-file",
-    "-c",
-    default=None,
-    help="Choose a config file to load environment variables from.",
-)
-@click.option(
-    "--periodic-run/--real-run",
-    "-p",
-    default=False,
-    help="When true messages are sent periodically for the number of count.",
-)
-def queue_person_create(model: str, count: int, config_file: str, periodic_run: bool) -> None:
+@queue_options
+def queue_person_create(model: str, count: int, **options: Any) -> None:
     """
     Publish messages for a specific model type.
 
@@ -83,25 +29,26 @@ def queue_person_create(model: str, count: int, config_file: str, periodic_run:
     Options:
     -c, --config-file FILE Choose a config file to load environment variables from.
     -p, --periodic-run When true messages are sent periodically for the number of count.
+    -g, --generator GENERATOR faker (exact Faker values) or batch (sampled from value pools).
+    --confirm-window N Use publisher confirms with at most N unconfirmed messages in flight.
+    -e, --engine ENGINE blocking (one channel) or async (several asyncio channels).
+    --channels N Number of channels used by the async engine.
+    --rate N With --periodic-run, publish COUNT messages at N messages per second.
+    --profile SPEC With --periodic-run, follow a rate profile such as "ramp:10:500:60;constant:500".
+    --report-interval SECONDS Seconds between achieved vs. target rate reports.
+    -s, --serializer NAME json, orjson or msgpack message bodies.
+    --envelope FORMAT Pack records into messages as an array or as length-prefixed frames.
+    --envelope-size N Records per message with --envelope.
+    --envelope-compression NAME none, zlib or lz4 compression of each envelope.
+    --seed N Seed for the fake data generators.
+    --shard i/N Only publish shard i of N of the run's messages.
+    --start-offset N Index of the run's first message.
+    --checkpoint FILE Record published or confirmed messages in FILE and resume from it.
+    --unique Make natural keys unique within the run, suffixing repeated ones.
+    --stamp Stamp run, sequence number and publish time headers for queue-measure.
+    -w, --workers N Publish from N processes, each with its own connection and share of the run.
+    --progress-interval SECONDS Seconds between per-stage progress lines.
+    --stats-file FILE Write a JSON summary of per-stage counts, rates and latencies.
+    --prometheus-file FILE Keep per-stage metrics in a Prometheus textfile.
     """
-    logger.info("Command: %s", " ".join(sys.argv))
-    if config_file:
-        load_dotenv(config_file)
-    else:
-        load_dotenv()
-    faker = Faker()
-    channel = None
-    try:
-        channel = publish_message_to_exchange(config_file=config_file)
-
-        exchange = os.getenv("ACTOR_EXCHANGE")
-
-        if periodic_run:
-            for _ in range(count):
-                _publish_messages_for_model(channel, model, 10, faker, exchange)
-                time.sleep(5)
-        else:
-            _publish_messages_for_model(channel, model, count, faker, exchange)
-    finally:
-        if channel is not None:
-            channel.close()
+    publish_run(QUEUE_PERSON_CREATE, model, count, **options)
@@ -1,16 +1,130 @@
 import logging
+import multiprocessing
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Any, Callable, Iterable, Iterator
 
 import click
 from dotenv import load_dotenv
-from faker import Faker
+from sqlalchemy.engine import Engine, make_url
 
-from data_util.model.kantin_models import FoodType, Franchise, Menu
-from data_util.providers.FoodTypeProvider import FoodTypeProvider
+from data_util.generators import (
+    GENERATOR_BATCH,
+    GENERATOR_FAKER,
+    MODEL_FOOD_TYPES,
+    MODEL_FRANCHISES,
+    MODEL_LABELS,
+    MODEL_MENU_CATEGORIES,
+    MODEL_MENUS,
+    MODEL_RESTAURANT_OWNERS,
+    NATURAL_KEYS,
+)
+from data_util.instrumentation import (
+    DEFAULT_PROGRESS_INTERVAL,
+    STAGE_GENERATE,
+    STAGE_INSERT,
+    finish_stats,
+    get_stats,
+    reset_stats,
+)
+from data_util.logging_config import configure_logging, logging_settings
+from data_util.model.data_operations import (
+    DEFAULT_COPY_CHUNK_SIZE,
+    UPSERT_SKIP,
+    UPSERT_UPDATE,
+    UpsertCounts,
+    copy_rows,
+    dispose_engines,
+    get_engine,
+    insert_batches,
+    upsert_batches,
+)
+from data_util.model.kantin_models import FoodType, Franchise, Menu, MenuCategory, RestaurantOwner
+from data_util.runs import (
+    DEFAULT_CHECKPOINT_INTERVAL,
+    new_seed,
+    plan_run,
+    record_checkpoint,
+    split_range,
+)
+from data_util.seed_graph import DEFAULT_GRAPH_BATCH_SIZE, GRAPH, GraphSeeder, parse_fan_out
+from data_util.uniqueness import record_range
 
 logger = logging.getLogger(__name__)
 
+# Model classes and log labels for the models db-create supports
+MODEL_CLASSES = {
+    MODEL_FOOD_TYPES: (FoodType, "Food Types"),
+    MODEL_FRANCHISES: (Franchise, "Franchises"),
+    MODEL_MENUS: (Menu, "Menus"),
+    MODEL_MENU_CATEGORIES: (MenuCategory, "Menu Categories"),
+    MODEL_RESTAURANT_OWNERS: (RestaurantOwner, "Restaurant Owners"),
+}
+
+# Models --upsert supports: their natural key columns, which have unique constraints since
+# migration 3f2a9d41c6b8. Runs of these models make their keys unique unless --no-unique is given,
+# and with the insert loader skip keys already in the table unless --upsert update is given.
+UPSERT_KEYS = {
+    MODEL_FOOD_TYPES: (NATURAL_KEYS[MODEL_FOOD_TYPES][0],),
+    MODEL_FRANCHISES: (NATURAL_KEYS[MODEL_FRANCHISES][0],),
+}
+DEFAULT_UPSERT_BATCH_SIZE = 1000
+
+# Bulk loader names
+LOADER_INSERT = "insert"
+LOADER_COPY = "copy"
+
+
+@dataclass(frozen=True)
+class SeedJob:
+    """
+    The share of a db-create run handled by one process.
+
+    The job creates count records of the run from record start on. part_start is where the
+    share began before any resume, and keys the share's progress in the checkpoint file.
+    With unique, natural keys are unique among all records of the run. With upsert, rows
+    whose key is already in the table are skipped or updated, as set by its value.
+    """
+
+    index: int
+    model: str
+    start: int
+    count: int
+    seed: int
+    connection_string: str
+    batch_size: int = 0
+    loader: str = LOADER_INSERT
+    generator: str = GENERATOR_FAKER
+    dry_run: bool = False
+    pool_size: int = None
+    pre_ping: bool = None
+    sql_echo: bool = None
+    part_start: int = 0
+    checkpoint: str = None
+    unique: bool = False
+    upsert: str = None
+
+
+@dataclass(frozen=True)
+class SeedResult:
+    """
+    The outcome of a SeedJob. created counts rows whose transaction ended before any failure.
+
+    For an upsert, created counts every row written or skipped, and upserted has the split.
+    """
+
+    index: int
+    requested: int
+    created: int
+    error: str = None
+    stats: dict[str, Any] = None
+    upserted: UpsertCounts = None
+
 
 @click.command()
 @click.argument("model", type=str, required=True)
@@ -27,7 +141,134 @@ logger = logging.getLogger(__name__)
     default=False,
     help="Dry run (Will not persist changes).",
 )
-def db_create(model: str, count: int, config_file: str, dry_run: bool) -> None:
+@click.option(
+    "--pool-size",
+    type=int,
+    default=None,
+    help="Size of the shared database connection pool.",
+)
+@click.option(
+    "--pre-ping/--no-pre-ping",
+    default=None,
+    help="Test pooled connections for liveness before using them.",
+)
+@click.option(
+    "--sql-echo/--no-sql-echo",
+    default=None,
+    help="Log every SQL statement issued to the database.",
+)
+@click.option(
+    "--batch-size",
+    "-b",
+    type=int,
+    default=0,
+    help="Insert rows in batches of this size, one transaction per batch (0 commits row by row).",
+)
+@click.option(
+    "--loader",
+    "-l",
+    type=click.Choice([LOADER_INSERT, LOADER_COPY]),
+    default=LOADER_INSERT,
+    help="Bulk loader: multi-row INSERT batches or PostgreSQL COPY streaming.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Split COUNT across this many processes, each with its own engine.",
+)
+@click.option(
+    "--seed",
+    type=int,
+    default=None,
+    help="Seed for the fake data generators. Record K of a run only depends on the seed, model and generator.",
+)
+@click.option(
+    "--shard",
+    default=None,
+    help="Only create shard i of N (as i/N, numbered from 0) of the run's records.",
+)
+@click.option(
+    "--start-offset",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Index of the run's first record, to continue an earlier run with new records.",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Record committed batches in this file, and resume from it when it exists.",
+)
+@click.option(
+    "--unique/--no-unique",
+    default=None,
+    help="Make natural keys such as names unique, suffixing repeated ones (the default for franchises, food-types).",
+)
+@click.option(
+    "--upsert",
+    type=click.Choice([UPSERT_SKIP, UPSERT_UPDATE]),
+    is_flag=False,
+    flag_value=UPSERT_SKIP,
+    default=None,
+    help="Skip (the default, also without --upsert) or update rows whose natural key is already in the table "
+    "(franchises, food-types).",
+)
+@click.option(
+    "--fan-out",
+    multiple=True,
+    metavar="MODEL=N",
+    help="Create N children per parent for the graph model, e.g. menus=10 or menu-items=20. Repeatable.",
+)
+@click.option(
+    "--generator",
+    "-g",
+    type=click.Choice([GENERATOR_FAKER, GENERATOR_BATCH]),
+    default=GENERATOR_FAKER,
+    help="Generate each field with Faker, or sample batches from prebuilt Faker value pools.",
+)
+@click.option(
+    "--progress-interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_PROGRESS_INTERVAL,
+    help="Seconds between progress lines with the rate of each stage.",
+)
+@click.option(
+    "--stats-file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write a JSON summary of per-stage counts, rates and latencies to this file.",
+)
+@click.option(
+    "--prometheus-file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Keep per-stage metrics in this Prometheus textfile, updated with every progress line.",
+)
+def db_create(  # noqa: PLR0913
+    model: str,
+    count: int,
+    config_file: str,
+    dry_run: bool,
+    pool_size: int,
+    pre_ping: bool,
+    sql_echo: bool,
+    batch_size: int,
+    loader: str,
+    workers: int,
+    seed: int,
+    shard: str,
+    start_offset: int,
+    checkpoint: str,
+    unique: bool,
+    upsert: str,
+    fan_out: tuple[str, ...],
+    generator: str,
+    progress_interval: float,
+    stats_file: str,
+    prometheus_file: str,
+) -> None:
     """
     Create records in the Kantin database.
 
@@ -38,12 +279,34 @@ def db_create(model: str, count: int, config_file: str, dry_run: bool) -> None:
     - food-types
     - franchises
     - menus
+    - menu-categories
+    - restaurant-owners
+    - graph
 
-    COUNT is the number of records to create.
+    COUNT is the number of records to create. For graph it is the number of restaurant owners
+    and of menu categories; each gets its restaurants, or menus and their menu items, as set
+    by --fan-out.
 
     Options:
     -c, --config-file FILE  Choose a config file for database connection.
     -d, --dry-run            Dry run (Will not persist changes).
+    --pool-size N            Size of the shared database connection pool.
+    --pre-ping               Test pooled connections for liveness before using them.
+    --sql-echo               Log every SQL statement issued to the database.
+    -b, --batch-size N       Insert rows in batches of N, one transaction per batch.
+    -l, --loader LOADER      Bulk loader, insert or copy (COPY streams N rows per chunk).
+    -w, --workers N          Split COUNT across N processes.
+    --seed N                 Seed for the fake data generators.
+    --shard i/N              Only create shard i of N of the run's records.
+    --start-offset N         Index of the run's first record.
+    --checkpoint FILE        Record committed batches in FILE and resume from it.
+    --unique/--no-unique     Make natural keys unique, suffixing repeated ones (default for franchises, food-types).
+    --upsert [skip|update]   Skip (default for franchises, food-types) or update rows whose natural key exists.
+    --fan-out MODEL=N        Children per parent for graph (restaurants, menus, menu-items).
+    -g, --generator NAME     faker (exact Faker values) or batch (sampled from value pools).
+    --progress-interval N    Seconds between per-stage progress lines.
+    --stats-file FILE        Write a JSON summary of per-stage counts, rates and latencies.
+    --prometheus-file FILE   Keep per-stage metrics in a Prometheus textfile.
     """
     logger.info("Command: %s", " ".join(sys.argv))
 
@@ -52,29 +315,324 @@ def db_create(model: str, count: int, config_file: str, dry_run: bool) -> None:
     else:
         load_dotenv()
 
-    faker = Faker()
+    if model == GRAPH:
+        fan_out_by_model = _graph_fan_out(fan_out, loader, workers, shard, start_offset, checkpoint, unique, upsert)
+        engine = get_engine(os.getenv("DATABASE_URI"), pool_size=pool_size, pool_pre_ping=pre_ping, echo=sql_echo)
+        reset_stats("db-create", progress_interval, prometheus_file)
+        _create_graph(engine, count, fan_out_by_model, seed, generator, batch_size, dry_run)
+        finish_stats(stats_file, prometheus_file)
+        return
+
+    if model not in MODEL_CLASSES:
+        logger.info("Unknown model %s", model)
+        return
+    unique, upsert = _natural_key_options(model, loader, unique, upsert)
     connection_string = os.getenv("DATABASE_URI")
-    if model == "food-types":
-        logger.info("Creating %s Food Types", count)
-        fake = FoodTypeProvider()
-        for _ in range(count):
-            food_type = FoodType(connection_string, type_name=fake.dish_type(), description=faker.sentence())
-            food_type.create()
-        logger.info("Created %s Food Types", count)
-
-    elif model == "franchises":
-        logger.info("Creating %s Franchises", count)
-        for _ in range(count):
-            franchise = Franchise(connection_string, franchise_name=faker.company(), description=faker.sentence())
-            franchise.create()
-        logger.info("Created %s Franchises", count)
-
-    elif model == "menus":
-        logger.info("Creating %s Menus", count)
-        for _ in range(count):
-            menu = Menu(connection_string, menu_name=faker.company(), description=faker.sentence())
-            menu.create()
-        logger.info("Created %s Menus", count)
+    batch_size = _check_loader_options(model, loader, upsert, batch_size, connection_string)
+
+    try:
+        plan = plan_run(
+            {
+                "command": "db-create",
+                "model": model,
+                "count": count,
+                "seed": seed,
+                "generator": generator,
+                "start_offset": start_offset,
+                "workers": workers,
+                "unique": unique,
+            },
+            shard,
+            checkpoint,
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
 
+    jobs = []
+    for index, (part_start, part_stop) in enumerate(split_range(plan.first, plan.stop, workers)):
+        start = plan.progress.get(part_start, part_start)
+        jobs.append(
+            SeedJob(
+                index=index,
+                model=model,
+                start=start,
+                count=part_stop - start,
+                seed=plan.seed,
+                connection_string=connection_string,
+                batch_size=batch_size,
+                loader=loader,
+                generator=generator,
+                dry_run=dry_run,
+                pool_size=pool_size,
+                pre_ping=pre_ping,
+                sql_echo=sql_echo,
+                part_start=part_start,
+                checkpoint=checkpoint,
+                unique=unique,
+                upsert=upsert,
+            )
+        )
+    requested = sum(job.count for job in jobs)
+    if plan.progress:
+        logger.info("%s of %s records left", requested, plan.stop - plan.first)
+    jobs = [job for job in jobs if job.count]
+    if not jobs:
+        logger.info("Nothing left to create")
+        return
+
+    reset_stats("db-create", progress_interval, prometheus_file)
+    if len(jobs) == 1:
+        results = [_run_seed_job(jobs[0])]
     else:
-        logger.info("Unknown model %s", model)
+        results = _run_seed_jobs_in_parallel(jobs)
+    finish_stats(stats_file, prometheus_file)
+    if upsert:
+        _log_upserts(results, MODEL_CLASSES[model][1])
+
+    failed = [result for result in results if result.error is not None]
+    if failed:
+        missing = sum(result.requested - result.created for result in failed)
+        logger.error(
+            "Created %s of %s %s; %s rows were not created by failed workers %s",
+            sum(result.created for result in results),
+            requested,
+            MODEL_CLASSES[model][1],
+            missing,
+            ", ".join(str(result.index) for result in failed),
+        )
+        sys.exit(1)
+
+
+def _natural_key_options(model: str, loader: str, unique: bool | None, upsert: str | None) -> tuple[bool, str]:
+    """
+    Return the unique and upsert options of a run, with the defaults of models with unique natural keys.
+
+    Those runs make their keys unique and skip keys already in the table, so running the same
+    command again adds rows instead of failing on the keys of the first run.
+    """
+    if model not in UPSERT_KEYS:
+        return bool(unique), upsert
+    if upsert is None and loader == LOADER_INSERT:
+        upsert = UPSERT_SKIP
+    return unique is not False, upsert
+
+
+def _check_loader_options(model: str, loader: str, upsert: str, batch_size: int, connection_string: str | None) -> int:
+    """Check the loader and upsert options of a run against its database and return its batch size."""
+    if upsert:
+        if model not in UPSERT_KEYS:
+            raise click.UsageError(f"--upsert supports {', '.join(UPSERT_KEYS)}, not {model}")
+        if loader == LOADER_COPY:
+            raise click.UsageError("--upsert cannot be used with the copy loader")
+        return batch_size or DEFAULT_UPSERT_BATCH_SIZE
+    if loader == LOADER_COPY:
+        if not connection_string or make_url(connection_string).get_backend_name() != "postgresql":
+            raise click.UsageError("The copy loader requires a PostgreSQL DATABASE_URI")
+        return batch_size or DEFAULT_COPY_CHUNK_SIZE
+    return batch_size
+
+
+def _log_upserts(results: list[SeedResult], label: str) -> None:
+    counts = [result.upserted for result in results if result.upserted is not None]
+    logger.info(
+        "Inserted %s, updated %s and skipped %s existing %s",
+        sum(count.inserted for count in counts),
+        sum(count.updated for count in counts),
+        sum(count.skipped for count in counts),
+        label,
+    )
+
+
+def _graph_fan_out(  # noqa: PLR0913
+    fan_out: tuple[str, ...],
+    loader: str,
+    workers: int,
+    shard: str,
+    start_offset: int,
+    checkpoint: str,
+    unique: bool,
+    upsert: str,
+) -> dict[str, int]:
+    """Check the options of a graph run and return its fan-out by model."""
+    unsupported = [
+        option
+        for option, used in (
+            ("--loader copy", loader == LOADER_COPY),
+            ("--workers", workers > 1),
+            ("--shard", shard),
+            ("--start-offset", start_offset),
+            ("--checkpoint", checkpoint),
+            ("--unique", unique),
+            ("--upsert", upsert),
+        )
+        if used
+    ]
+    if unsupported:
+        raise click.UsageError(f"The graph model does not support {', '.join(unsupported)}")
+    try:
+        return parse_fan_out(fan_out)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+
+
+def _create_graph(  # noqa: PLR0913
+    engine: Engine,
+    count: int,
+    fan_out: dict[str, int],
+    seed: int,
+    generator: str,
+    batch_size: int,
+    dry_run: bool,
+) -> None:
+    """Seed count restaurant owners and menu categories with their descendants."""
+    if seed is None:
+        seed = new_seed()
+        logger.info("Using seed %s", seed)
+    seeder = GraphSeeder(engine, fan_out, seed, generator, batch_size or DEFAULT_GRAPH_BATCH_SIZE, commit=not dry_run)
+    try:
+        created = seeder.seed_graph(count)
+    finally:
+        dispose_engines()
+    for model, model_created in created.items():
+        logger.info("Created %s %s", model_created, MODEL_LABELS[model])
+
+
+def _run_seed_jobs_in_parallel(jobs: list[SeedJob]) -> list[SeedResult]:
+    """Run seed jobs in a process pool, logging aggregate progress as each one finishes."""
+    total = sum(job.count for job in jobs)
+    label = MODEL_CLASSES[jobs[0].model][1]
+    logger.info("Creating %s %s with %s workers", total, label, len(jobs))
+
+    results = []
+    created = 0
+    started = time.perf_counter()
+    # Spawned workers start without the parent's engines, connections or Faker state
+    context = multiprocessing.get_context("spawn")
+    settings = logging_settings()
+    with ProcessPoolExecutor(
+        max_workers=len(jobs),
+        mp_context=context,
+        initializer=configure_logging if settings else None,
+        initargs=settings or (),
+    ) as executor:
+        futures = {executor.submit(_run_seed_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died, so none of its rows can be accounted for
+                result = SeedResult(job.index, job.count, 0, repr(e))
+            results.append(result)
+            if result.stats is not None:
+                get_stats().merge(result.stats)
+            created += result.created
+            if result.error is None:
+                logger.info("Worker %s created %s %s (%s/%s)", result.index, result.created, label, created, total)
+            else:
+                logger.error(
+                    "Worker %s failed after creating %s of %s %s: %s",
+                    result.index,
+                    result.created,
+                    result.requested,
+                    label,
+                    result.error,
+                )
+
+    elapsed = time.perf_counter() - started
+    logger.info("Created %s %s in %.2fs (%.0f rows/s)", created, label, elapsed, created / elapsed if elapsed else 0)
+    return sorted(results, key=lambda result: result.index)
+
+
+def _run_seed_job(job: SeedJob) -> SeedResult:
+    """Create one job's range of the run's records with its own engine."""
+    engine = get_engine(job.connection_string, pool_size=job.pool_size, pool_pre_ping=job.pre_ping, echo=job.sql_echo)
+
+    created = 0
+    checkpointed = 0
+
+    def save_checkpoint() -> None:
+        nonlocal checkpointed
+        if job.checkpoint and not job.dry_run and created > checkpointed:
+            record_checkpoint(job.checkpoint, job.part_start, job.start + created)
+            checkpointed = created
+
+    def on_batch(size: int) -> None:
+        nonlocal created
+        created += size
+        # Rows created one by one each commit, so only checkpoint them every so often
+        if job.batch_size > 0 or created - checkpointed >= DEFAULT_CHECKPOINT_INTERVAL:
+            save_checkpoint()
+
+    stats = get_stats()
+    rows = record_range(job.model, job.start, job.start + job.count, job.seed, job.generator, job.unique)
+    upserted = None
+    try:
+        if job.batch_size > 0:
+            rows = chain.from_iterable(stats.timed_batches(rows, STAGE_GENERATE))
+            upserted = _bulk_create_records(job, engine, rows, on_batch)
+        else:
+            _create_records(job, rows, on_batch)
+    except Exception as e:
+        logger.exception("Failed to create %s", job.model)
+        return SeedResult(job.index, job.count, created, repr(e), stats.summary())
+    finally:
+        save_checkpoint()
+        dispose_engines()
+    return SeedResult(job.index, job.count, created, stats=stats.summary(), upserted=upserted)
+
+
+def _bulk_create_records(
+    job: SeedJob,
+    engine: Engine,
+    rows: Iterator[dict[str, Any]],
+    on_batch: Callable[[int], None],
+) -> UpsertCounts | None:
+    """Create a job's records with batched multi-row inserts or COPY, returning the counts of an upsert."""
+    model_class, label = MODEL_CLASSES[job.model]
+    table = model_class.__table__
+    logger.info("Creating %s %s in batches of %s with the %s loader", job.count, label, job.batch_size, job.loader)
+    started = time.perf_counter()
+    upserted = None
+    if job.upsert:
+        upserted = upsert_batches(
+            engine,
+            table,
+            rows,
+            job.batch_size,
+            UPSERT_KEYS[job.model],
+            job.upsert,
+            commit=not job.dry_run,
+            on_batch=on_batch,
+        )
+        created = upserted.inserted + upserted.updated + upserted.skipped
+    elif job.loader == LOADER_COPY:
+        created = copy_rows(engine, table, _with_timestamps(rows), job.batch_size, commit=not job.dry_run)
+        on_batch(created)
+    else:
+        created = insert_batches(engine, table, rows, job.batch_size, commit=not job.dry_run, on_batch=on_batch)
+    elapsed = time.perf_counter() - started
+    logger.info("Created %s %s in %.2fs (%.0f rows/s)", created, label, elapsed, created / elapsed if elapsed else 0)
+    return upserted
+
+
+def _with_timestamps(rows: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """Add the created_on and modified_on values that COPY does not fill in from column defaults."""
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        row["created_on"] = now
+        row["modified_on"] = now
+        yield row
+
+
+def _create_records(job: SeedJob, rows: Iterator[dict[str, Any]], on_row: Callable[[int], None]) -> None:
+    """Create a job's records one by one through the shared session."""
+    model_class, label = MODEL_CLASSES[job.model]
+    logger.info("Creating %s %s", job.count, label)
+    stats = get_stats()
+    for batch in stats.timed_batches(rows, STAGE_GENERATE):
+        for row in batch:
+            with stats.time(STAGE_INSERT):
+                model_class(job.connection_string, **row).create()
+            on_row(1)
+    logger.info("Created %s %s", job.count, label)
@@ -1,99 +1,30 @@
-import json
-import logging
-import os
-import sys
-import time
+from typing import Any
 
 import click
-import pika
-from dotenv import load_dotenv
-from faker import Faker
 
-from data_util.connections.rabbit_connection import publish_message_to_exchange
-from data_util.providers.FoodTypeProvider import FoodTypeProvider
-
-logger = logging.getLogger(__name__)
-
-# Model type constants
-MODEL_FRANCHISES = "franchises"
-MODEL_FOOD_TYPES = "food-types"
-MODEL_MENUS = "menus"
-
-
-def _create_franchise_message(faker: Faker) -> dict[str, str]:
-    """Create a franchise message body."""
-    return {"franchise_name": faker.company(), "description": faker.sentence()}
-
-
-def _create_food_type_message(food_type_provider: FoodTypeProvider, faker: Faker) -> dict[str, str]:
-    """Create a food type message body."""
-    return {"type_name": food_type_provider.dish_type(), "description": faker.sentence()}
-
-
-def _create_menu_message(faker: Faker) -> dict[str, str]:
-    """Create a menu message body."""
-    return {"menu_name": faker.company(), "description": faker.sentence()}
+from data_util.generators import (
+    MODEL_FOOD_TYPES,
+    MODEL_FRANCHISES,
+    MODEL_MENU_CATEGORIES,
+    MODEL_MENU_ITEMS,
+    MODEL_MENUS,
+)
+from data_util.generators import create_food_type_record as _create_food_type_message
+from data_util.generators import create_franchise_record as _create_franchise_message
+from data_util.generators import create_menu_record as _create_menu_message
+from data_util.queue_publishing import QueueCommand, publish_run, queue_options
 
+# Models queue-create publishes
+REFERENCE_MODELS = (MODEL_FRANCHISES, MODEL_FOOD_TYPES, MODEL_MENUS, MODEL_MENU_CATEGORIES, MODEL_MENU_ITEMS)
 
-def _publish_messages_for_model(
-    channel: pika.channel.Channel,
-    model: str,
-    count: int,
-    faker: Faker,
-    exchange: str,
-) -> None:
-    """Publish messages for a specific model type."""
-    if model == MODEL_FRANCHISES:
-        logger.info("Creating %s Franchises", count)
-        for _ in range(count):
-            message = _create_franchise_message(faker)
-            channel.basic_publish(
-                exchange=exchange,
-                routing_key=model,
-                body=json.dumps(message),
-            )
-        logger.info("Created %s Franchises", count)
-    elif model == MODEL_FOOD_TYPES:
-        logger.info("Creating %s Food Types", count)
-        food_type_provider = FoodTypeProvider()
-        for _ in range(count):
-            message = _create_food_type_message(food_type_provider, faker)
-            channel.basic_publish(
-                exchange=exchange,
-                routing_key=model,
-                body=json.dumps(message),
-            )
-        logger.info("Created %s Food Types", count)
-    elif model == MODEL_MENUS:
-        logger.info("Creating %s Menus", count)
-        for _ in range(count):
-            message = _create_menu_message(faker)
-            channel.basic_publish(
-                exchange=exchange,
-                routing_key=model,
-                body=json.dumps(message),
-            )
-        logger.info("Created %s Menus", count)
-    else:
-        logger.error("Unknown model: %s", model)
+QUEUE_CREATE = QueueCommand("queue-create", REFERENCE_MODELS, "EXCHANGE")
 
 
 @click.command()
 @click.argument("model", type=str, required=True)
 @click.argument("count", type=int, required=True)
-@click.option(
-    "--config-file",
-    "-c",
-    default=None,
-    help="Choose a config file to load environment variables from.",
-)
-@click.option(
-    "--periodic-run/--real-run",
-    "-p",
-    default=False,
-    help="When true messages are sent periodically for the number of count.",
-)
-def queue_create(model: str, count: int, config_file: str, periodic_run: bool) -> None:
+@queue_options
+def queue_create(model: str, count: int, **options: Any) -> None:
     """
     Publish messages for a specific model type.
 
@@ -104,31 +35,34 @@ def queue_create(model: str, count: int, config_file: str, periodic_run: bool) -
     - franchises
     - food-types
     - menus
+    - menu-categories
+    - menu-items
 
     COUNT is the number of records to create.
 
     Options:
     -c, --config-file FILE Choose a config file to load environment variables from.
     -p, --periodic-run When true messages are sent periodically for the number of count.
+    -g, --generator GENERATOR faker (exact Faker values) or batch (sampled from value pools).
+    --confirm-window N Use publisher confirms with at most N unconfirmed messages in flight.
+    -e, --engine ENGINE blocking (one channel) or async (several asyncio channels).
+    --channels N Number of channels used by the async engine.
+    --rate N With --periodic-run, publish COUNT messages at N messages per second.
+    --profile SPEC With --periodic-run, follow a rate profile such as "ramp:10:500:60;constant:500".
+    --report-interval SECONDS Seconds between achieved vs. target rate reports.
+    -s, --serializer NAME json, orjson or msgpack message bodies.
+    --envelope FORMAT Pack records into messages as an array or as length-prefixed frames.
+    --envelope-size N Records per message with --envelope.
+    --envelope-compression NAME none, zlib or lz4 compression of each envelope.
+    --seed N Seed for the fake data generators.
+    --shard i/N Only publish shard i of N of the run's messages.
+    --start-offset N Index of the run's first message.
+    --checkpoint FILE Record published or confirmed messages in FILE and resume from it.
+    --unique Make natural keys unique within the run, suffixing repeated ones.
+    --stamp Stamp run, sequence number and publish time headers for queue-measure.
+    -w, --workers N Publish from N processes, each with its own connection and share of the run.
+    --progress-interval SECONDS Seconds between per-stage progress lines.
+    --stats-file FILE Write a JSON summary of per-stage counts, rates and latencies.
+    --prometheus-file FILE Keep per-stage metrics in a Prometheus textfile.
     """
-    logger.info("Command: %s", " ".join(sys.argv))
-    if config_file:
-        load_dotenv(config_file)
-    else:
-        load_dotenv()
-    faker = Faker()
-    channel = None
-    try:
-        channel = publish_message_to_exchange(config_file=config_file)
-
-        exchange = os.getenv("EXCHANGE")
-
-        if periodic_run:
-            for _ in range(count):
-                _publish_messages_for_model(channel, model, 10, faker, exchange)
-                time.sleep(5)
-        else:
-            _publish_messages_for_model(channel, model, count, faker, exchange)
-    finally:
-        if channel is not None:
-            channel.close()
+    publish_run(QUEUE_CREATE, model, count, **options)
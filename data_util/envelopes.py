@@ -0,0 +1,174 @@
+"""Envelopes that pack several records into one message body, optionally compressed."""
+
+import struct
+import zlib
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Iterable, Iterator
+
+import pika
+
+from data_util.instrumentation import STAGE_GENERATE, STAGE_PUBLISH, STAGE_SERIALIZE, get_stats
+from data_util.serializers import Serializer
+
+# Envelope formats: the records serialized together as one array (a JSON array with the
+# json and orjson serializers), or each record serialized on its own behind its length
+ENVELOPE_ARRAY = "array"
+ENVELOPE_FRAMES = "frames"
+ENVELOPES = (ENVELOPE_ARRAY, ENVELOPE_FRAMES)
+
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_LZ4 = "lz4"
+ENVELOPE_COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_LZ4)
+# zlib trades ratio for speed at its fastest level, as the export command's gzip does
+ZLIB_LEVEL = 1
+
+DEFAULT_ENVELOPE_SIZE = 100
+
+# Length of each record of a frames envelope (4 bytes, big-endian)
+ENVELOPE_FRAME_HEADER = struct.Struct(">I")
+
+# Headers describing an envelope. Compressed bodies also name their compression in the
+# content_encoding property.
+HEADER_ENVELOPE = "x-envelope"
+HEADER_RECORD_COUNT = "x-record-count"
+HEADER_UNCOMPRESSED_SIZE = "x-uncompressed-size"
+
+
+@dataclass(frozen=True)
+class Envelope:
+    """
+    Pack up to size records into one message body in an envelope format.
+
+    compress is None for uncompressed bodies. It has to be a module-level function, or a
+    partial of one, so envelopes can be sent to worker processes.
+    """
+
+    format: str
+    size: int = DEFAULT_ENVELOPE_SIZE
+    compression: str = COMPRESSION_NONE
+    compress: Callable[[bytes], bytes] = None
+
+    def pack(self, records: list[dict[str, Any]], serializer: Serializer) -> bytes:
+        """Serialize records into one uncompressed body."""
+        if self.format == ENVELOPE_ARRAY:
+            return serializer.dumps(records)
+        pack_length = ENVELOPE_FRAME_HEADER.pack
+        dumps = serializer.dumps
+        return b"".join(pack_length(len(body)) + body for body in map(dumps, records))
+
+    def message(
+        self,
+        records: list[dict[str, Any]],
+        serializer: Serializer,
+        persistent: bool = False,
+    ) -> tuple[bytes, pika.BasicProperties]:
+        """The body and publish properties of one envelope holding records."""
+        body = self.pack(records, serializer)
+        headers = {HEADER_ENVELOPE: self.format, HEADER_RECORD_COUNT: len(records)}
+        content_encoding = None
+        if self.compress is not None:
+            headers[HEADER_UNCOMPRESSED_SIZE] = len(body)
+            body = self.compress(body)
+            content_encoding = self.compression
+        properties = pika.BasicProperties(
+            content_type=serializer.content_type,
+            content_encoding=content_encoding,
+            delivery_mode=pika.DeliveryMode.Persistent if persistent else None,
+            headers=headers,
+        )
+        return body, properties
+
+
+def envelope_from_options(
+    envelope_format: str = None,
+    size: int = DEFAULT_ENVELOPE_SIZE,
+    compression: str = COMPRESSION_NONE,
+) -> Envelope | None:
+    """
+    Build the envelope asked for on the command line, or None to send one record per message.
+
+    lz4 is an optional dependency (the "fast" extra); a ValueError is raised when it is
+    asked for and not installed, or when compression is asked for without a format.
+    """
+    if envelope_format is None:
+        if compression != COMPRESSION_NONE:
+            raise ValueError("Compression requires an envelope format")
+        return None
+    if compression == COMPRESSION_ZLIB:
+        return Envelope(envelope_format, size, compression, partial(zlib.compress, level=ZLIB_LEVEL))
+    if compression == COMPRESSION_LZ4:
+        try:
+            import lz4.frame
+        except ImportError as e:
+            raise ValueError("lz4 compression requires the lz4 package") from e
+        return Envelope(envelope_format, size, compression, lz4.frame.compress)
+    return Envelope(envelope_format, size)
+
+
+def record_count(properties: pika.BasicProperties | None) -> int:
+    """The number of records in a message: its envelope's record count, or 1 for a plain message."""
+    headers = properties.headers if properties is not None else None
+    return headers.get(HEADER_RECORD_COUNT, 1) if headers else 1
+
+
+def decompress(body: bytes, content_encoding: str = None) -> bytes:
+    """Undo an envelope's compression, as named by its content_encoding."""
+    if content_encoding is None:
+        return body
+    if content_encoding == COMPRESSION_ZLIB:
+        return zlib.decompress(body)
+    if content_encoding == COMPRESSION_LZ4:
+        try:
+            import lz4.frame
+        except ImportError as e:
+            raise ValueError("lz4 compression requires the lz4 package") from e
+        return lz4.frame.decompress(body)
+    raise ValueError(f"Unknown content encoding {content_encoding}")
+
+
+def iter_envelope_frames(body: bytes) -> Iterator[bytes]:
+    """Yield each record body of an uncompressed frames envelope. A ValueError is raised at a truncated frame."""
+    unpack_from = ENVELOPE_FRAME_HEADER.unpack_from
+    offset = 0
+    while offset < len(body):
+        if offset + ENVELOPE_FRAME_HEADER.size > len(body):
+            raise ValueError(f"Truncated frame header at byte {offset}")
+        (length,) = unpack_from(body, offset)
+        start = offset + ENVELOPE_FRAME_HEADER.size
+        if start + length > len(body):
+            raise ValueError(f"Truncated frame at byte {offset}")
+        yield body[start : start + length]
+        offset = start + length
+
+
+def envelope_messages(
+    routing_key: str,
+    records: Iterable[dict[str, Any]],
+    serializer: Serializer,
+    envelope: Envelope,
+    persistent: bool = False,
+) -> Iterator[tuple[str, bytes, pika.BasicProperties]]:
+    """Pack records into envelopes of up to envelope.size records, timing generation and packing per envelope."""
+    stats = get_stats()
+    for chunk in stats.timed_batches(records, STAGE_GENERATE, envelope.size):
+        with stats.time(STAGE_SERIALIZE, len(chunk)):
+            body, properties = envelope.message(chunk, serializer, persistent)
+        yield routing_key, body, properties
+
+
+def publish_envelopes(  # noqa: PLR0913
+    channel: Any,
+    routing_key: str,
+    records: Iterable[dict[str, Any]],
+    exchange: str,
+    serializer: Serializer,
+    envelope: Envelope,
+    persistent: bool = False,
+) -> None:
+    """Publish records in envelopes of up to envelope.size records. Every stage counts records, not envelopes."""
+    stats = get_stats()
+    for _, body, properties in envelope_messages(routing_key, records, serializer, envelope, persistent):
+        with stats.time(STAGE_PUBLISH, properties.headers[HEADER_RECORD_COUNT]):
+            channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
@@ -0,0 +1,366 @@
+"""Export generated records to NDJSON, CSV, Parquet or message frames files."""
+
+import csv
+import gzip
+import io
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, BinaryIO, Callable, Iterable, Iterator
+
+import click
+
+from data_util.generators import GENERATOR_BATCH, GENERATOR_FAKER, MODEL_LABELS, generate_record_range
+from data_util.instrumentation import (
+    DEFAULT_PROGRESS_INTERVAL,
+    STAGE_GENERATE,
+    STAGE_SERIALIZE,
+    STAGE_WRITE,
+    finish_stats,
+    get_stats,
+    reset_stats,
+)
+from data_util.message_files import encode_frame, frames_header
+from data_util.runs import plan_run
+from data_util.serializers import SERIALIZER_JSON, SERIALIZER_MSGPACK, SERIALIZERS, get_serializer
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+FORMAT_PARQUET = "parquet"
+# Length-prefixed message bodies with routing keys, for queue-replay
+FORMAT_FRAMES = "frames"
+FORMATS = (FORMAT_NDJSON, FORMAT_CSV, FORMAT_PARQUET, FORMAT_FRAMES)
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD)
+COMPRESSION_EXTENSIONS = {COMPRESSION_NONE: "", COMPRESSION_GZIP: ".gz", COMPRESSION_ZSTD: ".zst"}
+# Fast levels by default: an export should be limited by the disk rather than the compressor
+DEFAULT_COMPRESSION_LEVELS = {COMPRESSION_GZIP: 1, COMPRESSION_ZSTD: 3}
+
+# Records generated, encoded and written at a time; memory use does not grow with COUNT
+DEFAULT_EXPORT_CHUNK_SIZE = 10000
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def default_output(model: str, output_format: str, compression: str) -> str:
+    """The file name used when no output is given, such as franchises.ndjson.gz."""
+    if output_format == FORMAT_PARQUET:
+        # Parquet compresses its column chunks itself
+        return f"{model}.{output_format}"
+    return f"{model}.{output_format}{COMPRESSION_EXTENSIONS[compression]}"
+
+
+@contextmanager
+def open_output(path: str, compression: str = COMPRESSION_NONE, level: int = None) -> Iterator[BinaryIO]:
+    """
+    Open a buffered binary file for writing, compressing what is written to it.
+
+    A path of "-" writes to standard output. zstd needs the optional zstandard package;
+    a ValueError is raised when it is not installed.
+    """
+    if compression == COMPRESSION_ZSTD:
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ValueError("zstd compression requires the zstandard package") from e
+
+    if path == "-":
+        raw = sys.stdout.buffer
+        close_raw = False
+    else:
+        raw = open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+        close_raw = True
+    try:
+        if compression == COMPRESSION_GZIP:
+            level = DEFAULT_COMPRESSION_LEVELS[COMPRESSION_GZIP] if level is None else level
+            # Without a name or mtime in the header, the same records always compress to the same bytes
+            with gzip.GzipFile(filename="", fileobj=raw, mode="wb", compresslevel=level, mtime=0) as file:
+                yield file
+        elif compression == COMPRESSION_ZSTD:
+            level = DEFAULT_COMPRESSION_LEVELS[COMPRESSION_ZSTD] if level is None else level
+            with zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=False) as file:
+                yield file
+        else:
+            yield raw
+    finally:
+        if close_raw:
+            raw.close()
+        else:
+            raw.flush()
+
+
+def encode_ndjson(chunk: list[dict[str, str]], dumps: Callable[[Any], bytes]) -> bytes:
+    """Encode records as newline-delimited JSON."""
+    return b"\n".join([dumps(record) for record in chunk]) + b"\n"
+
+
+def encode_frames(chunk: list[dict[str, str]], routing_key: bytes, dumps: Callable[[Any], bytes]) -> bytes:
+    """Encode records as the frames of messages routed by routing_key."""
+    return b"".join([encode_frame(routing_key, dumps(record)) for record in chunk])
+
+
+class CsvEncoder:
+    """Encode chunks of records as CSV, with a header row before the first chunk."""
+
+    def __init__(self):
+        self._fields = None
+
+    def __call__(self, chunk: list[dict[str, str]]) -> bytes:
+        buffer = io.StringIO()
+        if self._fields is None:
+            self._fields = list(chunk[0])
+            writer = csv.DictWriter(buffer, self._fields, lineterminator="\n")
+            writer.writeheader()
+        else:
+            writer = csv.DictWriter(buffer, self._fields, lineterminator="\n")
+        writer.writerows(chunk)
+        return buffer.getvalue().encode()
+
+
+def write_chunks(file: BinaryIO, chunks: Iterable[list[dict[str, str]]], encode: Callable[[list], bytes]) -> int:
+    """Encode each chunk of records and write it with one call, returning the records written."""
+    stats = get_stats()
+    written = 0
+    for chunk in chunks:
+        with stats.time(STAGE_SERIALIZE, len(chunk)):
+            data = encode(chunk)
+        with stats.time(STAGE_WRITE, len(chunk)):
+            file.write(data)
+        written += len(chunk)
+    return written
+
+
+def write_parquet(path: str, chunks: Iterable[list[dict[str, str]]], compression: str = COMPRESSION_NONE) -> int:
+    """
+    Write chunks of records as the row groups of a Parquet file, returning the records written.
+
+    Column types are inferred from the first chunk, so prices stay floats and flags booleans;
+    columns that are only null in it become string columns. Parquet needs the optional pyarrow
+    package; a ValueError is raised when it is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError("The parquet format requires the pyarrow package") from e
+
+    stats = get_stats()
+    writer = None
+    written = 0
+    try:
+        for chunk in chunks:
+            with stats.time(STAGE_SERIALIZE, len(chunk)):
+                if writer is None:
+                    inferred = pa.Table.from_pylist(chunk).schema
+                    schema = pa.schema(
+                        [field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in inferred]
+                    )
+                    codec = None if compression == COMPRESSION_NONE else compression
+                    writer = pq.ParquetWriter(path, schema, compression=codec)
+                table = pa.Table.from_pylist(chunk, schema=schema)
+            with stats.time(STAGE_WRITE, len(chunk)):
+                writer.write_table(table)
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def export_records(  # noqa: PLR0913
+    model: str,
+    records: Iterable[dict[str, str]],
+    output: str,
+    output_format: str = FORMAT_NDJSON,
+    compression: str = COMPRESSION_NONE,
+    level: int = None,
+    chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE,
+    serializer: str = SERIALIZER_JSON,
+) -> int:
+    """Write a model's records to output in chunks of chunk_size and return the number written."""
+    chunks = get_stats().timed_batches(records, STAGE_GENERATE, chunk_size)
+    if output_format == FORMAT_PARQUET:
+        if output == "-":
+            raise ValueError("Parquet cannot be written to standard output")
+        return write_parquet(output, chunks, compression)
+
+    header = b""
+    if output_format == FORMAT_CSV:
+        encode = CsvEncoder()
+    elif output_format == FORMAT_FRAMES:
+        message_serializer = get_serializer(serializer)
+        header = frames_header(message_serializer.content_type)
+        encode = partial(encode_frames, routing_key=model.encode(), dumps=message_serializer.dumps)
+    elif serializer == SERIALIZER_MSGPACK:
+        raise ValueError("NDJSON files need the json or orjson serializer")
+    else:
+        encode = partial(encode_ndjson, dumps=get_serializer(serializer).dumps)
+    with open_output(output, compression, level) as file:
+        file.write(header)
+        return write_chunks(file, chunks, encode)
+
+
+@click.command()
+@click.argument("model", type=click.Choice(list(MODEL_LABELS)), required=True)
+@click.argument("count", type=click.IntRange(min=0), required=True)
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(FORMATS),
+    default=FORMAT_NDJSON,
+    help="File format: newline-delimited JSON, CSV with a header row, Parquet, or message frames for queue-replay.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True, allow_dash=True),
+    default=None,
+    help="File to write, or - for standard output. Defaults to MODEL.FORMAT with the compression's extension.",
+)
+@click.option(
+    "--compression",
+    "-z",
+    type=click.Choice(COMPRESSIONS),
+    default=COMPRESSION_NONE,
+    help="Compress the file with gzip or zstd (Parquet compresses its column chunks instead).",
+)
+@click.option(
+    "--compression-level",
+    type=int,
+    default=None,
+    help="gzip or zstd compression level. Defaults to a fast level.",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_EXPORT_CHUNK_SIZE,
+    help="Records generated and written at a time (Parquet row group size).",
+)
+@click.option(
+    "--generator",
+    "-g",
+    type=click.Choice([GENERATOR_FAKER, GENERATOR_BATCH]),
+    default=GENERATOR_FAKER,
+    help="Generate each field with Faker, or sample batches from prebuilt Faker value pools.",
+)
+@click.option(
+    "--serializer",
+    "-s",
+    type=click.Choice(SERIALIZERS),
+    default=SERIALIZER_JSON,
+    help="Record encoding for NDJSON (json or orjson) and frames files.",
+)
+@click.option(
+    "--seed",
+    type=int,
+    default=None,
+    help="Seed for the fake data generators. Record K of a run only depends on the seed, model and generator.",
+)
+@click.option(
+    "--shard",
+    default=None,
+    help="Only export shard i of N (as i/N, numbered from 0) of the run's records.",
+)
+@click.option(
+    "--start-offset",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Index of the run's first record, to continue an earlier run with new records.",
+)
+@click.option(
+    "--progress-interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_PROGRESS_INTERVAL,
+    help="Seconds between progress lines with the rate of each stage.",
+)
+@click.option(
+    "--stats-file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write a JSON summary of per-stage counts, rates and latencies to this file.",
+)
+def export(  # noqa: PLR0913
+    model: str,
+    count: int,
+    output_format: str,
+    output: str,
+    compression: str,
+    compression_level: int,
+    chunk_size: int,
+    generator: str,
+    serializer: str,
+    seed: int,
+    shard: str,
+    start_offset: int,
+    progress_interval: float,
+    stats_file: str,
+) -> None:
+    """
+    Export generated records to a file.
+
+    Usage:
+    export [OPTIONS] MODEL COUNT
+
+    MODEL should be one of:
+    - franchises
+    - food-types
+    - menus
+    - menu-categories
+    - menu-items
+    - people
+    - restaurant-owners
+    - restaurants
+
+    COUNT is the number of records to export.
+
+    Options:
+    -f, --format FORMAT ndjson, csv, parquet or frames.
+    -o, --output FILE File to write, or - for standard output.
+    -z, --compression NAME none, gzip or zstd.
+    --compression-level N gzip or zstd compression level.
+    --chunk-size N Records generated and written at a time.
+    -g, --generator GENERATOR faker (exact Faker values) or batch (sampled from value pools).
+    -s, --serializer NAME json, orjson or msgpack records in NDJSON and frames files.
+    --seed N Seed for the fake data generators.
+    --shard i/N Only export shard i of N of the run's records.
+    --start-offset N Index of the run's first record.
+    --progress-interval SECONDS Seconds between per-stage progress lines.
+    --stats-file FILE Write a JSON summary of per-stage counts, rates and latencies.
+    """
+    logger.info("Command: %s", " ".join(sys.argv))
+    output = output or default_output(model, output_format, compression)
+    try:
+        plan = plan_run(
+            {"command": "export", "model": model, "count": count, "seed": seed, "start_offset": start_offset},
+            shard,
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+
+    reset_stats("export", progress_interval)
+    records = generate_record_range(model, plan.start, plan.stop, plan.seed, generator)
+    started = time.perf_counter()
+    try:
+        written = export_records(
+            model, records, output, output_format, compression, compression_level, chunk_size, serializer
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    finally:
+        finish_stats(stats_file)
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Exported %s %s to %s in %.2fs (%.0f records/s)",
+        written,
+        MODEL_LABELS[model],
+        output,
+        elapsed,
+        written / elapsed if elapsed else 0,
+    )
@@ -0,0 +1,410 @@
+"""Fake record factories shared by the database and queue commands."""
+
+from datetime import date, timedelta
+from itertools import islice
+from typing import Callable, Iterator
+
+import numpy as np
+from faker import Faker
+
+from data_util.providers.FoodTypeProvider import FoodTypeProvider
+from data_util.providers.menu_catalog import get_menu_catalog
+from data_util.runs import derive_seed
+
+# Model type constants
+MODEL_FRANCHISES = "franchises"
+MODEL_FOOD_TYPES = "food-types"
+MODEL_MENUS = "menus"
+MODEL_MENU_CATEGORIES = "menu-categories"
+MODEL_MENU_ITEMS = "menu-items"
+MODEL_PERSON = "people"
+MODEL_RESTAURANT_OWNERS = "restaurant-owners"
+MODEL_RESTAURANTS = "restaurants"
+
+# Log labels for the model types
+MODEL_LABELS = {
+    MODEL_FRANCHISES: "Franchises",
+    MODEL_FOOD_TYPES: "Food Types",
+    MODEL_MENUS: "Menus",
+    MODEL_MENU_CATEGORIES: "Menu Categories",
+    MODEL_MENU_ITEMS: "Menu Items",
+    MODEL_PERSON: "People",
+    MODEL_RESTAURANT_OWNERS: "Restaurant Owners",
+    MODEL_RESTAURANTS: "Restaurants",
+}
+
+# Natural key field of each model's records, and the length of its column if limited. Menu
+# items have none: the same item can be on many menus.
+NATURAL_KEYS = {
+    MODEL_FRANCHISES: ("franchise_name", 45),
+    MODEL_FOOD_TYPES: ("type_name", 25),
+    MODEL_MENUS: ("menu_name", 45),
+    MODEL_MENU_CATEGORIES: ("category_name", 45),
+    MODEL_PERSON: ("email", None),
+    MODEL_RESTAURANT_OWNERS: ("owner_name", 45),
+    MODEL_RESTAURANTS: ("restaurant_name", 45),
+}
+
+# Generator names
+GENERATOR_FAKER = "faker"
+GENERATOR_BATCH = "batch"
+
+DEFAULT_VALUE_POOL_SIZE = 10000
+DEFAULT_GENERATION_CHUNK_SIZE = 10000
+# Faker's date_of_birth default range, in days
+MAXIMUM_AGE_DAYS = 115 * 365
+# Dates of birth count back from this fixed day rather than today, so a seed gives the same
+# records whatever day it runs on. Changing it changes the records every seed produces.
+DATE_EPOCH = date(2025, 1, 1)
+# Faker's passport_gender values and weights
+GENDERS = ("M", "F", "X")
+GENDER_WEIGHTS = (0.493, 0.493, 0.014)
+# Length of the menu and restaurant tables' name columns
+MAXIMUM_NAME_LENGTH = 45
+# Range of generated menu item prices
+MINIMUM_ITEM_PRICE = 3.0
+MAXIMUM_ITEM_PRICE = 40.0
+# Seeded runs generate records in blocks of this size, each from a seed derived from the run's
+# seed and the block number. Changing it changes the records every seed produces.
+SEED_BLOCK_SIZE = 1000
+# Index of the derived seed for the value pools of a seeded batch-generated run
+POOL_SEED_INDEX = -1
+
+
+def create_franchise_record(faker: Faker) -> dict[str, str]:
+    """Create a franchise record."""
+    return {"franchise_name": faker.company(), "description": faker.sentence()}
+
+
+def create_food_type_record(food_type_provider: FoodTypeProvider, faker: Faker) -> dict[str, str]:
+    """Create a food type record."""
+    return {"type_name": food_type_provider.dish_type(), "description": faker.sentence()}
+
+
+def _menu_name(owner: str, category: str) -> str:
+    return f"{owner}'s {category}"[:MAXIMUM_NAME_LENGTH]
+
+
+def _category_description(first_item: str, second_item: str) -> str:
+    return f"{first_item}, {second_item} and more"
+
+
+def create_menu_record(faker: Faker) -> dict[str, str]:
+    """Create a menu record named after a menu.txt category."""
+    category = faker.random.choice(get_menu_catalog().categories)
+    return {"menu_name": _menu_name(faker.last_name(), category), "description": faker.sentence()}
+
+
+def create_menu_category_record(faker: Faker) -> dict[str, str]:
+    """Create a menu category record from menu.txt, described by two of its items."""
+    catalog = get_menu_catalog()
+    category = faker.random.randrange(len(catalog.categories))
+    items = catalog.category_items(category)
+    return {
+        "category_name": catalog.categories[category],
+        "description": _category_description(
+            catalog.item_names[faker.random.choice(items)], catalog.item_names[faker.random.choice(items)]
+        ),
+    }
+
+
+def create_menu_item_record(faker: Faker) -> dict[str, str | float]:
+    """Create a menu item record from menu.txt."""
+    catalog = get_menu_catalog()
+    item = faker.random.randrange(len(catalog.item_names))
+    return {
+        "item_name": catalog.item_names[item][:MAXIMUM_NAME_LENGTH],
+        "description": catalog.item_details[item] or catalog.categories[catalog.item_categories[item]],
+        "item_price": round(faker.random.uniform(MINIMUM_ITEM_PRICE, MAXIMUM_ITEM_PRICE), 2),
+    }
+
+
+def create_person_record(faker: Faker) -> dict[str, str]:
+    """Create a person record."""
+    return {
+        "first_name": faker.first_name(),
+        "last_name": faker.last_name(),
+        "email": faker.email(),
+        "date_of_birth": (DATE_EPOCH - timedelta(days=faker.random.randrange(MAXIMUM_AGE_DAYS))).isoformat(),
+        # Drawn from the faker's random: passport_gender uses the unseeded global random
+        "gender": faker.random.choices(GENDERS, GENDER_WEIGHTS)[0],
+    }
+
+
+def create_restaurant_owner_record(faker: Faker) -> dict[str, str]:
+    """Create a restaurant owner record."""
+    return {"owner_name": faker.name()[:MAXIMUM_NAME_LENGTH], "description": faker.sentence()}
+
+
+def create_restaurant_record(faker: Faker) -> dict[str, str | bool]:
+    """Create a restaurant record."""
+    return {
+        "restaurant_name": faker.company()[:MAXIMUM_NAME_LENGTH],
+        "allow_pets": faker.pybool(),
+        "has_smoking_area": faker.pybool(),
+        "remarks": faker.sentence(),
+    }
+
+
+# Faker-path record factories of the models that only need a faker
+RECORD_FACTORIES: dict[str, Callable[[Faker], dict]] = {
+    MODEL_FRANCHISES: create_franchise_record,
+    MODEL_MENUS: create_menu_record,
+    MODEL_MENU_CATEGORIES: create_menu_category_record,
+    MODEL_MENU_ITEMS: create_menu_item_record,
+    MODEL_PERSON: create_person_record,
+    MODEL_RESTAURANT_OWNERS: create_restaurant_owner_record,
+    MODEL_RESTAURANTS: create_restaurant_record,
+}
+
+
+class BatchRecordGenerator:
+    """
+    Generate records N at a time from prebuilt value pools.
+
+    Each pool is filled once with pool_size Faker values on first use. Batches are then
+    built by sampling the pools with NumPy index arrays, so the per-record cost no longer
+    includes a Faker call per field. Values repeat across records once a run is larger than
+    the pools; use the Faker path where every value has to be freshly generated.
+    """
+
+    def __init__(self, faker: Faker, pool_size: int = DEFAULT_VALUE_POOL_SIZE):
+        self.faker = faker
+        self.pool_size = pool_size
+        # Seed from the faker so a seeded run stays reproducible
+        self.rng = np.random.default_rng(faker.random.getrandbits(64))
+        self._pools: dict[str, np.ndarray] = {}
+        self._food_type_provider = None
+
+    def reseed(self, seed: int) -> None:
+        """Restart sampling from a new seed, keeping the value pools."""
+        self.rng = np.random.default_rng(seed)
+
+    def _pool(self, name: str, factory: Callable[[], str]) -> np.ndarray:
+        pool = self._pools.get(name)
+        if pool is None:
+            pool = np.array([factory() for _ in range(self.pool_size)], dtype=object)
+            self._pools[name] = pool
+        return pool
+
+    def _sample(self, name: str, factory: Callable[[], str], count: int) -> list[str]:
+        pool = self._pool(name, factory)
+        return pool[self.rng.integers(0, len(pool), count)].tolist()
+
+    def _dish_type(self) -> str:
+        if self._food_type_provider is None:
+            self._food_type_provider = FoodTypeProvider()
+            self._food_type_provider.random = self.faker.random
+        return self._food_type_provider.dish_type()
+
+    def _dates_of_birth(self, count: int) -> list[str]:
+        epoch = np.datetime64(DATE_EPOCH, "D")
+        return (epoch - self.rng.integers(0, MAXIMUM_AGE_DAYS, count)).astype(str).tolist()
+
+    def _genders(self, count: int) -> list[str]:
+        # Sampled here because Faker's passport_gender draws from the unseeded global random
+        weights = np.array(GENDER_WEIGHTS) / sum(GENDER_WEIGHTS)
+        return self.rng.choice(GENDERS, size=count, p=weights).tolist()
+
+    def franchises(self, count: int) -> list[dict[str, str]]:
+        """Create count franchise records."""
+        names = self._sample("company", self.faker.company, count)
+        descriptions = self._sample("sentence", self.faker.sentence, count)
+        return [{"franchise_name": name, "description": description} for name, description in zip(names, descriptions)]
+
+    def food_types(self, count: int) -> list[dict[str, str]]:
+        """Create count food type records."""
+        type_names = self._sample("dish_type", self._dish_type, count)
+        descriptions = self._sample("sentence", self.faker.sentence, count)
+        return [
+            {"type_name": type_name, "description": description}
+            for type_name, description in zip(type_names, descriptions)
+        ]
+
+    def menus(self, count: int) -> list[dict[str, str]]:
+        """Create count menu records."""
+        categories = get_menu_catalog().categories
+        owners = self._sample("last_name", self.faker.last_name, count)
+        descriptions = self._sample("sentence", self.faker.sentence, count)
+        return [
+            {"menu_name": _menu_name(owner, categories[category]), "description": description}
+            for owner, category, description in zip(
+                owners, self.rng.integers(0, len(categories), count).tolist(), descriptions
+            )
+        ]
+
+    def menu_categories(self, count: int) -> list[dict[str, str]]:
+        """Create count menu category records."""
+        catalog = get_menu_catalog()
+        categories = self.rng.integers(0, len(catalog.categories), count).tolist()
+        # Two item offsets per record, each within the record's category
+        offsets = self.rng.random((count, 2))
+        records = []
+        for category, (first, second) in zip(categories, offsets.tolist()):
+            start = catalog.category_starts[category]
+            size = catalog.category_starts[category + 1] - start
+            records.append(
+                {
+                    "category_name": catalog.categories[category],
+                    "description": _category_description(
+                        catalog.item_names[start + int(first * size)], catalog.item_names[start + int(second * size)]
+                    ),
+                }
+            )
+        return records
+
+    def menu_items(self, count: int) -> list[dict[str, str | float]]:
+        """Create count menu item records."""
+        catalog = get_menu_catalog()
+        items = self.rng.integers(0, len(catalog.item_names), count).tolist()
+        prices = self.rng.uniform(MINIMUM_ITEM_PRICE, MAXIMUM_ITEM_PRICE, count).round(2).tolist()
+        return [
+            {
+                "item_name": catalog.item_names[item][:MAXIMUM_NAME_LENGTH],
+                "description": catalog.item_details[item] or catalog.categories[catalog.item_categories[item]],
+                "item_price": price,
+            }
+            for item, price in zip(items, prices)
+        ]
+
+    def people(self, count: int) -> list[dict[str, str]]:
+        """Create count person records."""
+        columns = zip(
+            self._sample("first_name", self.faker.first_name, count),
+            self._sample("last_name", self.faker.last_name, count),
+            self._sample("email", self.faker.email, count),
+            self._dates_of_birth(count),
+            self._genders(count),
+        )
+        return [
+            {
+                "first_name": first_name,
+                "last_name": last_name,
+                "email": email,
+                "date_of_birth": date_of_birth,
+                "gender": gender,
+            }
+            for first_name, last_name, email, date_of_birth, gender in columns
+        ]
+
+    def restaurant_owners(self, count: int) -> list[dict[str, str]]:
+        """Create count restaurant owner records."""
+        names = self._sample("name", self.faker.name, count)
+        descriptions = self._sample("sentence", self.faker.sentence, count)
+        return [
+            {"owner_name": name[:MAXIMUM_NAME_LENGTH], "description": description}
+            for name, description in zip(names, descriptions)
+        ]
+
+    def restaurants(self, count: int) -> list[dict[str, str | bool]]:
+        """Create count restaurant records."""
+        columns = zip(
+            self._sample("company", self.faker.company, count),
+            self.rng.integers(0, 2, count).astype(bool).tolist(),
+            self.rng.integers(0, 2, count).astype(bool).tolist(),
+            self._sample("sentence", self.faker.sentence, count),
+        )
+        return [
+            {
+                "restaurant_name": name[:MAXIMUM_NAME_LENGTH],
+                "allow_pets": allow_pets,
+                "has_smoking_area": has_smoking_area,
+                "remarks": remarks,
+            }
+            for name, allow_pets, has_smoking_area, remarks in columns
+        ]
+
+    def generate(self, model: str, count: int) -> list[dict[str, str]]:
+        """Create count records for a model."""
+        methods = {
+            MODEL_FRANCHISES: self.franchises,
+            MODEL_FOOD_TYPES: self.food_types,
+            MODEL_MENUS: self.menus,
+            MODEL_MENU_CATEGORIES: self.menu_categories,
+            MODEL_MENU_ITEMS: self.menu_items,
+            MODEL_PERSON: self.people,
+            MODEL_RESTAURANT_OWNERS: self.restaurant_owners,
+            MODEL_RESTAURANTS: self.restaurants,
+        }
+        if model not in methods:
+            raise ValueError(f"Unknown model: {model}")
+        return methods[model](count)
+
+
+def generate_records(
+    model: str,
+    count: int,
+    faker: Faker,
+    batch_generator: BatchRecordGenerator = None,
+) -> Iterator[dict[str, str]]:
+    """
+    Yield COUNT records for a model.
+
+    Without a batch generator every field comes from its own Faker call. With one, records
+    are produced in chunks of DEFAULT_GENERATION_CHUNK_SIZE from its value pools.
+    """
+    if batch_generator is not None:
+        if model not in MODEL_LABELS:
+            raise ValueError(f"Unknown model: {model}")
+        remaining = count
+        while remaining > 0:
+            chunk = batch_generator.generate(model, min(remaining, DEFAULT_GENERATION_CHUNK_SIZE))
+            remaining -= len(chunk)
+            yield from chunk
+    elif model == MODEL_FOOD_TYPES:
+        food_type_provider = FoodTypeProvider()
+        food_type_provider.random = faker.random  # Follow the faker's seed
+        for _ in range(count):
+            yield create_food_type_record(food_type_provider, faker)
+    elif model in RECORD_FACTORIES:
+        create_record = RECORD_FACTORIES[model]
+        for _ in range(count):
+            yield create_record(faker)
+    else:
+        raise ValueError(f"Unknown model: {model}")
+
+
+def generate_record_range(
+    model: str,
+    start: int,
+    stop: int,
+    seed: int,
+    generator: str = GENERATOR_FAKER,
+) -> Iterator[dict[str, str]]:
+    """
+    Yield records start to stop - 1 of the seeded run for a model.
+
+    Each block of SEED_BLOCK_SIZE records is generated from its own derived seed, so record K
+    only depends on the seed, the model and the generator, not on where generation started.
+    Runs can therefore be split into ranges across workers or hosts, or resumed part way,
+    and still produce the same records. The batch generator's value pools come from one
+    more derived seed and are shared by all blocks.
+    """
+    if model not in MODEL_LABELS:
+        raise ValueError(f"Unknown model: {model}")
+
+    faker = Faker()
+    batch_generator = None
+    if generator == GENERATOR_BATCH:
+        pool_faker = Faker()
+        pool_faker.seed_instance(derive_seed(seed, POOL_SEED_INDEX))
+        batch_generator = BatchRecordGenerator(pool_faker)
+
+    for block in range(start // SEED_BLOCK_SIZE, -(-stop // SEED_BLOCK_SIZE)):
+        block_start = block * SEED_BLOCK_SIZE
+        first = max(start, block_start) - block_start
+        last = min(stop, block_start + SEED_BLOCK_SIZE) - block_start
+        if batch_generator is not None:
+            # A batch's values depend on its size, so always sample whole blocks
+            batch_generator.reseed(derive_seed(seed, block))
+            yield from batch_generator.generate(model, SEED_BLOCK_SIZE)[first:last]
+        else:
+            faker.seed_instance(derive_seed(seed, block))
+            yield from islice(generate_records(model, last, faker), first, None)
+
+
+def create_batch_generator(generator: str, faker: Faker) -> BatchRecordGenerator | None:
+    """Return a batch generator for the batch generator option, or None for the exact Faker path."""
+    if generator == GENERATOR_BATCH:
+        return BatchRecordGenerator(faker)
+    return None
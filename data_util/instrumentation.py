@@ -0,0 +1,258 @@
+"""Per-stage counters, latency histograms and progress reporting for long runs."""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+STAGE_GENERATE = "generate"
+STAGE_SERIALIZE = "serialize"
+STAGE_PUBLISH = "publish"
+STAGE_INSERT = "insert"
+STAGE_WRITE = "write"
+
+DEFAULT_PROGRESS_INTERVAL = 10.0
+# Records are timed in batches of this size so timing costs little per record
+DEFAULT_TIMING_BATCH = 500
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+METRIC_PREFIX = "data_util"
+
+
+class Histogram:
+    """A cumulative-bucket latency histogram in the style of Prometheus."""
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Add one observation."""
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """The upper bound of the bucket holding quantile q, capped at the largest bound."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]
+
+    def merge(self, counts: list[int], total: float) -> None:
+        """Add the bucket counts and sum of another histogram with the same bounds."""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+        self.count += sum(counts)
+        self.sum += total
+
+
+class StageStats:
+    """Items processed by one stage and the latency of each timed call."""
+
+    def __init__(self):
+        self.items = 0
+        self.seconds = 0.0
+        self.latency = Histogram()
+        self.reported_items = 0
+
+    def to_dict(self, elapsed: float) -> dict[str, Any]:
+        """The stage's totals as written to the JSON summary."""
+        return {
+            "items": self.items,
+            "calls": self.latency.count,
+            "seconds": self.seconds,
+            "rate": self.items / elapsed if elapsed else 0.0,
+            "busy_rate": self.items / self.seconds if self.seconds else 0.0,
+            "p50": self.latency.quantile(0.5),
+            "p99": self.latency.quantile(0.99),
+            "buckets": self.latency.counts,
+        }
+
+
+class Stats:
+    """
+    Counters and latency histograms for the stages of one command run.
+
+    Stages are timed per call (usually a batch of records), so the histograms describe
+    batch latencies. With a progress interval set, a progress line with the rate of each
+    stage since the last line is logged at most once per interval, and the Prometheus
+    textfile, if any, is rewritten at the same time.
+    """
+
+    def __init__(
+        self,
+        command: str = "",
+        progress_interval: float = None,
+        prometheus_file: str = None,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.command = command
+        self.progress_interval = progress_interval
+        self.prometheus_file = prometheus_file
+        self.clock = clock
+        self.stages: dict[str, StageStats] = {}
+        self.started = clock()
+        self._reported = self.started
+        self._lock = threading.Lock()
+
+    def _stage(self, stage: str) -> StageStats:
+        if stage not in self.stages:
+            self.stages[stage] = StageStats()
+        return self.stages[stage]
+
+    def record(self, stage: str, items: int, seconds: float) -> None:
+        """Count items processed by one timed call of a stage."""
+        with self._lock:
+            stats = self._stage(stage)
+            stats.items += items
+            stats.seconds += seconds
+            stats.latency.observe(seconds)
+        self._maybe_report()
+
+    @contextmanager
+    def time(self, stage: str, items: int = 1) -> Iterator[None]:
+        """Time the block as one call of a stage processing items."""
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.record(stage, items, self.clock() - started)
+
+    def timed_batches(self, items: Iterable[Any], stage: str, size: int = DEFAULT_TIMING_BATCH) -> Iterator[list[Any]]:
+        """Take items in lists of size, timing how long each list takes to produce as a call of stage."""
+        iterator = iter(items)
+        while True:
+            started = self.clock()
+            batch = list(islice(iterator, size))
+            if not batch:
+                return
+            self.record(stage, len(batch), self.clock() - started)
+            yield batch
+
+    def _maybe_report(self) -> None:
+        if self.progress_interval is None or self.clock() - self._reported < self.progress_interval:
+            return
+        self.log_progress()
+        if self.prometheus_file:
+            self.write_prometheus(self.prometheus_file)
+
+    def log_progress(self) -> None:
+        """Log the items and rate of each stage since the last progress line."""
+        now = self.clock()
+        with self._lock:
+            interval = now - self._reported
+            self._reported = now
+            parts = []
+            for stage, stats in self.stages.items():
+                rate = (stats.items - stats.reported_items) / interval if interval else 0
+                stats.reported_items = stats.items
+                parts.append(f"{stage} {stats.items} ({rate:.0f}/s, p99 {stats.latency.quantile(0.99) * 1000:g}ms)")
+        logger.info("Progress after %.0fs: %s", now - self.started, ", ".join(parts) or "nothing yet")
+
+    def summary(self) -> dict[str, Any]:
+        """Totals, rates and latency buckets per stage."""
+        elapsed = self.clock() - self.started
+        with self._lock:
+            return {
+                "command": self.command,
+                "elapsed": elapsed,
+                "buckets": list(LATENCY_BUCKETS),
+                "stages": {stage: stats.to_dict(elapsed) for stage, stats in self.stages.items()},
+            }
+
+    def merge(self, summary: dict[str, Any]) -> None:
+        """Add the stage totals of another run's summary, such as a worker process's."""
+        with self._lock:
+            for stage, totals in summary["stages"].items():
+                stats = self._stage(stage)
+                stats.items += totals["items"]
+                stats.seconds += totals["seconds"]
+                stats.latency.merge(totals["buckets"], totals["seconds"])
+
+    def log_summary(self) -> None:
+        """Log one line per stage with its totals."""
+        summary = self.summary()
+        for stage, totals in summary["stages"].items():
+            logger.info(
+                "%s: %s items in %.2fs busy (%.0f/s overall, p50 %gms, p99 %gms)",
+                stage,
+                totals["items"],
+                totals["seconds"],
+                totals["rate"],
+                totals["p50"] * 1000,
+                totals["p99"] * 1000,
+            )
+
+    def write_json(self, path: str) -> None:
+        """Write the summary as JSON."""
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the stage metrics in the Prometheus textfile format, replacing the file atomically."""
+        labels = f'command="{self.command}"'
+        items_metric = f"{METRIC_PREFIX}_stage_items_total"
+        latency_metric = f"{METRIC_PREFIX}_stage_latency_seconds"
+        lines = [
+            f"# HELP {items_metric} Items processed per stage.",
+            f"# TYPE {items_metric} counter",
+        ]
+        with self._lock:
+            stages = list(self.stages.items())
+            for stage, stats in stages:
+                lines.append(f'{items_metric}{{{labels},stage="{stage}"}} {stats.items}')
+            lines.append(f"# HELP {latency_metric} Latency of timed stage calls.")
+            lines.append(f"# TYPE {latency_metric} histogram")
+            for stage, stats in stages:
+                stage_labels = f'{labels},stage="{stage}"'
+                cumulative = 0
+                for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), stats.latency.counts):
+                    cumulative += count
+                    lines.append(f'{latency_metric}_bucket{{{stage_labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{latency_metric}_sum{{{stage_labels}}} {stats.latency.sum}")
+                lines.append(f"{latency_metric}_count{{{stage_labels}}} {stats.latency.count}")
+
+        # The node exporter may read the file at any time, so never leave it half written
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary, path)
+
+
+_stats = Stats()
+
+
+def get_stats() -> Stats:
+    """Return the stats of the current run."""
+    return _stats
+
+
+def reset_stats(command: str = "", progress_interval: float = None, prometheus_file: str = None) -> Stats:
+    """Start collecting stats for a new run and return them."""
+    global _stats  # noqa: PLW0603
+    _stats = Stats(command, progress_interval, prometheus_file)
+    return _stats
+
+
+def finish_stats(stats_file: str = None, prometheus_file: str = None) -> None:
+    """Log the current run's summary and write it to the JSON and Prometheus files that were asked for."""
+    stats = get_stats()
+    stats.log_summary()
+    if stats_file:
+        stats.write_json(stats_file)
+    if prometheus_file:
+        stats.write_prometheus(prometheus_file)
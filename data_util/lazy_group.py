@@ -0,0 +1,50 @@
+"""A click group that imports each command's module only when the command is used."""
+
+from importlib import import_module
+
+import click
+
+
+class LazyGroup(click.Group):
+    """
+    A click group whose subcommands are given as "module:attribute" import paths.
+
+    A command's module, and with it pika, Faker or SQLAlchemy, is imported the first time
+    the command is looked up. Listing the commands in --help uses the short help given
+    alongside each import path, so it imports nothing.
+    """
+
+    def __init__(self, *args, lazy_commands: dict[str, tuple[str, str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Command name -> (import path, short help)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            self.add_command(self._load(cmd_name), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name: str) -> click.Command:
+        import_path, _ = self.lazy_commands[cmd_name]
+        module_name, attribute = import_path.split(":")
+        command = getattr(import_module(module_name), attribute)
+        if not isinstance(command, click.Command):
+            raise TypeError(f"{import_path} is not a click command")
+        return command
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        rows = []
+        for cmd_name in self.list_commands(ctx):
+            if cmd_name in self.commands:
+                command = self.commands[cmd_name]
+                if command.hidden:
+                    continue
+                rows.append((cmd_name, command.get_short_help_str(formatter.width)))
+            else:
+                rows.append((cmd_name, self.lazy_commands[cmd_name][1]))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
@@ -0,0 +1,73 @@
+"""Logging set up for the command line, with records written by a background thread."""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_LOG_FILE = "utility.log"
+# Passed as the log file to log to the console only
+CONSOLE_ONLY = "-"
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+LOG_FORMAT = "%(levelname)s - %(asctime)s - %(name)s - %(message)s"
+
+_listener: QueueListener = None
+_settings: tuple[str, str] = None
+
+
+def configure_logging(level: str = None, log_file: str = None) -> tuple[str, str]:
+    """
+    Send the package's log records through a queue to console and file handlers on a background thread.
+
+    Callers only pay for putting a record on the queue; formatting and writing happen on the
+    listener thread. level and log_file default to the LOG_LEVEL and LOG_FILE environment
+    variables, then to INFO and utility.log. A log_file of "-" logs to the console only.
+    Calling this again replaces the previous configuration.
+
+    Returns:
+    tuple[str, str]: The level and log file in use, for passing on to worker processes.
+    """
+    global _listener, _settings  # noqa: PLW0603
+    level = (level or os.getenv("LOG_LEVEL") or DEFAULT_LOG_LEVEL).upper()
+    log_file = log_file or os.getenv("LOG_FILE") or DEFAULT_LOG_FILE
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file != CONSOLE_ONLY:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    stop_logging()
+    records = queue.SimpleQueue()
+    logger = logging.getLogger("data_util")
+    for handler in [handler for handler in logger.handlers if isinstance(handler, QueueHandler)]:
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(records))
+    logger.setLevel(level)
+
+    _listener = QueueListener(records, *handlers)
+    _listener.start()
+    _settings = (level, log_file)
+    return _settings
+
+
+def logging_settings() -> tuple[str, str] | None:
+    """The level and log file of the current configuration, or None before configure_logging."""
+    return _settings
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the background writer."""
+    global _listener  # noqa: PLW0603
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(stop_logging)
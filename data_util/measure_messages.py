@@ -0,0 +1,342 @@
+"""Consume stamped messages and measure their end-to-end latency, gaps and duplicates."""
+
+import json
+import logging
+import sys
+import time
+from array import array
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+import click
+import numpy as np
+import pika
+from dotenv import load_dotenv
+
+from data_util.connections.rabbit_connection import (
+    HEADER_PUBLISHED_AT,
+    HEADER_RUN,
+    HEADER_SEQUENCE,
+    close_connection_pool,
+    get_connection_pool,
+)
+from data_util.replay_messages import default_exchange
+from data_util.scheduler import DEFAULT_REPORT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH = 1000
+DEFAULT_IDLE_TIMEOUT = 30.0
+# Seconds consume waits for a message before checking the time limits and reports
+POLL_INTERVAL = 1.0
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+@dataclass(frozen=True)
+class RunMeasurement:
+    """
+    What a consumer received of one stamped run.
+
+    missing counts the sequence numbers between the lowest and highest received that never
+    arrived, in gaps separate ranges; a shard or a run that is still publishing only covers
+    part of the run's sequence numbers. latency has the percentiles of LATENCY_PERCENTILES
+    (as "p50" and so on) and "max", in seconds from publish to receipt.
+    """
+
+    run: int
+    received: int
+    duplicates: int
+    missing: int
+    gaps: int
+    first_sequence: int
+    last_sequence: int
+    latency: dict[str, float]
+
+
+class LatencyMeter:
+    """
+    Collect the sequence numbers and end-to-end latencies of stamped messages, by run.
+
+    Both are kept as 8-byte integers per message and only analysed by measurements, so
+    observing a message costs two appends. Latencies compare the publisher's and the
+    consumer's clocks, so on different hosts they are only as good as the clock sync.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.unstamped = 0
+        self._sequences: dict[int, array] = {}
+        self._latencies: dict[int, array] = {}
+        # Latencies since the last progress line
+        self._recent = array("q")
+        self._reported = 0
+
+    def observe(self, headers: dict[str, Any] | None, received_at: int) -> None:
+        """Count a message received at received_at, in nanoseconds since the epoch."""
+        self.received += 1
+        try:
+            run, sequence, published_at = headers[HEADER_RUN], headers[HEADER_SEQUENCE], headers[HEADER_PUBLISHED_AT]
+        except (KeyError, TypeError):
+            self.unstamped += 1
+            return
+        if run not in self._sequences:
+            self._sequences[run] = array("q")
+            self._latencies[run] = array("q")
+        self._sequences[run].append(sequence)
+        self._latencies[run].append(received_at - published_at)
+        self._recent.append(received_at - published_at)
+
+    def log_progress(self, interval: float) -> None:
+        """Log the messages received and their latency since the last progress line, interval seconds ago."""
+        received = self.received - self._reported
+        latencies = np.frombuffer(self._recent, dtype=np.int64) / 1e9 if self._recent else None
+        if latencies is None:
+            logger.info("Received %s messages (%.0f msg/s)", received, received / interval if interval else 0)
+        else:
+            p50, p99 = np.percentile(latencies, (50, 99))
+            logger.info(
+                "Received %s messages (%.0f msg/s, latency p50 %.1fms, p99 %.1fms)",
+                received,
+                received / interval if interval else 0,
+                p50 * 1000,
+                p99 * 1000,
+            )
+        self._reported = self.received
+        self._recent = array("q")
+
+    def measurements(self) -> list[RunMeasurement]:
+        """The gaps, duplicates and latency percentiles of each run received, by run."""
+        results = []
+        for run in sorted(self._sequences):
+            sequences = np.frombuffer(self._sequences[run], dtype=np.int64)
+            latencies = np.frombuffer(self._latencies[run], dtype=np.int64) / 1e9
+            distinct = np.unique(sequences)
+            steps = np.diff(distinct)
+            names = (f"p{percentile:g}" for percentile in LATENCY_PERCENTILES)
+            percentiles = dict(zip(names, np.percentile(latencies, LATENCY_PERCENTILES).tolist()))
+            results.append(
+                RunMeasurement(
+                    run=run,
+                    received=len(sequences),
+                    duplicates=len(sequences) - len(distinct),
+                    missing=int((steps - 1).sum()),
+                    gaps=int((steps > 1).sum()),
+                    first_sequence=int(distinct[0]),
+                    last_sequence=int(distinct[-1]),
+                    latency={**percentiles, "max": float(latencies.max())},
+                )
+            )
+        return results
+
+
+def consume(  # noqa: PLR0913
+    channel: pika.adapters.blocking_connection.BlockingChannel,
+    queue: str,
+    meter: LatencyMeter,
+    count: int = None,
+    duration: float = None,
+    idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    report_interval: float = DEFAULT_REPORT_INTERVAL,
+    ack_every: int = 1,
+    clock: Callable[[], float] = time.monotonic,
+) -> None:
+    """
+    Measure the messages of a queue until count arrived, duration passed or none came for idle_timeout seconds.
+
+    Deliveries are acked every ack_every messages with one multiple ack, and the rest when
+    consuming stops, also on Ctrl-C.
+    """
+    started = reported = last_message = clock()
+    delivery_tag = None
+    unacked = 0
+
+    def finished(now: float) -> bool:
+        if count is not None and meter.received >= count:
+            return True
+        if duration is not None and now - started >= duration:
+            return True
+        if now - last_message >= idle_timeout:
+            logger.info("No messages for %.0fs", now - last_message)
+            return True
+        return False
+
+    try:
+        for method, properties, _body in channel.consume(queue, inactivity_timeout=POLL_INTERVAL):
+            now = clock()
+            if method is not None:
+                meter.observe(properties.headers, time.time_ns())
+                last_message = now
+                delivery_tag = method.delivery_tag
+                unacked += 1
+                if unacked >= ack_every:
+                    channel.basic_ack(delivery_tag, multiple=True)
+                    unacked = 0
+            if now - reported >= report_interval:
+                meter.log_progress(now - reported)
+                reported = now
+            if finished(now):
+                break
+    finally:
+        if unacked and channel.is_open:
+            channel.basic_ack(delivery_tag, multiple=True)
+        if channel.is_open:
+            channel.cancel()
+
+
+def log_measurements(meter: LatencyMeter, measurements: list[RunMeasurement], elapsed: float) -> None:
+    """Log the totals, and each run's gaps, duplicates and latency percentiles."""
+    logger.info(
+        "Received %s messages (%s without stamp headers) in %.2fs (%.0f msg/s)",
+        meter.received,
+        meter.unstamped,
+        elapsed,
+        meter.received / elapsed if elapsed else 0,
+    )
+    for measurement in measurements:
+        level = logging.WARNING if measurement.missing or measurement.duplicates else logging.INFO
+        logger.log(
+            level,
+            "Run %s: %s messages with sequence numbers %s to %s, %s missing in %s gaps, %s duplicates",
+            measurement.run,
+            measurement.received,
+            measurement.first_sequence,
+            measurement.last_sequence,
+            measurement.missing,
+            measurement.gaps,
+            measurement.duplicates,
+        )
+        logger.info(
+            "Run %s latency: %s",
+            measurement.run,
+            ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in measurement.latency.items()),
+        )
+
+
+@click.command()
+@click.argument("routing_keys", nargs=-1, required=True)
+@click.option(
+    "--config-file",
+    "-c",
+    default=None,
+    help="Choose a config file to load environment variables from.",
+)
+@click.option(
+    "--exchange",
+    default=None,
+    help="Exchange to bind to. Defaults to the one the queue commands use for the first routing key.",
+)
+@click.option(
+    "--queue",
+    default=None,
+    help="Durable queue to declare, bind and consume. Defaults to an exclusive queue deleted on exit.",
+)
+@click.option(
+    "--prefetch",
+    type=click.IntRange(min=1),
+    default=DEFAULT_PREFETCH,
+    help="Unacknowledged messages the broker may deliver ahead; acks go out once per half of it.",
+)
+@click.option(
+    "--count",
+    "-n",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Stop after this many messages.",
+)
+@click.option(
+    "--duration",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Stop after this many seconds.",
+)
+@click.option(
+    "--idle-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_IDLE_TIMEOUT,
+    help="Stop once no message arrived for this many seconds.",
+)
+@click.option(
+    "--report-interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_REPORT_INTERVAL,
+    help="Seconds between progress lines with the recent rate and latency.",
+)
+@click.option(
+    "--summary-file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write the totals and each run's measurements as JSON to this file.",
+)
+def queue_measure(  # noqa: PLR0913
+    routing_keys: tuple[str, ...],
+    config_file: str,
+    exchange: str,
+    queue: str,
+    prefetch: int,
+    count: int,
+    duration: float,
+    idle_timeout: float,
+    report_interval: float,
+    summary_file: str,
+) -> None:
+    """
+    Measure the end-to-end latency, gaps and duplicates of stamped messages.
+
+    Usage:
+    queue-measure [OPTIONS] ROUTING_KEY...
+
+    Binds a queue to each ROUTING_KEY (a model such as franchises, or a topic pattern such
+    as "#") and consumes it. Start it before publishing with queue-create --stamp or
+    queue-person-create --stamp, so the queue is bound before the first message.
+
+    Options:
+    -c, --config-file FILE Choose a config file to load environment variables from.
+    --exchange NAME Exchange to bind to.
+    --queue NAME Durable queue to declare and consume instead of an exclusive one.
+    --prefetch N Unacknowledged messages the broker may deliver ahead.
+    -n, --count N Stop after N messages.
+    --duration SECONDS Stop after SECONDS.
+    --idle-timeout SECONDS Stop once no message arrived for SECONDS.
+    --report-interval SECONDS Seconds between progress lines.
+    --summary-file FILE Write the measurements as JSON to FILE.
+    """
+    logger.info("Command: %s", " ".join(sys.argv))
+    if config_file:
+        load_dotenv(config_file)
+    else:
+        load_dotenv()
+    exchange = exchange or default_exchange(routing_keys[0])
+
+    meter = LatencyMeter()
+    started = time.perf_counter()
+    try:
+        channel = get_connection_pool().channel(exchange)
+        channel.basic_qos(prefetch_count=prefetch)
+        if queue:
+            channel.queue_declare(queue=queue, durable=True)
+        else:
+            queue = channel.queue_declare(queue="", exclusive=True, auto_delete=True).method.queue
+        for routing_key in routing_keys:
+            channel.queue_bind(queue=queue, exchange=exchange, routing_key=routing_key)
+        logger.info("Measuring %s on %s through queue %s", ", ".join(routing_keys), exchange, queue)
+        consume(channel, queue, meter, count, duration, idle_timeout, report_interval, max(1, prefetch // 2))
+    except KeyboardInterrupt:
+        logger.warning("Interrupted")
+    finally:
+        close_connection_pool()
+
+    elapsed = time.perf_counter() - started
+    measurements = meter.measurements()
+    log_measurements(meter, measurements, elapsed)
+    if summary_file:
+        with open(summary_file, "w") as file:
+            json.dump(
+                {
+                    "received": meter.received,
+                    "unstamped": meter.unstamped,
+                    "elapsed": elapsed,
+                    "runs": [asdict(measurement) for measurement in measurements],
+                },
+                file,
+                indent=2,
+            )
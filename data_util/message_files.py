@@ -0,0 +1,111 @@
+"""Pre-generated message files: newline-delimited JSON, and length-prefixed frames with routing keys."""
+
+import struct
+from typing import Iterator
+
+# A frames file starts with FRAMES_MAGIC and the messages' content type, then holds one
+# frame per message: routing key length (1 byte), body length (4 bytes, big-endian),
+# routing key, body.
+FRAMES_MAGIC = b"DUFRAMES1\n"
+CONTENT_TYPE_HEADER = struct.Struct(">H")
+FRAME_HEADER = struct.Struct(">BI")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Bytes scanned at a time when counting NDJSON lines
+COUNT_WINDOW_SIZE = 16 * 1024 * 1024
+
+
+def frames_header(content_type: str) -> bytes:
+    """The start of a frames file whose bodies have content_type."""
+    encoded = content_type.encode()
+    return FRAMES_MAGIC + CONTENT_TYPE_HEADER.pack(len(encoded)) + encoded
+
+
+def encode_frame(routing_key: bytes, body: bytes) -> bytes:
+    """One message of a frames file."""
+    return FRAME_HEADER.pack(len(routing_key), len(body)) + routing_key + body
+
+
+def is_frames_file(buffer: bytes) -> bool:
+    """Whether buffer holds a frames file rather than NDJSON."""
+    return buffer[: len(FRAMES_MAGIC)] == FRAMES_MAGIC
+
+
+def is_compressed(buffer: bytes) -> bool:
+    """Whether buffer holds a gzip or zstd file, which has to be decompressed before replaying."""
+    return buffer[: len(GZIP_MAGIC)] == GZIP_MAGIC or buffer[: len(ZSTD_MAGIC)] == ZSTD_MAGIC
+
+
+def read_frames_header(buffer: bytes) -> tuple[str, int]:
+    """Return the content type of a frames file and the offset of its first frame."""
+    offset = len(FRAMES_MAGIC)
+    (length,) = CONTENT_TYPE_HEADER.unpack_from(buffer, offset)
+    offset += CONTENT_TYPE_HEADER.size
+    return bytes(buffer[offset : offset + length]).decode(), offset + length
+
+
+def iter_frames(buffer: bytes, offset: int) -> Iterator[tuple[str, bytes]]:
+    """
+    Yield the routing key and body of each frame from offset on.
+
+    buffer can be an mmap; each body is one slice of it, so nothing is parsed or re-encoded.
+    A ValueError is raised at a truncated frame.
+    """
+    unpack_from = FRAME_HEADER.unpack_from
+    header_size = FRAME_HEADER.size
+    end = len(buffer)
+    routing_keys: dict[bytes, str] = {}
+    while offset < end:
+        if offset + header_size > end:
+            raise ValueError(f"Truncated frame header at byte {offset}")
+        key_length, body_length = unpack_from(buffer, offset)
+        offset += header_size
+        body_start = offset + key_length
+        body_end = body_start + body_length
+        if body_end > end:
+            raise ValueError(f"Truncated frame at byte {offset - header_size}")
+        key = buffer[offset:body_start]
+        routing_key = routing_keys.get(key)
+        if routing_key is None:
+            routing_key = routing_keys[key] = key.decode()
+        yield routing_key, buffer[body_start:body_end]
+        offset = body_end
+
+
+def iter_lines(buffer: bytes) -> Iterator[bytes]:
+    """Yield each non-empty line of an NDJSON buffer, such as an mmap, without its newline."""
+    find = buffer.find
+    start = 0
+    end = len(buffer)
+    while start < end:
+        newline = find(b"\n", start)
+        if newline == -1:
+            newline = end
+        if newline > start:
+            yield buffer[start:newline]
+        start = newline + 1
+
+
+def count_messages(buffer: bytes) -> int:
+    """
+    The number of messages in a frames or NDJSON buffer, without copying their bodies.
+
+    NDJSON lines are counted by newline, so blank lines, which are not replayed, count too.
+    """
+    if is_frames_file(buffer):
+        _, offset = read_frames_header(buffer)
+        unpack_from = FRAME_HEADER.unpack_from
+        count = 0
+        while offset < len(buffer):
+            key_length, body_length = unpack_from(buffer, offset)
+            offset += FRAME_HEADER.size + key_length + body_length
+            count += 1
+        return count
+
+    count = 0
+    for start in range(0, len(buffer), COUNT_WINDOW_SIZE):
+        count += buffer[start : start + COUNT_WINDOW_SIZE].count(b"\n")
+    # A last line without a newline is a message too
+    if buffer and buffer[-1:] != b"\n":
+        count += 1
+    return count
@@ -1,9 +1,283 @@
-from sqlalchemy import create_engine
+import csv
+import io
+import os
+import threading
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
 
+from sqlalchemy import Table, create_engine, func, insert, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import scoped_session, sessionmaker
 
-def get_engine(connection_string: str):
+from data_util.instrumentation import STAGE_INSERT, get_stats
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_COPY_CHUNK_SIZE = 10000
+# Marker written for NULL in COPY data, so empty strings stay empty strings
+COPY_NULL = "\\N"
+# What an upsert does with rows whose key is already taken
+UPSERT_SKIP = "skip"
+UPSERT_UPDATE = "update"
+
+_engines: dict[str, Engine] = {}
+_sessions: dict[str, scoped_session] = {}
+_registry_lock = threading.Lock()
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_engine(
+    connection_string: str,
+    pool_size: int = None,
+    pool_pre_ping: bool = None,
+    echo: bool = None,
+) -> Engine | None:
+    """
+    Return the process-wide engine for a connection string, creating it on first use.
+
+    Options left as None fall back to the DATABASE_POOL_SIZE, DATABASE_POOL_PRE_PING and
+    DATABASE_ECHO environment variables. They only apply when the engine is first created;
+    later calls for the same connection string share the existing engine and pool.
+    """
     if not connection_string:
         return None
-    else:
-        engine = create_engine(connection_string)
+
+    engine = _engines.get(connection_string)
+    if engine is not None:
         return engine
+
+    with _registry_lock:
+        engine = _engines.get(connection_string)
+        if engine is None:
+            if pool_size is None:
+                pool_size = int(os.getenv("DATABASE_POOL_SIZE", DEFAULT_POOL_SIZE))
+            if pool_pre_ping is None:
+                pool_pre_ping = _env_flag("DATABASE_POOL_PRE_PING", True)
+            if echo is None:
+                echo = _env_flag("DATABASE_ECHO", False)
+            engine = create_engine(connection_string, pool_size=pool_size, pool_pre_ping=pool_pre_ping, echo=echo)
+            _engines[connection_string] = engine
+    return engine
+
+
+def get_session(connection_string: str) -> scoped_session:
+    """Return the scoped session bound to the shared engine for a connection string."""
+    session = _sessions.get(connection_string)
+    if session is not None:
+        return session
+
+    engine = get_engine(connection_string)
+    if engine is None:
+        raise ValueError("A database connection string is required")
+
+    with _registry_lock:
+        session = _sessions.get(connection_string)
+        if session is None:
+            session = scoped_session(sessionmaker(bind=engine))
+            _sessions[connection_string] = session
+    return session
+
+
+def dispose_engines() -> None:
+    """Close all registered sessions and dispose of their engines' connection pools."""
+    with _registry_lock:
+        for session in _sessions.values():
+            session.remove()
+        for engine in _engines.values():
+            engine.dispose()
+        _sessions.clear()
+        _engines.clear()
+
+
+def batched(rows: Iterable[Any], batch_size: int) -> Iterator[list[Any]]:
+    """Split an iterable into lists of at most batch_size items."""
+    iterator = iter(rows)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def insert_batches(  # noqa: PLR0913
+    engine: Engine,
+    table: Table,
+    rows: Iterable[dict[str, Any]],
+    batch_size: int,
+    commit: bool = True,
+    on_batch: Callable[[int], None] = None,
+) -> int:
+    """
+    Insert plain row mappings into a table, one transaction per batch.
+
+    Each batch is sent as a single executemany, which SQLAlchemy renders as multi-row
+    INSERT statements. When commit is False every batch is rolled back instead.
+    on_batch is called with the size of every batch once its transaction has ended.
+
+    Returns:
+    int: The number of rows written.
+    """
+    total = 0
+    statement = insert(table)
+    stats = get_stats()
+    for batch in batched(rows, batch_size):
+        with stats.time(STAGE_INSERT, len(batch)), engine.connect() as connection:
+            connection.execute(statement, batch)
+            if commit:
+                connection.commit()
+            else:
+                connection.rollback()
+        total += len(batch)
+        if on_batch is not None:
+            on_batch(len(batch))
+    return total
+
+
+def insert_returning_ids(connection: Connection, table: Table, rows: list[dict[str, Any]]) -> list[int]:
+    """
+    Insert a batch of row mappings on an open connection and return their ids in row order.
+
+    The batch is sent as multi-row INSERT ... RETURNING statements, so the ids of a whole batch
+    come back with it instead of costing a round trip per row. The caller ends the transaction.
+    """
+    statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+    with get_stats().time(STAGE_INSERT, len(rows)):
+        return connection.execute(statement, rows).scalars().all()
+
+
+@dataclass
+class UpsertCounts:
+    """The rows an upsert inserted, updated, and skipped because their key was taken."""
+
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+
+def _upsert_statement(engine: Engine, table: Table, keys: tuple[str, ...], mode: str, columns: list[str]) -> Any:
+    if engine.dialect.name == "postgresql":
+        statement = postgresql.insert(table)
+    elif engine.dialect.name == "sqlite" and mode == UPSERT_SKIP:
+        statement = sqlite.insert(table)
+    else:
+        raise ValueError(f"Upserts with {mode} are not supported by the {engine.dialect.name} dialect")
+
+    if mode == UPSERT_SKIP:
+        # Only inserted rows are returned
+        return statement.on_conflict_do_nothing(index_elements=keys).returning(table.c.id)
+    updates = {column: statement.excluded[column] for column in columns if column not in keys}
+    # xmax is 0 for a row version the statement inserted, and set for one it updated
+    return statement.on_conflict_do_update(index_elements=keys, set_={**updates, "modified_on": func.now()}).returning(
+        literal_column("xmax = 0")
+    )
+
+
+def upsert_batches(  # noqa: PLR0913
+    engine: Engine,
+    table: Table,
+    rows: Iterable[dict[str, Any]],
+    batch_size: int,
+    keys: tuple[str, ...],
+    mode: str = UPSERT_SKIP,
+    commit: bool = True,
+    on_batch: Callable[[int], None] = None,
+) -> UpsertCounts:
+    """
+    Write row mappings with INSERT ... ON CONFLICT, one transaction per batch.
+
+    Rows whose keys, which need a unique constraint, are already in the table are skipped, or
+    with UPSERT_UPDATE have their other columns updated. The counts come from the RETURNING
+    rows of each batch, so existing rows cost no extra query. A key repeated within a batch
+    is only written once and the other rows count as skipped. Updates need PostgreSQL.
+    on_batch is called with the size of every batch once its transaction has ended.
+    """
+    counts = UpsertCounts()
+    statement = None
+    stats = get_stats()
+    for batch in batched(rows, batch_size):
+        unique_rows = list({tuple(row[key] for key in keys): row for row in batch}.values())
+        if statement is None:
+            statement = _upsert_statement(engine, table, keys, mode, list(batch[0]))
+        with stats.time(STAGE_INSERT, len(batch)), engine.connect() as connection:
+            returned = connection.execute(statement, unique_rows).scalars().all()
+            if commit:
+                connection.commit()
+            else:
+                connection.rollback()
+        if mode == UPSERT_SKIP:
+            counts.inserted += len(returned)
+        else:
+            counts.inserted += sum(returned)
+            counts.updated += len(returned) - sum(returned)
+        counts.skipped += len(batch) - len(returned)
+        if on_batch is not None:
+            on_batch(len(batch))
+    return counts
+
+
+def _copy_value(value: Any) -> Any:
+    return COPY_NULL if value is None else value
+
+
+def copy_rows(
+    engine: Engine,
+    table: Table,
+    rows: Iterable[dict[str, Any]],
+    chunk_size: int = DEFAULT_COPY_CHUNK_SIZE,
+    commit: bool = True,
+) -> int:
+    """
+    Stream row mappings into a PostgreSQL table with COPY ... FROM STDIN.
+
+    Rows are encoded as CSV into one in-memory buffer that is reused for every chunk of
+    chunk_size rows, so memory use does not grow with the number of rows. All chunks are
+    loaded in a single transaction. COPY does not apply SQLAlchemy column defaults, so the
+    rows must carry every column that needs a value; the columns are taken from the first row.
+
+    Returns:
+    int: The number of rows written.
+    """
+    if engine.dialect.name != "postgresql":
+        raise ValueError(f"COPY is not supported by the {engine.dialect.name} dialect")
+
+    preparer = engine.dialect.identifier_preparer
+    total = 0
+    stats = get_stats()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        columns = None
+        statement = None
+        for chunk in batched(rows, chunk_size):
+            if columns is None:
+                columns = list(chunk[0])
+                column_list = ", ".join(preparer.quote(column) for column in columns)
+                statement = (
+                    f"COPY {preparer.format_table(table)} ({column_list}) "
+                    f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+                )
+
+            with stats.time(STAGE_INSERT, len(chunk)):
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([_copy_value(row[column]) for column in columns] for row in chunk)
+                buffer.seek(0)
+                cursor.copy_expert(statement, buffer)
+            total += len(chunk)
+
+        if commit:
+            connection.commit()
+        else:
+            connection.rollback()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return total
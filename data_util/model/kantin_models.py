@@ -1,9 +1,11 @@
 from datetime import time
 from typing import Any
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, create_engine, func
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, UniqueConstraint, func
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship
+
+from data_util.model.data_operations import get_session
 
 Base = declarative_base()
 
@@ -16,9 +18,7 @@ class BaseModel(Base):
 
     def __init__(self, connection_string: str, **kw: Any):
         super().__init__(**kw)
-        engine = create_engine(connection_string, echo=True)
-        session_maker = sessionmaker(bind=engine)
-        self.session = session_maker()
+        self.session = get_session(connection_string)
 
     def create(self):
         self.session.add(self)
@@ -36,6 +36,7 @@ class BaseModel(Base):
 
 class FoodType(BaseModel):
     __tablename__ = "food_types"
+    __table_args__ = (UniqueConstraint("type_name", name="uq_food_types_type_name"),)
 
     type_name = Column(String(25), nullable=False)
     description = Column(String(250), nullable=True)
@@ -51,6 +52,7 @@ class FoodType(BaseModel):
 
 class Franchise(BaseModel):
     __tablename__ = "franchises"
+    __table_args__ = (UniqueConstraint("franchise_name", name="uq_franchises_franchise_name"),)
 
     franchise_name = Column(String(45), nullable=False)
     description = Column(String(250), nullable=True)
@@ -85,13 +87,14 @@ class Menu(BaseModel):
 
     menu_name = Column(String(45), nullable=False)
     description = Column(String(250), nullable=True)
-    menu_category_id: int = Column(Integer, ForeignKey("menu_category.id"), nullable=False)
+    menu_category_id: int = Column(Integer, ForeignKey("menu_categories.id"), nullable=True)
     # menu = relationship("MenuItem", uselist=False, backref="menu", cascade="all, delete-orphan")
 
     def __init__(self, connection_string: str, **kw: Any):
         super().__init__(connection_string, **kw)
         self.menu_name: str = kw.get("menu_name")
         self.description: str = kw.get("description")
+        self.menu_category_id = kw.get("menu_category_id")
 
     def __repr__(self):
         return f"<Menu {self.menu_name}>"
@@ -103,7 +106,7 @@ class MenuItem(BaseModel):
     item_name: str = Column(String(45), nullable=False)
     item_price: float = Column(Float, nullable=False)
     description: str = Column(String(250), nullable=True)
-    menu_id: int = Column(Integer, ForeignKey("menu.id"), nullable=False)
+    menu_id: int = Column(Integer, ForeignKey("menus.id"), nullable=False)
 
     def __init__(self, connection_string: str, **kw: Any):
         super().__init__(connection_string, **kw)
@@ -145,10 +148,13 @@ class Restaurant(BaseModel):
 
     def __init__(self, connection_string: str, **kw: Any):
         super().__init__(connection_string, **kw)
-        self.restaurant_name = kw.get("item_name")
-        self.description = kw.get("description")
-        self.item_price = kw.get("item_price")
-        self.menu_id = kw.get("menu_id")
+        self.restaurant_name = kw.get("restaurant_name")
+        self.allow_pets = kw.get("allow_pets", True)
+        self.closing_hour = kw.get("closing_hour")
+        self.opening_hour = kw.get("opening_hour")
+        self.has_smoking_area = kw.get("has_smoking_area", False)
+        self.remarks = kw.get("remarks")
+        self.restaurant_owner_id = kw.get("restaurant_owner_id")
 
     def __repr__(self):
-        return f"<MenuItem {self.restaurant_name}>"
+        return f"<Restaurant {self.restaurant_name}>"
@@ -1,59 +1,42 @@
-import csv
-import logging
+import os
 
 from faker import Faker
 
-logger = logging.getLogger(__name__)
+from data_util.providers.word_list import load_word_list
+
+SUPPORTING_DATA_DIR = os.path.join(os.path.dirname(__file__), "supportingData")
+DISH_TYPES_FILE = os.path.join(SUPPORTING_DATA_DIR, "dish_types.csv")
+CUISINES_FILE = os.path.join(SUPPORTING_DATA_DIR, "cuisines.csv")
+INGREDIENTS_FILE = os.path.join(SUPPORTING_DATA_DIR, "ingredients.csv")
 
 
 class FoodTypeProvider(Faker):
-    def cuisine(self):
-        return self.random_element(elements=["Italian", "Chinese", "Indian", "Mexican", "Japanese"])
-
-    def dish_type(self):
-        dish_types = [
-            "Pizza",
-            "Burger",
-            "Sushi",
-            "Pasta",
-            "Steak",
-            "Salad",
-            "Soup",
-            "Tacos",
-            "Curry",
-            "Noodles",
-            "Sandwich",
-            "Rice Bowl",
-            "Fried Chicken",
-            "Ramen",
-            "Pho",
-            "Pad Thai",
-            "Burrito",
-            "Enchiladas",
-            "Lasagna",
-            "Paella",
-            "Spaghetti",
-            "Mac and Cheese",
-            "Chicken Stir Fry",
-            "Fish and Chips",
-            "Pancakes",
-            "Waffles",
-            "Omelette",
-            "Fruit Salad",
-            "Yogurt Parfait",
-        ]
-        return self.random_element(elements=dish_types)
-
-    def ingredient(self):
-        return self.random_element(elements=["Chicken", "Beef", "Lamb", "Vegetable", "Seafood"])
-
-    @staticmethod
-    def _load_list_from_csv(filename):
-        try:
-            with open(filename, "r") as file:
-                reader = csv.reader(file)
-                data = list(reader)[0]  # Assuming only one row of data
-            return data
-        except FileNotFoundError:
-            logger.error("Error: File %s not found.", filename)
-            return None
+    """
+    Faker with dish types, cuisines and ingredients drawn from CSV word lists.
+
+    Each list defaults to the packaged one in supportingData and can be replaced by a
+    larger, optionally weighted CSV file; see WordList.from_csv for the format. Files are
+    loaded once per process and shared by every provider that uses them.
+    """
+
+    def __init__(
+        self,
+        *args,
+        dish_types_file: str = DISH_TYPES_FILE,
+        cuisines_file: str = CUISINES_FILE,
+        ingredients_file: str = INGREDIENTS_FILE,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.dish_types = load_word_list(dish_types_file)
+        self.cuisines = load_word_list(cuisines_file)
+        self.ingredients = load_word_list(ingredients_file)
+
+    def cuisine(self) -> str:
+        return self.cuisines.sample(self.random)
+
+    def dish_type(self) -> str:
+        return self.dish_types.sample(self.random)
+
+    def ingredient(self) -> str:
+        return self.ingredients.sample(self.random)
@@ -0,0 +1,177 @@
+"""The catalog of menu categories and items in menu.txt, cached in a compact binary form."""
+
+import hashlib
+import logging
+import os
+import re
+import struct
+from array import array
+from dataclasses import dataclass
+from functools import cache, cached_property
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MENU_FILE = os.path.join(os.path.dirname(__file__), "supportingData", "menu.txt")
+# Set to a directory to keep catalog caches there instead of the user's cache directory
+CACHE_DIR_VARIABLE = "DATA_UTIL_CACHE_DIR"
+
+CACHE_MAGIC = b"DUMENU1\n"
+# Source size and mtime in nanoseconds, source SHA-256, category, item and string byte counts
+CACHE_HEADER = struct.Struct("<Qq32sIII")
+
+CATEGORY_LINE = re.compile(r"^\*\*(?P<name>.+?)\*\*$")
+ITEM_LINE = re.compile(r"^\d+\.\s+(?P<name>[^(]+?)\s*(?:\((?P<detail>.*)\))?$")
+
+
+@dataclass(frozen=True)
+class MenuCatalog:
+    """
+    Menu categories and their items.
+
+    Items are stored in category order: the items of category i are those from
+    category_starts[i] up to category_starts[i + 1]. An item's detail is the text in
+    parentheses after its name in menu.txt, or "" when it has none.
+    """
+
+    categories: tuple[str, ...]
+    category_starts: tuple[int, ...]
+    item_names: tuple[str, ...]
+    item_details: tuple[str, ...]
+
+    @cached_property
+    def item_categories(self) -> tuple[int, ...]:
+        """The index of each item's category."""
+        return tuple(category for category in range(len(self.categories)) for _ in self.category_items(category))
+
+    def category_items(self, category: int) -> range:
+        """The indexes of a category's items."""
+        return range(self.category_starts[category], self.category_starts[category + 1])
+
+
+def parse_menu(lines: Iterable[str]) -> MenuCatalog:
+    """Parse menu.txt's "**Category**" headings and the numbered items under each one."""
+    categories = []
+    category_starts = []
+    item_names = []
+    item_details = []
+    for raw_line in lines:
+        line = raw_line.strip()
+        if match := CATEGORY_LINE.match(line):
+            categories.append(match["name"])
+            category_starts.append(len(item_names))
+        elif categories and (match := ITEM_LINE.match(line)):
+            item_names.append(match["name"])
+            item_details.append(match["detail"] or "")
+    category_starts.append(len(item_names))
+    # Drop headings without items so every category can be sampled from
+    kept = [index for index in range(len(categories)) if category_starts[index] < category_starts[index + 1]]
+    return MenuCatalog(
+        tuple(categories[index] for index in kept),
+        tuple(category_starts[index] for index in kept) + (len(item_names),),
+        tuple(item_names),
+        tuple(item_details),
+    )
+
+
+def _cache_path(path: str, cache_dir: str) -> str:
+    name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"menu-{name}.bin")
+
+
+def default_cache_dir() -> str:
+    """$DATA_UTIL_CACHE_DIR, or data_util in the user's cache directory."""
+    if os.getenv(CACHE_DIR_VARIABLE):
+        return os.getenv(CACHE_DIR_VARIABLE)
+    return os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "data_util")
+
+
+def encode_catalog(catalog: MenuCatalog, size: int, mtime_ns: int, digest: bytes) -> bytes:
+    """The binary cache form of a catalog parsed from a source file of the given size, mtime and SHA-256."""
+    strings = [*catalog.categories, *catalog.item_names, *catalog.item_details]
+    encoded = [string.encode() for string in strings]
+    offsets = array("I", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    header = CACHE_HEADER.pack(size, mtime_ns, digest, len(catalog.categories), len(catalog.item_names), offsets[-1])
+    return b"".join([CACHE_MAGIC, header, array("I", catalog.category_starts).tobytes(), offsets.tobytes(), *encoded])
+
+
+def decode_catalog(data: bytes) -> tuple[MenuCatalog, int, int, bytes]:
+    """
+    Read the binary cache form of a catalog.
+
+    Returns:
+    tuple: The catalog, and the size, mtime and SHA-256 of the file it was parsed from.
+    """
+    if data[: len(CACHE_MAGIC)] != CACHE_MAGIC:
+        raise ValueError("Not a menu catalog cache")
+    offset = len(CACHE_MAGIC)
+    size, mtime_ns, digest, category_count, item_count, _ = CACHE_HEADER.unpack_from(data, offset)
+    offset += CACHE_HEADER.size
+
+    def read_array(length: int) -> array:
+        nonlocal offset
+        values = array("I")
+        values.frombytes(data[offset : offset + length * values.itemsize])
+        offset += length * values.itemsize
+        return values
+
+    category_starts = read_array(category_count + 1)
+    string_count = category_count + 2 * item_count
+    offsets = read_array(string_count + 1)
+    strings = [data[offset + offsets[index] : offset + offsets[index + 1]].decode() for index in range(string_count)]
+    catalog = MenuCatalog(
+        tuple(strings[:category_count]),
+        tuple(category_starts),
+        tuple(strings[category_count : category_count + item_count]),
+        tuple(strings[category_count + item_count :]),
+    )
+    return catalog, size, mtime_ns, digest
+
+
+def load_menu_catalog(path: str = DEFAULT_MENU_FILE, cache_dir: str = None) -> MenuCatalog:
+    """
+    Load the catalog in a menu file, through its binary cache.
+
+    The cache is used as it is while the file's size and mtime match; otherwise it is still
+    used, and refreshed, if the file's SHA-256 matches. A missing, stale or unreadable
+    cache is rebuilt from the file. Failing to write the cache is not an error.
+    """
+    cache_path = _cache_path(path, cache_dir or default_cache_dir())
+    status = os.stat(path)
+    cached = None
+    try:
+        with open(cache_path, "rb") as file:
+            cached = decode_catalog(file.read())
+    except (OSError, ValueError, struct.error, UnicodeDecodeError):
+        pass
+    if cached is not None and cached[1:3] == (status.st_size, status.st_mtime_ns):
+        return cached[0]
+
+    with open(path, "rb") as file:
+        source = file.read()
+    digest = hashlib.sha256(source).digest()
+    if cached is not None and cached[3] == digest:
+        catalog = cached[0]
+    else:
+        catalog = parse_menu(source.decode().splitlines())
+        logger.debug(
+            "Parsed %s menu items in %s categories from %s", len(catalog.item_names), len(catalog.categories), path
+        )
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(encode_catalog(catalog, status.st_size, status.st_mtime_ns, digest))
+        os.replace(temporary, cache_path)
+    except OSError as e:
+        logger.debug("Could not cache the menu catalog in %s: %s", cache_path, e)
+    return catalog
+
+
+@cache
+def get_menu_catalog() -> MenuCatalog:
+    """The catalog of the packaged menu.txt, loaded once per process."""
+    return load_menu_catalog()
@@ -0,0 +1,111 @@
+"""Compact, optionally weighted word lists for the fake data providers."""
+
+import csv
+import logging
+import math
+from array import array
+from bisect import bisect_right
+from functools import cache
+from random import Random
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class WordList:
+    """
+    Words stored in one UTF-8 buffer with an array of offsets into it.
+
+    A list of N words costs the UTF-8 bytes of the words plus 8 bytes of offset per word,
+    and 8 more bytes per word for its cumulative weight when the words are not equally
+    likely, instead of a Python string object per word. Sampling is O(1) for equally
+    likely words and a bisect of the cumulative weights otherwise.
+    """
+
+    def __init__(self, words: Iterable[str | tuple[str, float]]):
+        """
+        Build a list from words, each either a word or a (word, weight) pair.
+
+        Weights are relative and default to 1. A negative or infinite weight, or a list whose weights
+        add up to 0, raises ValueError.
+        """
+        self._buffer = bytearray()
+        self._offsets = array("Q", [0])
+        cumulative = array("d")
+        total = 0.0
+        weighted = False
+        for entry in words:
+            word, weight = entry if isinstance(entry, tuple) else (entry, 1.0)
+            weight = float(weight)
+            if weight < 0 or not math.isfinite(weight):
+                raise ValueError(f"Invalid weight {weight} for {word!r}")
+            weighted = weighted or weight != 1.0
+            self._buffer += word.encode()
+            self._offsets.append(len(self._buffer))
+            total += weight
+            cumulative.append(total)
+        if len(self) and total == 0:
+            raise ValueError("The weights of a word list cannot all be 0")
+        # Equally likely words are sampled by index, so their weights are not kept
+        self._cumulative = cumulative if weighted else None
+
+    @classmethod
+    def from_csv(cls, path: str) -> "WordList":
+        """
+        Stream a word list from a CSV file.
+
+        A row of a word and a number is a weighted word. Any other row is a list of equally
+        likely words, so both one word per line and one row of comma-separated words work.
+        Empty cells are skipped.
+        """
+        with open(path, newline="", encoding="utf-8") as file:
+            word_list = cls(_read_words(csv.reader(file)))
+        logger.debug("Loaded %s words from %s", len(word_list), path)
+        return word_list
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("word list index out of range")
+        return self._buffer[self._offsets[index] : self._offsets[index + 1]].decode()
+
+    @property
+    def weighted(self) -> bool:
+        """Whether some words are more likely than others."""
+        return self._cumulative is not None
+
+    def sample_index(self, random: Random) -> int:
+        """The index of a word drawn with random, following the weights."""
+        if self._cumulative is None:
+            return random.randrange(len(self))
+        return bisect_right(self._cumulative, random.random() * self._cumulative[-1])
+
+    def sample(self, random: Random) -> str:
+        """A word drawn with random, following the weights."""
+        return self[self.sample_index(random)]
+
+
+def _read_words(rows: Iterable[list[str]]) -> Iterable[str | tuple[str, float]]:
+    for row in rows:
+        match row:
+            case [word, weight] if word.strip() and _parse_weight(weight) is not None:
+                yield word.strip(), _parse_weight(weight)
+            case _:
+                yield from (cell.strip() for cell in row if cell.strip())
+
+
+def _parse_weight(cell: str) -> float | None:
+    try:
+        return float(cell)
+    except ValueError:
+        return None
+
+
+@cache
+def load_word_list(path: str) -> WordList:
+    """The word list in a CSV file, loaded once per process."""
+    return WordList.from_csv(path)
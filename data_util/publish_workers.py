@@ -0,0 +1,325 @@
+"""Publish a queue run's messages from several processes, each with its own connection and share of the run."""
+
+import logging
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from itertools import islice
+from multiprocessing.synchronize import Event
+from typing import Any, Callable, Iterable, Iterator
+
+from data_util.connections.rabbit_connection import (
+    CheckpointingPublisher,
+    ConfirmedPublisher,
+    StampingPublisher,
+    close_connection_pool,
+    publish_message_to_exchange,
+)
+from data_util.envelopes import Envelope, record_count
+from data_util.generators import GENERATOR_FAKER, MODEL_LABELS
+from data_util.instrumentation import get_stats
+from data_util.logging_config import configure_logging, logging_settings
+from data_util.runs import RunPlan, split_range
+from data_util.serializers import SERIALIZER_JSON, Serializer, get_serializer
+from data_util.uniqueness import record_range
+
+logger = logging.getLogger(__name__)
+
+# Records between checks of the stop event, so a stopped worker ends within one timing batch
+STOP_CHECK_INTERVAL = 500
+
+# Exit status of a run stopped with Ctrl-C, as a shell reports a process killed by SIGINT
+EXIT_INTERRUPTED = 130
+
+# Set by the parent on Ctrl-C; workers finish their current batch and settle in-flight messages
+_stop_event: Event = None
+
+# Publishes records on a channel-like publisher: (channel, model, records, exchange, serializer, envelope)
+PublishRecords = Callable[[Any, str, Iterable[dict[str, Any]], str, Serializer, Envelope | None], None]
+
+
+@dataclass(frozen=True)
+class PublishJob:
+    """
+    The share of a queue run published by one process.
+
+    The job publishes count messages of the run from record start on with publish_records,
+    a module-level function of the command so it can be sent to a spawned process.
+    part_start is where the share began before any resume, and keys the share's progress
+    in the checkpoint file. With unique, natural keys are unique among all records of the
+    run. With stamp, messages carry the headers of a StampingPublisher, and with an envelope
+    each holds up to envelope.size records.
+    """
+
+    index: int
+    model: str
+    start: int
+    count: int
+    seed: int
+    publish_records: PublishRecords
+    exchange: str = None
+    generator: str = GENERATOR_FAKER
+    config_file: str = None
+    confirm_window: int = 0
+    serializer: str = SERIALIZER_JSON
+    part_start: int = 0
+    checkpoint: str = None
+    unique: bool = False
+    stamp: bool = False
+    envelope: Envelope = None
+
+
+@dataclass(frozen=True)
+class PublishResult:
+    """
+    The outcome of a PublishJob.
+
+    published counts the records of the messages handed to the channel, and messages the
+    messages themselves, fewer than the records with an envelope. With publisher confirms the
+    broker's answers to the messages are split into confirmed, nacked, returned and
+    unconfirmed. interrupted is set when the job stopped early because the run was interrupted.
+    """
+
+    index: int
+    requested: int
+    published: int
+    elapsed: float
+    messages: int = 0
+    confirmed: int = 0
+    nacked: int = 0
+    returned: int = 0
+    unconfirmed: int = 0
+    error: str = None
+    stats: dict[str, Any] = None
+    interrupted: bool = False
+
+    @property
+    def rate(self) -> float:
+        """Records published per second."""
+        return self.published / self.elapsed if self.elapsed else 0
+
+
+class _CountingPublisher:
+    """Count the messages handed to a channel-like publisher, which publishes them by keyword, and their records."""
+
+    def __init__(self, publisher: Any):
+        self.publisher = publisher
+        self.published = 0
+        self.messages = 0
+
+    def basic_publish(self, **kwargs) -> None:
+        self.publisher.basic_publish(**kwargs)
+        self.published += record_count(kwargs.get("properties"))
+        self.messages += 1
+
+
+def split_publish_jobs(plan: RunPlan, workers: int, **options: Any) -> list[PublishJob]:
+    """
+    Split a run's remaining messages into one job per worker, leaving out finished shares.
+
+    options are the PublishJob fields every job shares, such as model and publish_records.
+    """
+    jobs = []
+    for index, (part_start, part_stop) in enumerate(split_range(plan.first, plan.stop, workers)):
+        start = plan.progress.get(part_start, part_start)
+        jobs.append(
+            PublishJob(
+                index=index,
+                start=start,
+                count=part_stop - start,
+                seed=plan.seed,
+                part_start=part_start,
+                **options,
+            )
+        )
+    return [job for job in jobs if job.count]
+
+
+def run_publish_jobs(jobs: list[PublishJob]) -> list[PublishResult]:
+    """
+    Run publish jobs in a process pool and log each worker's and the run's totals.
+
+    Workers ignore SIGINT. On Ctrl-C the parent asks them to stop instead: each finishes
+    the batch it is publishing, waits for the confirms of its in-flight messages and saves
+    its checkpoint progress, so the summary still accounts for every message sent. A
+    second Ctrl-C stops waiting.
+    """
+    if not jobs:
+        logger.info("Nothing left to publish")
+        return []
+    total = sum(job.count for job in jobs)
+    label = MODEL_LABELS[jobs[0].model]
+    logger.info("Publishing %s %s with %s workers", total, label, len(jobs))
+
+    results = []
+    started = time.perf_counter()
+    # Spawned workers start without the parent's connections or Faker state
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    with ProcessPoolExecutor(
+        max_workers=len(jobs),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(stop, logging_settings()),
+    ) as executor:
+        futures = {executor.submit(run_publish_job, job): job for job in jobs}
+        pending = set(futures)
+        while pending:
+            try:
+                for future in as_completed(pending):
+                    pending.discard(future)
+                    results.append(_job_result(future, futures[future]))
+                    _log_worker_result(results[-1], label)
+            except KeyboardInterrupt:
+                if stop.is_set():
+                    raise
+                logger.warning("Interrupted: waiting for %s workers to settle their in-flight messages", len(pending))
+                stop.set()
+
+    results.sort(key=lambda result: result.index)
+    _log_run_totals(results, label, time.perf_counter() - started, any(job.confirm_window for job in jobs))
+    return results
+
+
+def exit_status(results: list[PublishResult]) -> int:
+    """The exit status of a run: 1 if a worker failed, 130 if it was interrupted, else 0."""
+    if any(result.error is not None for result in results):
+        return 1
+    if any(result.interrupted for result in results):
+        return EXIT_INTERRUPTED
+    return 0
+
+
+def _init_worker(stop: Event, settings: tuple[str, str] | None) -> None:
+    global _stop_event  # noqa: PLW0603
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _stop_event = stop
+    if settings:
+        configure_logging(*settings)
+
+
+def _job_result(future: Any, job: PublishJob) -> PublishResult:
+    try:
+        result = future.result()
+    except Exception as e:
+        # The worker process itself died, so none of its messages can be accounted for
+        return PublishResult(job.index, job.count, 0, 0.0, error=repr(e))
+    if result.stats is not None:
+        get_stats().merge(result.stats)
+    return result
+
+
+def run_publish_job(job: PublishJob) -> PublishResult:
+    """Publish one job's range of the run's messages on its own connection."""
+    stats = get_stats()
+    serializer = get_serializer(job.serializer)
+    records = record_range(job.model, job.start, job.start + job.count, job.seed, job.generator, job.unique)
+
+    started = time.perf_counter()
+    publisher = counter = sink = None
+    error = None
+    try:
+        channel = publish_message_to_exchange(config_file=job.config_file)
+        publisher = ConfirmedPublisher(job.exchange, job.confirm_window) if job.confirm_window else channel
+        sink = CheckpointingPublisher(publisher, job.checkpoint, job.part_start, job.start) if job.checkpoint else None
+        stamped = StampingPublisher(sink or publisher, job.seed, job.start) if job.stamp else sink or publisher
+        counter = _CountingPublisher(stamped)
+        logger.info("Worker %s publishing %s %s", job.index, job.count, MODEL_LABELS[job.model])
+        job.publish_records(counter, job.model, _until_stopped(records), job.exchange, serializer, job.envelope)
+        if job.confirm_window:
+            publisher.wait_for_confirms()
+    except Exception as e:
+        logger.exception("Worker %s failed to publish %s", job.index, job.model)
+        error = repr(e)
+    finally:
+        if sink is not None:
+            sink.save()
+        if isinstance(publisher, ConfirmedPublisher):
+            publisher.close()
+        close_connection_pool()
+
+    published, messages = (counter.published, counter.messages) if counter is not None else (0, 0)
+    tracker = getattr(publisher, "tracker", None)
+    confirms = {}
+    if tracker is not None:
+        confirms = {
+            "confirmed": tracker.confirmed,
+            "nacked": tracker.nacked,
+            "returned": tracker.returned,
+            "unconfirmed": tracker.in_flight,
+        }
+    return PublishResult(
+        job.index,
+        job.count,
+        published,
+        time.perf_counter() - started,
+        messages=messages,
+        error=error,
+        stats=stats.summary(),
+        interrupted=error is None and published < job.count and _stopped(),
+        **confirms,
+    )
+
+
+def _stopped() -> bool:
+    return _stop_event is not None and _stop_event.is_set()
+
+
+def _until_stopped(records: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """Yield records until the run is interrupted, checking every STOP_CHECK_INTERVAL records."""
+    iterator = iter(records)
+    while not _stopped() and (chunk := list(islice(iterator, STOP_CHECK_INTERVAL))):
+        yield from chunk
+
+
+def _log_worker_result(result: PublishResult, label: str) -> None:
+    if result.error is not None:
+        logger.error(
+            "Worker %s failed after publishing %s of %s %s: %s",
+            result.index,
+            result.published,
+            result.requested,
+            label,
+            result.error,
+        )
+        return
+    logger.info(
+        "Worker %s published %s of %s %s in %.2fs (%.0f msg/s)",
+        result.index,
+        result.published,
+        result.requested,
+        label,
+        result.elapsed,
+        result.rate,
+    )
+
+
+def _log_run_totals(results: list[PublishResult], label: str, elapsed: float, confirms: bool) -> None:
+    published = sum(result.published for result in results)
+    requested = sum(result.requested for result in results)
+    logger.info(
+        "Published %s of %s %s with %s workers in %.2fs (%.0f msg/s)",
+        published,
+        requested,
+        label,
+        len(results),
+        elapsed,
+        published / elapsed if elapsed else 0,
+    )
+    if confirms:
+        nacked = sum(result.nacked for result in results)
+        returned = sum(result.returned for result in results)
+        unconfirmed = sum(result.unconfirmed for result in results)
+        logger.log(
+            logging.WARNING if nacked or returned or unconfirmed else logging.INFO,
+            "Confirmed %s of %s messages (%s nacked, %s returned, %s unconfirmed)",
+            sum(result.confirmed for result in results),
+            sum(result.messages for result in results),
+            nacked,
+            returned,
+            unconfirmed,
+        )
+    if any(result.interrupted for result in results):
+        logger.warning("Stopped early with %s of %s %s left unpublished", requested - published, requested, label)
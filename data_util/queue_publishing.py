@@ -0,0 +1,637 @@
+"""Publishing runs shared by the queue commands, which differ in their models, exchange and persistence."""
+
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
+
+import click
+import pika
+from dotenv import load_dotenv
+from faker import Faker
+
+from data_util.connections.async_publisher import DEFAULT_CHANNELS, Message, publish_messages
+from data_util.connections.rabbit_connection import (
+    CheckpointingPublisher,
+    ConfirmedPublisher,
+    StampingPublisher,
+    close_connection_pool,
+    get_connection_parameters,
+    get_connection_pool,
+    publish_message_to_exchange,
+)
+from data_util.envelopes import (
+    DEFAULT_ENVELOPE_SIZE,
+    ENVELOPE_COMPRESSIONS,
+    ENVELOPES,
+    Envelope,
+    envelope_from_options,
+    envelope_messages,
+    publish_envelopes,
+)
+from data_util.generators import (
+    GENERATOR_BATCH,
+    GENERATOR_FAKER,
+    MODEL_LABELS,
+    BatchRecordGenerator,
+    generate_records,
+)
+from data_util.instrumentation import (
+    DEFAULT_PROGRESS_INTERVAL,
+    STAGE_GENERATE,
+    STAGE_PUBLISH,
+    STAGE_SERIALIZE,
+    finish_stats,
+    get_stats,
+    reset_stats,
+)
+from data_util.publish_workers import exit_status, run_publish_jobs, split_publish_jobs
+from data_util.runs import RunPlan, plan_run
+from data_util.scheduler import (
+    DEFAULT_PERIODIC_BATCH,
+    DEFAULT_REPORT_INTERVAL,
+    RateProfile,
+    profile_from_options,
+    run_schedule,
+)
+from data_util.serializers import JSON_SERIALIZER, SERIALIZER_JSON, SERIALIZERS, Serializer, get_serializer
+from data_util.uniqueness import record_range
+
+logger = logging.getLogger(__name__)
+
+# Publishing engines
+ENGINE_BLOCKING = "blocking"
+ENGINE_ASYNC = "async"
+
+
+@dataclass(frozen=True)
+class QueueCommand:
+    """
+    What sets a queue command apart: its name, the models it publishes, the environment
+    variable naming its exchange, and whether its messages are persistent.
+    """
+
+    name: str
+    models: tuple[str, ...]
+    exchange_variable: str
+    persistent: bool = False
+
+    @property
+    def exchange(self) -> str:
+        """The exchange the command publishes to, once its environment variables are loaded."""
+        return os.getenv(self.exchange_variable)
+
+
+def publish_messages_for_model(  # noqa: PLR0913
+    channel: pika.channel.Channel,
+    model: str,
+    count: int,
+    faker: Faker,
+    exchange: str,
+    batch_generator: BatchRecordGenerator = None,
+    serializer: Serializer = JSON_SERIALIZER,
+    records: Iterator[dict[str, str]] = None,
+    envelope: Envelope = None,
+    persistent: bool = False,
+    models: Iterable[str] = tuple(MODEL_LABELS),
+) -> None:
+    """
+    Publish messages for a specific model type, taking COUNT records from records when given.
+
+    Models other than models are logged as unknown. With an envelope, each message holds up
+    to envelope.size records.
+    """
+    if model not in models:
+        logger.error("Unknown model: %s", model)
+        return
+    if records is None:
+        records = generate_records(model, count, faker, batch_generator)
+    else:
+        records = islice(records, count)
+    logger.info("Creating %s %s", count, MODEL_LABELS[model])
+    publish_records(channel, model, records, exchange, serializer, envelope, persistent)
+    logger.info("Created %s %s", count, MODEL_LABELS[model])
+
+
+def publish_records(  # noqa: PLR0913
+    channel: pika.channel.Channel,
+    model: str,
+    records: Iterable[dict[str, str]],
+    exchange: str,
+    serializer: Serializer = JSON_SERIALIZER,
+    envelope: Envelope = None,
+    persistent: bool = False,
+) -> None:
+    """Publish one message per record, or per envelope of records, routed by model type."""
+    if envelope is not None:
+        publish_envelopes(channel, model, records, exchange, serializer, envelope, persistent)
+        return
+    stats = get_stats()
+    dumps = serializer.dumps
+    properties = serializer.properties(persistent)
+    for chunk in stats.timed_batches(records, STAGE_GENERATE):
+        with stats.time(STAGE_SERIALIZE, len(chunk)):
+            bodies = [dumps(message) for message in chunk]
+        with stats.time(STAGE_PUBLISH, len(chunk)):
+            for body in bodies:
+                channel.basic_publish(
+                    exchange=exchange,
+                    routing_key=model,
+                    body=body,
+                    properties=properties,
+                )
+
+
+def generate_messages(
+    model: str,
+    records: Iterable[dict[str, str]],
+    serializer: Serializer = JSON_SERIALIZER,
+    envelope: Envelope = None,
+    persistent: bool = False,
+) -> Iterator[Message]:
+    """Serialize records, or envelopes of them, as messages routed by model type."""
+    if envelope is not None:
+        yield from envelope_messages(model, records, serializer, envelope, persistent)
+        return
+    stats = get_stats()
+    dumps = serializer.dumps
+    properties = serializer.properties(persistent)
+    for chunk in stats.timed_batches(records, STAGE_GENERATE):
+        with stats.time(STAGE_SERIALIZE, len(chunk)):
+            messages = [(model, dumps(message), properties) for message in chunk]
+        yield from messages
+
+
+# Options of every queue command after its MODEL and COUNT arguments, in --help order
+QUEUE_OPTIONS = (
+    click.option(
+        "--config-file",
+        "-c",
+        default=None,
+        help="Choose a config file to load environment variables from.",
+    ),
+    click.option(
+        "--periodic-run/--real-run",
+        "-p",
+        default=False,
+        help="When true messages are sent periodically for the number of count.",
+    ),
+    click.option(
+        "--generator",
+        "-g",
+        type=click.Choice([GENERATOR_FAKER, GENERATOR_BATCH]),
+        default=GENERATOR_FAKER,
+        help="Generate each field with Faker, or sample batches from prebuilt Faker value pools.",
+    ),
+    click.option(
+        "--confirm-window",
+        type=click.IntRange(min=0),
+        default=0,
+        help="Use publisher confirms with at most this many unconfirmed messages in flight (0 disables confirms).",
+    ),
+    click.option(
+        "--engine",
+        "-e",
+        type=click.Choice([ENGINE_BLOCKING, ENGINE_ASYNC]),
+        default=ENGINE_BLOCKING,
+        help="Publish on one blocking channel, or on several asyncio channels while generating.",
+    ),
+    click.option(
+        "--channels",
+        type=click.IntRange(min=1),
+        default=DEFAULT_CHANNELS,
+        help="Number of channels used by the async engine.",
+    ),
+    click.option(
+        "--rate",
+        type=click.FloatRange(min=0, min_open=True),
+        default=None,
+        help="With --periodic-run, publish COUNT messages at this many messages per second.",
+    ),
+    click.option(
+        "--profile",
+        default=None,
+        help="With --periodic-run, publish COUNT messages following a rate profile spec (or @FILE).",
+    ),
+    click.option(
+        "--report-interval",
+        type=click.FloatRange(min=0, min_open=True),
+        default=DEFAULT_REPORT_INTERVAL,
+        help="Seconds between achieved vs. target rate reports of a periodic run.",
+    ),
+    click.option(
+        "--serializer",
+        "-s",
+        type=click.Choice(SERIALIZERS),
+        default=SERIALIZER_JSON,
+        help="Message body encoding: json, orjson or msgpack (sets the message content type).",
+    ),
+    click.option(
+        "--envelope",
+        type=click.Choice(ENVELOPES),
+        default=None,
+        help="Pack up to --envelope-size records into each message, as one array or as length-prefixed frames.",
+    ),
+    click.option(
+        "--envelope-size",
+        type=click.IntRange(min=1),
+        default=DEFAULT_ENVELOPE_SIZE,
+        help="Records per message with --envelope.",
+    ),
+    click.option(
+        "--envelope-compression",
+        type=click.Choice(ENVELOPE_COMPRESSIONS),
+        default=ENVELOPE_COMPRESSIONS[0],
+        help="Compress each envelope with zlib or lz4 (lz4 needs the lz4 package).",
+    ),
+    click.option(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for the fake data generators. Message K of a run only depends on the seed, model and generator.",
+    ),
+    click.option(
+        "--shard",
+        default=None,
+        help="Only publish shard i of N (as i/N, numbered from 0) of the run's messages.",
+    ),
+    click.option(
+        "--start-offset",
+        type=click.IntRange(min=0),
+        default=0,
+        help="Index of the run's first message, to continue an earlier run with new messages.",
+    ),
+    click.option(
+        "--checkpoint",
+        type=click.Path(dir_okay=False, writable=True),
+        default=None,
+        help="Record published (or, with --confirm-window, confirmed) messages in this file and resume from it.",
+    ),
+    click.option(
+        "--unique/--no-unique",
+        default=False,
+        help="Make natural keys such as names unique across the run and all its shards, suffixing repeated ones.",
+    ),
+    click.option(
+        "--stamp/--no-stamp",
+        default=False,
+        help="Stamp the run's seed, each message's index in the run and its publish time into its headers.",
+    ),
+    click.option(
+        "--workers",
+        "-w",
+        type=click.IntRange(min=1),
+        default=1,
+        help="Publish from this many processes, each with its own connection and share of the run's messages.",
+    ),
+    click.option(
+        "--progress-interval",
+        type=click.FloatRange(min=0, min_open=True),
+        default=DEFAULT_PROGRESS_INTERVAL,
+        help="Seconds between progress lines with the rate of each stage.",
+    ),
+    click.option(
+        "--stats-file",
+        type=click.Path(dir_okay=False, writable=True),
+        default=None,
+        help="Write a JSON summary of per-stage counts, rates and latencies to this file.",
+    ),
+    click.option(
+        "--prometheus-file",
+        type=click.Path(dir_okay=False, writable=True),
+        default=None,
+        help="Keep per-stage metrics in this Prometheus textfile, updated with every progress line.",
+    ),
+)
+
+
+def queue_options(function: Callable) -> Callable:
+    """Add the options of every queue command to a click command, which passes them on to publish_run."""
+    for option in reversed(QUEUE_OPTIONS):
+        function = option(function)
+    return function
+
+
+def publish_run(  # noqa: PLR0913
+    command: QueueCommand,
+    model: str,
+    count: int,
+    config_file: str,
+    periodic_run: bool,
+    generator: str,
+    confirm_window: int,
+    engine: str,
+    channels: int,
+    rate: float,
+    profile: str,
+    report_interval: float,
+    serializer: str,
+    envelope: str,
+    envelope_size: int,
+    envelope_compression: str,
+    seed: int,
+    shard: str,
+    start_offset: int,
+    checkpoint: str,
+    unique: bool,
+    stamp: bool,
+    workers: int,
+    progress_interval: float,
+    stats_file: str,
+    prometheus_file: str,
+) -> None:
+    """Run a queue command: publish COUNT messages for a model with the options of queue_options."""
+    logger.info("Command: %s", " ".join(sys.argv))
+    if config_file:
+        load_dotenv(config_file)
+    else:
+        load_dotenv()
+    if (rate is not None or profile is not None) and not periodic_run:
+        raise click.UsageError("--rate and --profile require --periodic-run")
+    try:
+        rate_profile = profile_from_options(rate, profile)
+    except (OSError, ValueError) as e:
+        raise click.UsageError(str(e)) from e
+    try:
+        message_serializer = get_serializer(serializer)
+        message_envelope = envelope_from_options(envelope, envelope_size, envelope_compression)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+
+    _check_publish_options(engine, periodic_run, checkpoint, stamp, workers, message_envelope)
+
+    # A periodic run without a rate sends COUNT batches
+    total = count * DEFAULT_PERIODIC_BATCH if periodic_run and rate_profile is None else count
+    try:
+        plan = plan_run(
+            {
+                "command": command.name,
+                "model": model,
+                "count": total,
+                "seed": seed,
+                "generator": generator,
+                "start_offset": start_offset,
+                "unique": unique,
+                # Workers split the run into parts with their own checkpoint progress
+                **({"workers": workers} if workers > 1 else {}),
+            },
+            shard,
+            checkpoint,
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    records = record_range(model, plan.start, plan.stop, plan.seed, generator, unique)
+    reset_stats(command.name, progress_interval, prometheus_file)
+
+    if workers > 1:
+        try:
+            _publish_messages_in_workers(
+                command,
+                model,
+                plan,
+                workers,
+                generator,
+                config_file,
+                confirm_window,
+                checkpoint,
+                unique,
+                serializer,
+                stamp,
+                message_envelope,
+            )
+        finally:
+            finish_stats(stats_file, prometheus_file)
+        return
+
+    if engine == ENGINE_ASYNC:
+        try:
+            _publish_messages_async(
+                command,
+                model,
+                plan.stop - plan.start,
+                records,
+                channels,
+                confirm_window,
+                message_serializer,
+                message_envelope,
+            )
+        finally:
+            finish_stats(stats_file, prometheus_file)
+        return
+
+    try:
+        _publish_messages_blocking(
+            command,
+            model,
+            plan,
+            records,
+            config_file,
+            periodic_run,
+            confirm_window,
+            checkpoint,
+            rate_profile,
+            report_interval,
+            message_serializer,
+            stamp,
+            message_envelope,
+        )
+    finally:
+        close_connection_pool()
+        finish_stats(stats_file, prometheus_file)
+
+
+def _check_publish_options(  # noqa: PLR0913
+    engine: str,
+    periodic_run: bool,
+    checkpoint: str,
+    stamp: bool,
+    workers: int,
+    envelope: Envelope,
+) -> None:
+    """Reject options the chosen engine, number of workers or envelope does not support."""
+    if engine == ENGINE_ASYNC and (periodic_run or checkpoint or stamp):
+        raise click.UsageError("--periodic-run, --checkpoint and --stamp are not supported by the async engine")
+    if workers > 1 and (engine == ENGINE_ASYNC or periodic_run):
+        raise click.UsageError("--workers is not supported by the async engine or with --periodic-run")
+    # Checkpoints and stamps count messages, which are no longer records in an envelope
+    if envelope is not None and (checkpoint or stamp):
+        raise click.UsageError("--checkpoint and --stamp cannot be used with --envelope")
+
+
+def _publish_periodically(  # noqa: PLR0913
+    command: QueueCommand,
+    channel: pika.channel.Channel,
+    model: str,
+    count: int,
+    records: Iterator[dict[str, str]],
+    rate_profile: RateProfile = None,
+    report_interval: float = DEFAULT_REPORT_INTERVAL,
+    serializer: Serializer = JSON_SERIALIZER,
+    envelope: Envelope = None,
+) -> None:
+    """
+    Publish COUNT messages from records in batches of DEFAULT_PERIODIC_BATCH 5 seconds apart or,
+    with a rate profile, paced to the profile's target rate.
+    """
+    sleep = get_connection_pool().sleep
+    if rate_profile is None:
+        run_schedule(
+            RateProfile.default(),
+            lambda size: publish_messages_for_model(
+                channel,
+                model,
+                size,
+                None,
+                command.exchange,
+                serializer=serializer,
+                records=records,
+                envelope=envelope,
+                persistent=command.persistent,
+                models=command.models,
+            ),
+            count,
+            min_batch=DEFAULT_PERIODIC_BATCH,
+            max_batch=DEFAULT_PERIODIC_BATCH,
+            report_interval=report_interval,
+            sleep=sleep,
+        )
+        return
+
+    if model not in command.models:
+        logger.error("Unknown model: %s", model)
+        return
+
+    logger.info("Creating %s %s", count, MODEL_LABELS[model])
+    report = run_schedule(
+        rate_profile,
+        lambda size: publish_records(
+            channel, model, islice(records, size), command.exchange, serializer, envelope, command.persistent
+        ),
+        count,
+        report_interval=report_interval,
+        sleep=sleep,
+    )
+    logger.info("Created %s %s", report.sent, MODEL_LABELS[model])
+
+
+def _publish_messages_blocking(  # noqa: PLR0913
+    command: QueueCommand,
+    model: str,
+    plan: RunPlan,
+    records: Iterator[dict[str, str]],
+    config_file: str,
+    periodic_run: bool,
+    confirm_window: int,
+    checkpoint: str,
+    rate_profile: RateProfile,
+    report_interval: float,
+    serializer: Serializer = JSON_SERIALIZER,
+    stamp: bool = False,
+    envelope: Envelope = None,
+) -> None:
+    """Publish a run's messages for a specific model type on one blocking channel, stamping their headers if asked."""
+    channel = publish_message_to_exchange(config_file=config_file)
+    publisher = ConfirmedPublisher(command.exchange, confirm_window) if confirm_window else channel
+    sink = CheckpointingPublisher(publisher, checkpoint, plan.first, plan.start) if checkpoint else publisher
+    # Messages are numbered by their index in the run, which plan.start is the first of
+    stamped = StampingPublisher(sink, plan.seed, plan.start) if stamp else sink
+
+    count = plan.stop - plan.start
+    try:
+        if periodic_run:
+            _publish_periodically(
+                command, stamped, model, count, records, rate_profile, report_interval, serializer, envelope
+            )
+        else:
+            publish_messages_for_model(
+                stamped,
+                model,
+                count,
+                None,
+                command.exchange,
+                serializer=serializer,
+                records=records,
+                envelope=envelope,
+                persistent=command.persistent,
+                models=command.models,
+            )
+
+        if confirm_window:
+            publisher.wait_for_confirms()
+            publisher.log_summary()
+    finally:
+        if checkpoint:
+            sink.save()
+        if confirm_window:
+            publisher.close()
+
+
+def _publish_messages_in_workers(  # noqa: PLR0913
+    command: QueueCommand,
+    model: str,
+    plan: RunPlan,
+    workers: int,
+    generator: str,
+    config_file: str,
+    confirm_window: int,
+    checkpoint: str,
+    unique: bool,
+    serializer: str,
+    stamp: bool,
+    envelope: Envelope,
+) -> None:
+    """Publish a run's messages for a specific model type from several processes, exiting if any failed."""
+    if model not in command.models:
+        logger.error("Unknown model: %s", model)
+        return
+
+    jobs = split_publish_jobs(
+        plan,
+        workers,
+        model=model,
+        # A partial of a module-level function, so it can be sent to spawned workers
+        publish_records=partial(publish_records, persistent=command.persistent),
+        exchange=command.exchange,
+        generator=generator,
+        config_file=config_file,
+        confirm_window=confirm_window,
+        serializer=serializer,
+        checkpoint=checkpoint,
+        unique=unique,
+        stamp=stamp,
+        envelope=envelope,
+    )
+    if status := exit_status(run_publish_jobs(jobs)):
+        sys.exit(status)
+
+
+def _publish_messages_async(  # noqa: PLR0913
+    command: QueueCommand,
+    model: str,
+    count: int,
+    records: Iterator[dict[str, str]],
+    channels: int,
+    confirm_window: int,
+    serializer: Serializer = JSON_SERIALIZER,
+    envelope: Envelope = None,
+) -> None:
+    """Publish messages for a specific model type with the asyncio engine."""
+    if model not in command.models:
+        logger.error("Unknown model: %s", model)
+        return
+
+    logger.info("Creating %s %s", count, MODEL_LABELS[model])
+    published = publish_messages(
+        generate_messages(model, islice(records, count), serializer, envelope, command.persistent),
+        command.exchange,
+        get_connection_parameters(),
+        channel_count=channels,
+        confirm_window=confirm_window,
+    )
+    if envelope is not None:
+        logger.info("Created %s %s in %s envelopes", count, MODEL_LABELS[model], published)
+    else:
+        logger.info("Created %s %s", published, MODEL_LABELS[model])
@@ -0,0 +1,303 @@
+"""Publish pre-generated message files as they are, so publish runs do not pay for generating messages."""
+
+import logging
+import mmap
+import os
+import sys
+from itertools import chain, islice
+from typing import Iterator, Mapping
+
+import click
+import pika
+from dotenv import load_dotenv
+
+from data_util.connections.rabbit_connection import (
+    ConfirmedPublisher,
+    RabbitConnectionPool,
+    close_connection_pool,
+    get_connection_pool,
+)
+from data_util.generators import MODEL_LABELS, MODEL_PERSON
+from data_util.instrumentation import (
+    DEFAULT_PROGRESS_INTERVAL,
+    DEFAULT_TIMING_BATCH,
+    STAGE_PUBLISH,
+    finish_stats,
+    get_stats,
+    reset_stats,
+)
+from data_util.message_files import (
+    count_messages,
+    is_compressed,
+    is_frames_file,
+    iter_frames,
+    iter_lines,
+    read_frames_header,
+)
+from data_util.scheduler import DEFAULT_REPORT_INTERVAL, RateProfile, profile_from_options, run_schedule
+
+logger = logging.getLogger(__name__)
+
+NDJSON_CONTENT_TYPE = "application/json"
+
+
+def default_exchange(routing_key: str) -> str:
+    """The exchange the queue commands publish a model's messages to."""
+    return os.getenv("ACTOR_EXCHANGE" if routing_key == MODEL_PERSON else "EXCHANGE")
+
+
+class ExchangeRoutes(dict):
+    """
+    The exchange of each routing key in a replayed file, declared the first time it is seen.
+
+    Every key goes to exchange when given. Otherwise each model goes to the exchange the
+    queue commands publish it to, so a file that mixes people with other models is split
+    between ACTOR_EXCHANGE and EXCHANGE.
+    """
+
+    def __init__(self, pool: RabbitConnectionPool, exchange: str = None):
+        super().__init__()
+        self.pool = pool
+        self.exchange = exchange
+
+    def __missing__(self, routing_key: str) -> str:
+        exchange = self.exchange or default_exchange(routing_key)
+        if not exchange:
+            raise ValueError(f"No exchange for {routing_key} messages; set --exchange or the environment variable")
+        self.pool.release(self.pool.channel(exchange))
+        self[routing_key] = exchange
+        return exchange
+
+
+def read_messages(buffer: bytes, model: str = None) -> tuple[str, Iterator[tuple[str, bytes]]]:
+    """
+    Return the content type of a message file and an iterator of its routing keys and bodies.
+
+    Frames files carry a routing key per message, which model replaces when given. NDJSON
+    files need model as the routing key of every line. Invalid files raise ValueError.
+    """
+    if is_compressed(buffer):
+        raise ValueError("Compressed files cannot be replayed; decompress the file first")
+    if is_frames_file(buffer):
+        content_type, offset = read_frames_header(buffer)
+        messages = iter_frames(buffer, offset)
+        if model is not None:
+            messages = ((model, body) for _, body in messages)
+        return content_type, messages
+    if model is None:
+        raise ValueError("NDJSON files need --model for the messages' routing key")
+    return NDJSON_CONTENT_TYPE, ((model, line) for line in iter_lines(buffer))
+
+
+def publish_bodies(
+    channel: pika.channel.Channel,
+    messages: Iterator[tuple[str, bytes]],
+    exchanges: Mapping[str, str],
+    properties: pika.BasicProperties,
+    count: int = None,
+) -> int:
+    """
+    Publish up to count messages (all by default) as they are and return the number published.
+
+    Each message goes to the exchange exchanges maps its routing key to.
+    """
+    stats = get_stats()
+    publish = channel.basic_publish
+    published = 0
+    remaining = islice(messages, count)
+    while chunk := list(islice(remaining, DEFAULT_TIMING_BATCH)):
+        with stats.time(STAGE_PUBLISH, len(chunk)):
+            for routing_key, body in chunk:
+                publish(exchange=exchanges[routing_key], routing_key=routing_key, body=body, properties=properties)
+        published += len(chunk)
+    return published
+
+
+def _replay(  # noqa: PLR0913
+    buffer: bytes,
+    model: str,
+    exchange: str,
+    count: int,
+    rate_profile: RateProfile,
+    report_interval: float,
+    confirm_window: int,
+    persistent: bool,
+) -> int:
+    """Publish the messages of a mapped file, returning the number published."""
+    content_type, messages = read_messages(buffer, model)
+    first = next(messages, None)
+    if first is None:
+        return 0
+    messages = chain([first], messages)
+
+    pool = get_connection_pool()
+    exchanges = ExchangeRoutes(pool, exchange)
+    first_exchange = exchanges[first[0]]
+    publisher = ConfirmedPublisher(first_exchange, confirm_window) if confirm_window else pool.channel()
+    properties = pika.BasicProperties(
+        content_type=content_type,
+        delivery_mode=pika.DeliveryMode.Persistent if persistent else None,
+    )
+
+    try:
+        if rate_profile is None:
+            published = publish_bodies(publisher, messages, exchanges, properties, count)
+        else:
+            total = count_messages(buffer)
+            report = run_schedule(
+                rate_profile,
+                lambda size: publish_bodies(publisher, messages, exchanges, properties, size),
+                min(total, count) if count else total,
+                report_interval=report_interval,
+                sleep=pool.sleep,
+            )
+            published = report.sent
+
+        if confirm_window:
+            publisher.wait_for_confirms()
+            publisher.log_summary()
+    finally:
+        if confirm_window:
+            publisher.close()
+    return published
+
+
+@click.command()
+@click.argument("file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--config-file",
+    "-c",
+    default=None,
+    help="Choose a config file to load environment variables from.",
+)
+@click.option(
+    "--model",
+    "-m",
+    type=click.Choice(list(MODEL_LABELS)),
+    default=None,
+    help="Routing key of the messages. Required for NDJSON files; frames files carry their own.",
+)
+@click.option(
+    "--exchange",
+    default=None,
+    help="Exchange to publish every message to. Defaults to the one the queue commands use for each message's model.",
+)
+@click.option(
+    "--count",
+    "-n",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Publish at most this many messages. The whole file by default.",
+)
+@click.option(
+    "--rate",
+    type=click.FloatRange(min=0, min_open=True),
+    default=None,
+    help="Publish at this many messages per second.",
+)
+@click.option(
+    "--profile",
+    default=None,
+    help="Publish following a rate profile spec (or @FILE).",
+)
+@click.option(
+    "--report-interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_REPORT_INTERVAL,
+    help="Seconds between achieved vs. target rate reports of a paced run.",
+)
+@click.option(
+    "--confirm-window",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Use publisher confirms with at most this many unconfirmed messages in flight (0 disables confirms).",
+)
+@click.option(
+    "--persistent/--transient",
+    default=False,
+    help="Publish persistent messages.",
+)
+@click.option(
+    "--progress-interval",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_PROGRESS_INTERVAL,
+    help="Seconds between progress lines with the rate of each stage.",
+)
+@click.option(
+    "--stats-file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write a JSON summary of per-stage counts, rates and latencies to this file.",
+)
+@click.option(
+    "--prometheus-file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Keep per-stage metrics in this Prometheus textfile, updated with every progress line.",
+)
+def queue_replay(  # noqa: PLR0913
+    file: str,
+    config_file: str,
+    model: str,
+    exchange: str,
+    count: int,
+    rate: float,
+    profile: str,
+    report_interval: float,
+    confirm_window: int,
+    persistent: bool,
+    progress_interval: float,
+    stats_file: str,
+    prometheus_file: str,
+) -> None:
+    """
+    Publish the messages of a pre-generated file.
+
+    Usage:
+    queue-replay [OPTIONS] FILE
+
+    FILE is an uncompressed NDJSON or frames file written by the export command. The file is
+    memory-mapped and each message body is published byte-for-byte as it is in the file.
+
+    Options:
+    -c, --config-file FILE Choose a config file to load environment variables from.
+    -m, --model MODEL Routing key of the messages (required for NDJSON files).
+    --exchange NAME Exchange to publish every message to.
+    -n, --count N Publish at most N messages.
+    --rate N Publish at N messages per second.
+    --profile SPEC Follow a rate profile such as "ramp:10:500:60;constant:500".
+    --report-interval SECONDS Seconds between achieved vs. target rate reports.
+    --confirm-window N Use publisher confirms with at most N unconfirmed messages in flight.
+    --persistent Publish persistent messages.
+    --progress-interval SECONDS Seconds between per-stage progress lines.
+    --stats-file FILE Write a JSON summary of per-stage counts, rates and latencies.
+    --prometheus-file FILE Keep per-stage metrics in a Prometheus textfile.
+    """
+    logger.info("Command: %s", " ".join(sys.argv))
+    if config_file:
+        load_dotenv(config_file)
+    else:
+        load_dotenv()
+    try:
+        rate_profile = profile_from_options(rate, profile)
+    except (OSError, ValueError) as e:
+        raise click.UsageError(str(e)) from e
+
+    if os.path.getsize(file) == 0:
+        logger.info("%s has no messages", file)
+        return
+
+    reset_stats("queue-replay", progress_interval, prometheus_file)
+    with open(file, "rb") as message_file, mmap.mmap(message_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            buffer.madvise(mmap.MADV_SEQUENTIAL)
+        try:
+            published = _replay(
+                buffer, model, exchange, count, rate_profile, report_interval, confirm_window, persistent
+            )
+        except ValueError as e:
+            raise click.UsageError(f"{file}: {e}") from e
+        finally:
+            close_connection_pool()
+            finish_stats(stats_file, prometheus_file)
+    logger.info("Replayed %s messages from %s", published, file)
@@ -0,0 +1,158 @@
+"""Helpers for splitting generation runs across workers and hosts, and resuming them."""
+
+import hashlib
+import json
+import logging
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Number of items between checkpoint writes of runs that do not checkpoint per batch
+DEFAULT_CHECKPOINT_INTERVAL = 1000
+
+
+@dataclass(frozen=True)
+class RunPlan:
+    """The records [first, stop) of a seeded run that one invocation covers, resuming from start."""
+
+    seed: int
+    first: int
+    start: int
+    stop: int
+    progress: dict[int, int] = field(default_factory=dict)
+
+
+def new_seed() -> int:
+    """Pick a random base seed for a run that was not given one."""
+    return random.SystemRandom().randrange(2**32)
+
+
+def derive_seed(seed: int, index: int) -> int:
+    """Derive a deterministic, well-mixed seed for the index-th part of a run."""
+    digest = hashlib.blake2b(f"{seed}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def split_count(count: int, parts: int) -> list[int]:
+    """Split COUNT into parts that differ in size by at most one."""
+    share, remainder = divmod(count, parts)
+    return [share + 1 if index < remainder else share for index in range(parts)]
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse a shard given as "i/N", numbered from 0, into (i, N)."""
+    try:
+        index, shards = (int(part) for part in value.split("/"))
+    except ValueError as e:
+        raise ValueError(f"Shard {value!r} is not of the form i/N") from e
+    if shards < 1 or not 0 <= index < shards:
+        raise ValueError(f"Shard {value!r} needs 0 <= i < N")
+    return index, shards
+
+
+def shard_range(count: int, start_offset: int = 0, shard: tuple[int, int] = (0, 1)) -> tuple[int, int]:
+    """
+    The record indexes [start, stop) a shard covers of a run of count records from start_offset.
+
+    Shards split the run into contiguous ranges that differ in size by at most one.
+    """
+    index, shards = shard
+    shares = split_count(count, shards)
+    start = start_offset + sum(shares[:index])
+    return start, start + shares[index]
+
+
+def split_range(start: int, stop: int, parts: int) -> list[tuple[int, int]]:
+    """Split [start, stop) into contiguous ranges that differ in size by at most one."""
+    ranges = []
+    for share in split_count(stop - start, parts):
+        ranges.append((start, start + share))
+        start += share
+    return ranges
+
+
+def load_checkpoint(path: str, params: dict[str, Any]) -> tuple[dict[str, Any], dict[int, int]]:
+    """
+    Open a run's checkpoint file, creating it for a new run.
+
+    The first line holds the run's parameters. Every later line records that the part of
+    the run starting at record "start" has finished every record before "next". A missing
+    seed in params is taken from the file, or picked with new_seed for a new run; any other
+    difference is a ValueError, because resuming with other parameters would not produce the
+    records of the original run.
+
+    Returns:
+    tuple: The run's parameters, and the record to resume each part from, keyed by its start.
+    """
+    if not os.path.exists(path):
+        if params.get("seed") is None:
+            params = {**params, "seed": new_seed()}
+        with open(path, "w") as file:
+            file.write(json.dumps({"params": params}) + "\n")
+        return params, {}
+
+    with open(path, "r") as file:
+        saved = json.loads(file.readline())["params"]
+        progress = {}
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                progress[entry["start"]] = max(progress.get(entry["start"], 0), entry["next"])
+
+    if params.get("seed") is None:
+        params = {**params, "seed": saved["seed"]}
+    if params != saved:
+        differences = ", ".join(f"{key}={saved.get(key)!r}" for key in saved if saved.get(key) != params.get(key))
+        raise ValueError(f"Checkpoint {path} belongs to a run with {differences}")
+    return params, progress
+
+
+def prepare_run(checkpoint: str | None, params: dict[str, Any]) -> tuple[dict[str, Any], dict[int, int]]:
+    """
+    Settle a run's parameters, loading or creating its checkpoint file if it has one.
+
+    Returns:
+    tuple: The run's parameters with a seed picked if none was given, and the progress
+    recorded in the checkpoint file, as returned by load_checkpoint.
+    """
+    if checkpoint:
+        return load_checkpoint(checkpoint, params)
+    if params.get("seed") is None:
+        params = {**params, "seed": new_seed()}
+    return params, {}
+
+
+def record_checkpoint(path: str, start: int, next_record: int) -> None:
+    """
+    Record that the part of a run starting at start has finished every record before next_record.
+
+    Each entry is appended with a single write to a file opened with O_APPEND, so worker
+    processes can share the checkpoint file.
+    """
+    line = json.dumps({"start": start, "next": next_record}) + "\n"
+    descriptor = os.open(path, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(descriptor, line.encode())
+    finally:
+        os.close(descriptor)
+
+
+def plan_run(params: dict[str, Any], shard: str = None, checkpoint: str = None) -> RunPlan:
+    """
+    Settle a run's seed and the records a shard of it covers, resuming from a checkpoint file.
+
+    params needs the run's "count", "start_offset" and "seed" (None to pick one) along with
+    anything else that changes the records; the shard is added to it. Invalid shards and
+    checkpoints of other runs raise ValueError.
+    """
+    index, shards = parse_shard(shard) if shard else (0, 1)
+    settled, progress = prepare_run(checkpoint, {**params, "shard": f"{index}/{shards}"})
+    if params.get("seed") is None:
+        logger.info("Using seed %s", settled["seed"])
+    if progress:
+        logger.info("Resuming from checkpoint %s", checkpoint)
+    first, stop = shard_range(params["count"], params["start_offset"], (index, shards))
+    return RunPlan(settled["seed"], first, progress.get(first, first), stop, progress)
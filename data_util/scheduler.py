@@ -0,0 +1,254 @@
+"""Rate-targeted pacing for periodic publishing runs."""
+
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPORT_INTERVAL = 10.0
+# Pacing of --periodic-run without a rate or profile: COUNT batches of 10 messages, 5 seconds apart
+DEFAULT_PERIODIC_BATCH = 10
+DEFAULT_PERIODIC_INTERVAL = 5.0
+# Longest single sleep, so rate changes and reports are never missed by much
+MAX_SLEEP = 0.1
+MIN_SLEEP = 1e-6
+# Allowance for floating point error when counting whole tokens
+TOKEN_EPSILON = 1e-9
+
+
+class TokenBucket:
+    """
+    A token bucket refilled from the clock at a rate that may change between calls.
+
+    Refills are computed from the time actually elapsed, so late wake-ups do not lower the
+    achieved rate: the tokens they missed are already waiting at the next take().
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic, full: bool = True):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity if full else 0.0
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate from now on."""
+        self._refill()
+        self.rate = rate
+
+    def take(self, minimum: int, maximum: int) -> int:
+        """Take as many whole tokens as are available, up to maximum, or none if fewer than minimum."""
+        self._refill()
+        available = min(int(self.tokens + TOKEN_EPSILON), maximum)
+        if available < minimum:
+            return 0
+        self.tokens -= available
+        return available
+
+    def time_until(self, count: int) -> float:
+        """Seconds until count tokens will be available at the current rate."""
+        self._refill()
+        if int(self.tokens + TOKEN_EPSILON) >= count:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return max((count - self.tokens) / self.rate, MIN_SLEEP)
+
+
+@dataclass(frozen=True)
+class Segment:
+    """One part of a rate profile. Rates are in messages per second."""
+
+    kind: str
+    duration: float
+    start_rate: float
+    end_rate: float = 0.0
+    rates: tuple[float, ...] = ()
+    amplitude: float = 0.0
+    period: float = 0.0
+
+    def rate_at(self, elapsed: float) -> float:
+        """Target rate at a number of seconds into the segment."""
+        if self.kind == "ramp":
+            return self.start_rate + (self.end_rate - self.start_rate) * min(1.0, elapsed / self.duration)
+        if self.kind == "step":
+            step_length = self.duration / len(self.rates)
+            return self.rates[min(int(elapsed // step_length), len(self.rates) - 1)]
+        if self.kind == "sine":
+            return max(0.0, self.start_rate + self.amplitude * math.sin(2 * math.pi * elapsed / self.period))
+        return self.start_rate
+
+
+class RateProfile:
+    """
+    A sequence of rate segments, parsed from a spec of ';' or newline separated entries:
+
+    - constant:RATE[:SECONDS]
+    - ramp:START_RATE:END_RATE:SECONDS
+    - step:RATE,RATE,...:SECONDS_PER_STEP
+    - sine:MEAN_RATE:AMPLITUDE:PERIOD_SECONDS:SECONDS
+
+    Text after '#' is ignored. Only the last segment may leave out its duration, in which
+    case the profile runs until the message count is reached.
+    """
+
+    def __init__(self, segments: list[Segment]):
+        if not segments:
+            raise ValueError("A rate profile needs at least one segment")
+        if any(math.isinf(segment.duration) for segment in segments[:-1]):
+            raise ValueError("Only the last profile segment may run without a duration")
+        self.segments = segments
+        self.duration = sum(segment.duration for segment in segments)
+
+    @classmethod
+    def constant(cls, rate: float) -> "RateProfile":
+        """A profile that holds one rate until the message count is reached."""
+        return cls([Segment("constant", math.inf, rate)])
+
+    @classmethod
+    def default(cls) -> "RateProfile":
+        """The pacing of a periodic run without a rate or profile."""
+        return cls.constant(DEFAULT_PERIODIC_BATCH / DEFAULT_PERIODIC_INTERVAL)
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateProfile":
+        """Parse a profile spec, or read it from a file when the spec is @PATH."""
+        if spec.startswith("@"):
+            with open(spec[1:], "r") as file:
+                spec = file.read()
+
+        segments = []
+        for line in spec.replace(";", "\n").splitlines():
+            entry = line.split("#", 1)[0].strip()
+            if entry:
+                segments.append(_parse_segment(entry))
+        return cls(segments)
+
+    def rate_at(self, elapsed: float) -> float:
+        """Target rate at a number of seconds into the profile."""
+        for segment in self.segments:
+            if elapsed < segment.duration:
+                return segment.rate_at(elapsed)
+            elapsed -= segment.duration
+        return 0.0
+
+
+def profile_from_options(rate: float = None, spec: str = None) -> RateProfile | None:
+    """Build the profile for a periodic run from its --rate or --profile option, if either was given."""
+    if rate is not None and spec is not None:
+        raise ValueError("Use either a rate or a profile, not both")
+    if spec is not None:
+        return RateProfile.parse(spec)
+    if rate is not None:
+        return RateProfile.constant(rate)
+    return None
+
+
+def _parse_segment(entry: str) -> Segment:
+    kind, *values = entry.split(":")
+    try:
+        match kind, values:
+            case "constant", [rate]:
+                return Segment(kind, math.inf, float(rate))
+            case "constant", [rate, seconds]:
+                return Segment(kind, float(seconds), float(rate))
+            case "ramp", [start_rate, end_rate, seconds]:
+                return Segment(kind, float(seconds), float(start_rate), float(end_rate))
+            case "step", [rates, seconds]:
+                step_rates = tuple(float(rate) for rate in rates.split(","))
+                return Segment(kind, float(seconds) * len(step_rates), step_rates[0], rates=step_rates)
+            case "sine", [mean_rate, amplitude, period, seconds]:
+                return Segment(kind, float(seconds), float(mean_rate), amplitude=float(amplitude), period=float(period))
+    except ValueError as e:
+        raise ValueError(f"Invalid rate profile segment {entry!r}: {e}") from e
+    raise ValueError(f"Invalid rate profile segment {entry!r}")
+
+
+@dataclass
+class ScheduleReport:
+    """Messages sent by a scheduled run and its per-interval (elapsed, target, achieved) rates."""
+
+    sent: int = 0
+    elapsed: float = 0.0
+    intervals: list[tuple[float, float, float]] = field(default_factory=list)
+
+
+def run_schedule(  # noqa: PLR0913
+    profile: RateProfile,
+    send: Callable[[int], None],
+    total: int,
+    min_batch: int = 1,
+    max_batch: int = None,
+    report_interval: float = DEFAULT_REPORT_INTERVAL,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> ScheduleReport:
+    """
+    Call send(n) to send total messages at the profile's target rate.
+
+    Batches hold at least min_batch and at most max_batch messages (by default a tenth of a
+    second's worth). The run stops once total messages are sent or the profile ends.
+    Achieved and target rates are logged every report_interval seconds.
+    """
+    report = ScheduleReport()
+    start = clock()
+    rate = profile.rate_at(0)
+    if max_batch is None:
+        max_batch = max(min_batch, math.ceil(rate / 10))
+    bucket = TokenBucket(rate, max(max_batch, 1), clock)
+
+    interval_start = start
+    interval_sent = 0
+    interval_target = 0.0
+    last = start
+    while report.sent < total:
+        now = clock()
+        elapsed = now - start
+        if elapsed >= profile.duration:
+            break
+
+        interval_target += rate * (now - last)
+        last = now
+        rate = profile.rate_at(elapsed)
+        bucket.set_rate(rate)
+
+        remaining = total - report.sent
+        count = bucket.take(min(min_batch, remaining), min(max_batch, remaining))
+        if count:
+            send(count)
+            report.sent += count
+            interval_sent += count
+        else:
+            sleep(min(bucket.time_until(min(min_batch, remaining)), MAX_SLEEP, max(0.0, profile.duration - elapsed)))
+
+        if now - interval_start >= report_interval:
+            _report_interval(report, interval_start - start, now - interval_start, interval_target, interval_sent)
+            interval_start, interval_sent, interval_target = now, 0, 0.0
+
+    end = clock()
+    report.elapsed = end - start
+    if end > interval_start and interval_sent:
+        interval_target += rate * (end - last)
+        _report_interval(report, interval_start - start, end - interval_start, interval_target, interval_sent)
+    logger.info(
+        "Sent %s messages in %.1fs (%.1f msg/s)",
+        report.sent,
+        report.elapsed,
+        report.sent / report.elapsed if report.elapsed else 0,
+    )
+    return report
+
+
+def _report_interval(report: ScheduleReport, offset: float, length: float, target: float, sent: int) -> None:
+    target_rate = target / length
+    achieved_rate = sent / length
+    report.intervals.append((offset, target_rate, achieved_rate))
+    logger.info("At %.0fs: target %.1f msg/s, achieved %.1f msg/s", offset, target_rate, achieved_rate)
@@ -0,0 +1,186 @@
+"""Seed related tables in dependency order, with each parent's children referencing its id."""
+
+import logging
+import time
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+from sqlalchemy import Table, insert
+from sqlalchemy.engine import Connection, Engine
+
+from data_util.generators import (
+    GENERATOR_FAKER,
+    MODEL_LABELS,
+    MODEL_MENU_CATEGORIES,
+    MODEL_MENU_ITEMS,
+    MODEL_MENUS,
+    MODEL_RESTAURANT_OWNERS,
+    MODEL_RESTAURANTS,
+    generate_record_range,
+)
+from data_util.instrumentation import STAGE_GENERATE, STAGE_INSERT, get_stats
+from data_util.model.data_operations import insert_returning_ids
+from data_util.model.kantin_models import Menu, MenuCategory, MenuItem, Restaurant, RestaurantOwner
+from data_util.runs import derive_seed
+
+logger = logging.getLogger(__name__)
+
+# The db-create model name that seeds every tree in GRAPH_TREES
+GRAPH = "graph"
+DEFAULT_GRAPH_BATCH_SIZE = 1000
+# Children created per parent, by child model
+DEFAULT_FAN_OUT = {MODEL_RESTAURANTS: 1, MODEL_MENUS: 10, MODEL_MENU_ITEMS: 20}
+
+
+@dataclass(frozen=True)
+class GraphLevel:
+    """A table of a seeded tree, the column referencing its parent's id, and its child tables."""
+
+    model: str
+    table: Table
+    parent_column: str = None
+    children: tuple["GraphLevel", ...] = ()
+
+
+GRAPH_TREES = (
+    GraphLevel(
+        MODEL_RESTAURANT_OWNERS,
+        RestaurantOwner.__table__,
+        children=(GraphLevel(MODEL_RESTAURANTS, Restaurant.__table__, "restaurant_owner_id"),),
+    ),
+    GraphLevel(
+        MODEL_MENU_CATEGORIES,
+        MenuCategory.__table__,
+        children=(
+            GraphLevel(
+                MODEL_MENUS,
+                Menu.__table__,
+                "menu_category_id",
+                children=(GraphLevel(MODEL_MENU_ITEMS, MenuItem.__table__, "menu_id"),),
+            ),
+        ),
+    ),
+)
+
+
+def parse_fan_out(specs: Iterable[str]) -> dict[str, int]:
+    """Apply MODEL=N fan-out options to DEFAULT_FAN_OUT. Invalid options raise ValueError."""
+    fan_out = dict(DEFAULT_FAN_OUT)
+    for spec in specs:
+        model, _, value = spec.partition("=")
+        if model not in fan_out:
+            raise ValueError(f"Invalid fan-out {spec!r}: MODEL must be one of {', '.join(fan_out)}")
+        try:
+            fan_out[model] = int(value)
+        except ValueError:
+            raise ValueError(f"Invalid fan-out {spec!r}: N must be a whole number") from None
+        if fan_out[model] < 0:
+            raise ValueError(f"Invalid fan-out {spec!r}: N cannot be negative")
+    return fan_out
+
+
+def graph_counts(count: int, fan_out: dict[str, int]) -> dict[str, int]:
+    """The number of rows of each model in a graph with count roots per tree."""
+    counts = {}
+
+    def add(level: GraphLevel, level_count: int) -> None:
+        counts[level.model] = level_count
+        for child in level.children:
+            add(child, level_count * fan_out[child.model])
+
+    for tree in GRAPH_TREES:
+        add(tree, count)
+    return counts
+
+
+class GraphSeeder:
+    """
+    Seed the trees of GRAPH_TREES, count roots each, batch by batch.
+
+    Every batch of roots is inserted with its whole subtree in one transaction. Parent rows
+    are inserted with INSERT ... RETURNING, and the returned ids are set on their children
+    before those are inserted, so each table costs one round trip per batch rather than
+    per row. Children are always generated in the order of their parents, so each model's
+    records are read from one seeded generate_record_range stream and a seed always
+    produces the same graph.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        engine: Engine,
+        fan_out: dict[str, int],
+        seed: int,
+        generator: str = GENERATOR_FAKER,
+        batch_size: int = DEFAULT_GRAPH_BATCH_SIZE,
+        commit: bool = True,
+    ):
+        self.engine = engine
+        self.fan_out = fan_out
+        self.seed = seed
+        self.generator = generator
+        self.batch_size = batch_size
+        self.commit = commit
+        self.created: dict[str, int] = {}
+        self._records: dict[str, Iterator[dict[str, Any]]] = {}
+
+    def seed_graph(self, count: int) -> dict[str, int]:
+        """Create count roots per tree with their descendants, returning the rows created per model."""
+        counts = graph_counts(count, self.fan_out)
+        self.created = dict.fromkeys(counts, 0)
+        # Each model gets its own derived seed, so records K of different models are not drawn alike
+        self._records = {
+            model: generate_record_range(model, 0, total, derive_seed(self.seed, index), self.generator)
+            for index, (model, total) in enumerate(counts.items())
+        }
+        started = time.perf_counter()
+        for tree in GRAPH_TREES:
+            logger.info("Creating %s", ", ".join(f"{counts[model]} {MODEL_LABELS[model]}" for model in _models(tree)))
+            for start in range(0, count, self.batch_size):
+                with self.engine.connect() as connection:
+                    self._insert_level(connection, tree, start, min(start + self.batch_size, count))
+                    if self.commit:
+                        connection.commit()
+                    else:
+                        connection.rollback()
+        elapsed = time.perf_counter() - started
+        total = sum(self.created.values())
+        logger.info("Created %s rows in %.2fs (%.0f rows/s)", total, elapsed, total / elapsed if elapsed else 0)
+        return self.created
+
+    def _insert_level(
+        self,
+        connection: Connection,
+        level: GraphLevel,
+        start: int,
+        stop: int,
+        parent_ids: Iterable[int] = None,
+    ) -> None:
+        """Insert records start to stop - 1 of a level, each referencing its parent id, then their children."""
+        stats = get_stats()
+        with stats.time(STAGE_GENERATE, stop - start):
+            rows = list(islice(self._records[level.model], stop - start))
+        if parent_ids is not None:
+            for row, parent_id in zip(rows, parent_ids):
+                row[level.parent_column] = parent_id
+
+        if not level.children:
+            with stats.time(STAGE_INSERT, len(rows)):
+                connection.execute(insert(level.table), rows)
+            self.created[level.model] += len(rows)
+            return
+
+        ids = insert_returning_ids(connection, level.table, rows)
+        self.created[level.model] += len(rows)
+        for child in level.children:
+            fan_out = self.fan_out[child.model]
+            for child_start in range(start * fan_out, stop * fan_out, self.batch_size):
+                child_stop = min(child_start + self.batch_size, stop * fan_out)
+                parent_ids = (ids[index // fan_out - start] for index in range(child_start, child_stop))
+                self._insert_level(connection, child, child_start, child_stop, parent_ids)
+
+
+def _models(level: GraphLevel) -> Iterator[str]:
+    yield level.model
+    for child in level.children:
+        yield from _models(child)
@@ -0,0 +1,70 @@
+"""Message body serializers and the publish properties that go with them."""
+
+import json
+from dataclasses import dataclass
+from functools import cache
+from typing import Any, Callable
+
+import pika
+
+SERIALIZER_JSON = "json"
+SERIALIZER_ORJSON = "orjson"
+SERIALIZER_MSGPACK = "msgpack"
+SERIALIZERS = (SERIALIZER_JSON, SERIALIZER_ORJSON, SERIALIZER_MSGPACK)
+
+
+@dataclass(frozen=True)
+class Serializer:
+    """Encode message records to bytes with a matching content type."""
+
+    name: str
+    content_type: str
+    dumps: Callable[[Any], bytes]
+
+    def properties(self, persistent: bool = False) -> pika.BasicProperties:
+        """
+        The publish properties for this serializer's messages.
+
+        The same object is returned on every call so a run does not build one per message;
+        treat it as read-only.
+        """
+        return _properties(self.content_type, persistent)
+
+
+@cache
+def _properties(content_type: str, persistent: bool) -> pika.BasicProperties:
+    return pika.BasicProperties(
+        content_type=content_type,
+        delivery_mode=pika.DeliveryMode.Persistent if persistent else None,
+    )
+
+
+def _json_dumps(message: Any) -> bytes:
+    return json.dumps(message).encode()
+
+
+JSON_SERIALIZER = Serializer(SERIALIZER_JSON, "application/json", _json_dumps)
+
+
+def get_serializer(name: str) -> Serializer:
+    """
+    Return the serializer called name.
+
+    orjson and msgpack are optional dependencies (the "fast" extra); a ValueError is raised
+    when the one asked for is not installed.
+    """
+    if name == SERIALIZER_JSON:
+        return JSON_SERIALIZER
+    if name == SERIALIZER_ORJSON:
+        try:
+            import orjson
+        except ImportError as e:
+            raise ValueError("The orjson serializer requires the orjson package") from e
+        return Serializer(name, "application/json", orjson.dumps)
+    if name == SERIALIZER_MSGPACK:
+        try:
+            import msgpack
+        except ImportError as e:
+            raise ValueError("The msgpack serializer requires the msgpack package") from e
+        return Serializer(name, "application/msgpack", msgpack.Packer(use_bin_type=True).pack)
+    raise ValueError(f"Unknown serializer {name}")
@@ -0,0 +1,198 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import pika
+from pika.exceptions import AMQPConnectionError, ConnectionClosedByBroker
+
+from data_util.connections.async_publisher import WRITE_BUFFER_HIGH_WATER, AsyncPublisher
+from data_util.connections.rabbit_connection import ConfirmTracker
+
+
+class FakeChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append((exchange, routing_key, body))
+
+
+class ConfirmingChannel(FakeChannel):
+    """A channel in confirm mode whose broker confirms are fired by the test."""
+
+    def __init__(self):
+        super().__init__()
+        self.on_ack_nack = None
+
+    def confirm_delivery(self, ack_nack_callback, callback):
+        self.on_ack_nack = ack_nack_callback
+        callback(pika.frame.Method(1, pika.spec.Confirm.SelectOk()))
+
+    def exchange_declare(self, exchange, exchange_type, durable, callback):
+        callback(pika.frame.Method(1, pika.spec.Exchange.DeclareOk()))
+
+    def _on_delivery_confirmation(self, delivery_tag, multiple=False, ack=True):
+        method = pika.spec.Basic.Ack if ack else pika.spec.Basic.Nack
+        self.on_ack_nack(pika.frame.Method(1, method(delivery_tag=delivery_tag, multiple=multiple)))
+
+
+class FakeTransport:
+    def __init__(self, size=0):
+        self.size = size
+
+    def get_write_buffer_size(self):
+        return self.size
+
+
+class FakeConnection:
+    """An AsyncioConnection that opens at once and hands out ConfirmingChannels."""
+
+    def __init__(self, parameters, on_open_callback, on_open_error_callback, on_close_callback, custom_ioloop):
+        self.on_close_callback = on_close_callback
+        self.channels = []
+        self._transport = FakeTransport()
+        self.is_closed = False
+        self.is_closing = False
+        on_open_callback(self)
+
+    def add_on_connection_blocked_callback(self, callback):
+        pass
+
+    def add_on_connection_unblocked_callback(self, callback):
+        pass
+
+    def channel(self, on_open_callback):
+        self.channels.append(ConfirmingChannel())
+        on_open_callback(self.channels[-1])
+
+    def close(self, reason=None):
+        self.is_closed = True
+        self.on_close_callback(self, reason)
+
+
+async def wait_for_published(channel, count, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while len(channel.published) < count:
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError(f"{len(channel.published)} of {count} messages published")
+        await asyncio.sleep(0.001)
+
+
+async def settle():
+    """Give the publisher a chance to run past where it should be waiting."""
+    for _ in range(20):
+        await asyncio.sleep(0.001)
+
+
+class TestAsyncPublisher(unittest.TestCase):
+    def _publish(self, messages, channel_count=3, **kwargs):
+        publisher = AsyncPublisher(None, "test_exchange", channel_count=channel_count, **kwargs)
+        publisher.channels = [FakeChannel() for _ in range(channel_count)]
+        publisher.trackers = [ConfirmTracker() for _ in range(channel_count)]
+
+        async def run():
+            publisher._unblocked = asyncio.Event()
+            publisher._unblocked.set()
+            publisher._confirmed = asyncio.Event()
+            return await publisher.publish(messages)
+
+        return publisher, asyncio.run(run())
+
+    def test_messages_are_spread_over_channels(self):
+        messages = (("franchises", str(index).encode(), None) for index in range(2000))
+        publisher, published = self._publish(messages, chunk_size=100, queue_size=300)
+
+        self.assertEqual(published, 2000)
+        bodies = [body for channel in publisher.channels for _, _, body in channel.published]
+        self.assertEqual(sorted(bodies, key=int), [str(index).encode() for index in range(2000)])
+        self.assertTrue(all(channel.published for channel in publisher.channels))
+        self.assertEqual(sum(tracker.published for tracker in publisher.trackers), 2000)
+
+    def test_empty_source(self):
+        publisher, published = self._publish(iter([]))
+        self.assertEqual(published, 0)
+
+    def test_generation_errors_are_raised(self):
+        def failing_messages():
+            yield "menus", b"{}", None
+            raise RuntimeError("generation failed")
+
+        with self.assertRaises(RuntimeError):
+            self._publish(failing_messages(), chunk_size=1)
+
+
+@patch("data_util.connections.async_publisher.AsyncioConnection", FakeConnection)
+class TestAsyncPublisherFlowControl(unittest.TestCase):
+    def _run(self, scenario, count, **kwargs):
+        messages = (("franchises", str(index).encode(), None) for index in range(count))
+
+        async def run():
+            async with AsyncPublisher(None, "test_exchange", channel_count=1, chunk_size=10, **kwargs) as publisher:
+                publishing = asyncio.create_task(publisher.publish(messages))
+                await scenario(publisher, publisher.channels[0])
+                return publisher, await asyncio.wait_for(publishing, 5)
+
+        return asyncio.run(run())
+
+    def test_confirm_window_blocks_until_acked(self):
+        async def scenario(publisher, channel):
+            await wait_for_published(channel, 2)
+            await settle()
+            self.assertEqual(len(channel.published), 2)
+
+            channel._on_delivery_confirmation(1)
+            await wait_for_published(channel, 3)
+            await settle()
+            self.assertEqual(len(channel.published), 3)
+
+            channel._on_delivery_confirmation(3, multiple=True)
+            await wait_for_published(channel, 5)
+            channel._on_delivery_confirmation(5, multiple=True)
+
+        publisher, published = self._run(scenario, 5, confirm_window=2)
+        self.assertEqual(published, 5)
+        self.assertEqual(publisher.trackers[0].confirmed, 5)
+        self.assertEqual(publisher.trackers[0].in_flight, 0)
+
+    def test_nacks_are_counted(self):
+        async def scenario(publisher, channel):
+            await wait_for_published(channel, 3)
+            channel._on_delivery_confirmation(2, multiple=True, ack=False)
+            channel._on_delivery_confirmation(3)
+
+        publisher, published = self._run(scenario, 3, confirm_window=5)
+        self.assertEqual(published, 3)
+        self.assertEqual((publisher.trackers[0].acked, publisher.trackers[0].nacked), (1, 2))
+        with self.assertLogs("data_util.connections.async_publisher", "WARNING") as logs:
+            publisher.log_summary()
+        self.assertIn("Confirmed 1 of 3 messages (2 failed)", logs.output[0])
+
+    def test_closed_connection_fails_unconfirmed_publishes(self):
+        # A full confirm window, then the wait for the last confirms at the end of the run
+        for confirm_window, count in ((2, 5), (5, 3)):
+
+            async def scenario(publisher, channel, published=min(confirm_window, count)):
+                await wait_for_published(channel, published)
+                await settle()
+                publisher.connection.close(ConnectionClosedByBroker(320, "CONNECTION_FORCED"))
+
+            with self.subTest(confirm_window=confirm_window), self.assertRaises(AMQPConnectionError) as raised:
+                self._run(scenario, count, confirm_window=confirm_window)
+            self.assertIn("messages unconfirmed", str(raised.exception))
+
+    def test_full_write_buffer_pauses_publishing(self):
+        async def scenario(publisher, channel):
+            transport = publisher.connection._transport
+            transport.size = WRITE_BUFFER_HIGH_WATER + 1
+            await settle()
+            self.assertEqual(channel.published, [])
+
+            transport.size = WRITE_BUFFER_HIGH_WATER
+            await wait_for_published(channel, 20)
+
+        publisher, published = self._run(scenario, 20)
+        self.assertEqual(published, 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
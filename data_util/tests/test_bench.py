@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from data_util.bench import STAGE_GENERATE, BenchResult, bench, compare_results, run_benchmark
+
+COUNT = 20
+
+
+@patch("data_util.bench.load_dotenv")
+class TestBench(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "bench.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _run(self, *args):
+        return CliRunner().invoke(bench, ["--count", str(COUNT), "--rounds", "2", "--output", self.output, *args])
+
+    def test_writes_results_for_each_stage(self, mock_load_dotenv):
+        result = self._run()
+        self.assertEqual(result.exit_code, 0, result.output)
+        with open(self.output) as file:
+            report = json.load(file)
+
+        names = [result["name"] for result in report["results"]]
+        self.assertIn("generate:people:batch", names)
+        self.assertIn("serialize:json", names)
+        self.assertIn("publish:stub", names)
+        self.assertIn("insert:sqlite", names)
+        self.assertTrue(all(result["count"] == COUNT and result["rate"] > 0 for result in report["results"]))
+
+    def test_fails_on_regression(self, mock_load_dotenv):
+        result = self._run("--stage", STAGE_GENERATE)
+        self.assertEqual(result.exit_code, 0, result.output)
+        baseline = os.path.join(self.directory.name, "baseline.json")
+        with open(self.output) as file:
+            report = json.load(file)
+        for entry in report["results"]:
+            entry["rate"] *= 1000
+        with open(baseline, "w") as file:
+            json.dump(report, file)
+
+        result = self._run("--stage", STAGE_GENERATE, "--baseline", baseline)
+        self.assertEqual(result.exit_code, 1)
+
+
+class TestCompareResults(unittest.TestCase):
+    def test_only_drops_beyond_tolerance_regress(self):
+        results = [{"name": "a", "rate": 85.0}, {"name": "b", "rate": 70.0}, {"name": "c", "rate": 10.0}]
+        baseline = [{"name": "a", "rate": 100.0}, {"name": "b", "rate": 100.0}]
+        self.assertEqual(compare_results(results, baseline, 0.2), ["b"])
+
+    def test_run_benchmark_keeps_the_best_round(self):
+        result = run_benchmark("noop", lambda: None, 10, rounds=3)
+        self.assertIsInstance(result, BenchResult)
+        self.assertLessEqual(result.best, result.mean)
+        self.assertEqual(result.rounds, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,9 +11,9 @@ from faker import Faker
 
 from data_util.create_actor_messages import (
     _create_person_message,
-    _publish_messages_for_model,
     queue_person_create,
 )
+from data_util.queue_publishing import publish_messages_for_model
 
 
 class TestPublishMessagesForModel(unittest.TestCase):
@@ -24,9 +24,9 @@ class TestPublishMessagesForModel(unittest.TestCase):
         self.count = 5
         self.model = "people"
 
-    @patch("data_util.create_actor_messages.logger.info")
+    @patch("data_util.queue_publishing.logger.info")
     def test_publish_messages_for_person_model(self, mock_logger_info):
-        _publish_messages_for_model(self.channel, self.model, self.count, self.faker, self.exchange)
+        publish_messages_for_model(self.channel, self.model, self.count, self.faker, self.exchange)
         self.channel.basic_publish.assert_called()
         self.assertEqual(self.channel.basic_publish.call_count, self.count)
         self.assertEqual(mock_logger_info.call_count, 2)
@@ -34,18 +34,31 @@ class TestPublishMessagesForModel(unittest.TestCase):
         self.assertEqual(
             mock_logger_info.call_args_list,
             [
-                call("Creating %s People", self.count),
-                call("Created %s People", self.count),
+                call("Creating %s %s", self.count, "People"),
+                call("Created %s %s", self.count, "People"),
             ],
         )
 
-    @patch("data_util.create_actor_messages.logger")
+    @patch("data_util.queue_publishing.logger")
     def test_unknown_model(self, mock_logger):
-        _publish_messages_for_model(self.channel, "unknown_model", self.count, self.faker, self.exchange)
+        publish_messages_for_model(self.channel, "unknown_model", self.count, self.faker, self.exchange)
         mock_logger.error.assert_called_with("Unknown model: %s", "unknown_model")
 
-    @patch("data_util.create_actor_messages.publish_message_to_exchange")
-    @patch("data_util.create_actor_messages._publish_messages_for_model")
+    @patch.dict("os.environ", {"ACTOR_EXCHANGE": "actors"})
+    @patch("data_util.queue_publishing.close_connection_pool")
+    @patch("data_util.queue_publishing.load_dotenv")
+    @patch("data_util.queue_publishing.publish_message_to_exchange")
+    def test_people_are_persistent_on_the_actor_exchange(self, mock_publish_message_to_exchange, *_mocks):
+        mock_publish_message_to_exchange.return_value = self.channel
+        result = CliRunner().invoke(queue_person_create, ["people", "3", "--seed", "7"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        calls = self.channel.basic_publish.call_args_list
+        self.assertEqual(len(calls), 3)
+        self.assertEqual({call.kwargs["exchange"] for call in calls}, {"actors"})
+        self.assertEqual({call.kwargs["properties"].delivery_mode for call in calls}, {2})
+
+    @patch("data_util.queue_publishing.publish_message_to_exchange")
+    @patch("data_util.queue_publishing.publish_messages_for_model")
     def test_queue_person_periodic_create(
         self,
         mock_publish_messages_for_model,
@@ -60,8 +73,8 @@ class TestPublishMessagesForModel(unittest.TestCase):
         mock_publish_message_to_exchange.assert_called_once_with(config_file=None)
         mock_publish_messages_for_model.assert_called()
 
-    @patch("data_util.create_actor_messages.publish_message_to_exchange")
-    @patch("data_util.create_actor_messages._publish_messages_for_model")
+    @patch("data_util.queue_publishing.publish_message_to_exchange")
+    @patch("data_util.queue_publishing.publish_messages_for_model")
     def test_queue_person_once_create(
         self,
         mock_publish_messages_for_model,
@@ -75,10 +88,10 @@ class TestPublishMessagesForModel(unittest.TestCase):
         mock_publish_message_to_exchange.assert_called_once_with(config_file=None)
         mock_publish_messages_for_model.assert_called()
 
-    @patch("data_util.create_actor_messages.logger.info")
-    @patch("data_util.create_actor_messages.load_dotenv")
-    @patch("data_util.create_actor_messages.publish_message_to_exchange")
-    @patch("data_util.create_actor_messages._publish_messages_for_model")
+    @patch("data_util.queue_publishing.logger.info")
+    @patch("data_util.queue_publishing.load_dotenv")
+    @patch("data_util.queue_publishing.publish_message_to_exchange")
+    @patch("data_util.queue_publishing.publish_messages_for_model")
     def test_queue_person_env_create(
         self,
         mock_publish_messages_for_model,
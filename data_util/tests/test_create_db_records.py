@@ -0,0 +1,288 @@
+import json
+import os
+import tempfile
+import unittest
+from collections import Counter
+from itertools import islice
+from unittest.mock import patch
+
+from click.testing import CliRunner
+from sqlalchemy import create_engine, func, select
+
+from data_util.create_db_records import db_create
+from data_util.model.data_operations import insert_batches
+from data_util.model.kantin_models import (
+    Base,
+    FoodType,
+    Franchise,
+    Menu,
+    MenuCategory,
+    MenuItem,
+    Restaurant,
+    RestaurantOwner,
+)
+
+
+class TestBulkCreate(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.directory.name, 'kantin.db')}"
+        self.engine = create_engine(self.connection_string)
+        Base.metadata.create_all(self.engine)
+        self.env = patch.dict(os.environ, {"DATABASE_URI": self.connection_string})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def _count(self, table):
+        with self.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(table)).scalar_one()
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_batched_insert_for_each_model(self, mock_load_dotenv):
+        runner = CliRunner()
+        for model, table in (
+            ("food-types", FoodType.__table__),
+            ("franchises", Franchise.__table__),
+            ("menus", Menu.__table__),
+        ):
+            result = runner.invoke(db_create, [model, "25", "--batch-size", "10"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(self._count(table), 25)
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_constrained_keys_are_unique_by_default(self, mock_load_dotenv):
+        # Far more food types than dish type names, whose column has a unique constraint
+        result = CliRunner().invoke(db_create, ["food-types", "60"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self._count(FoodType.__table__), 60)
+
+    @patch("data_util.create_db_records.logger.info")
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_rerun_adds_rows_to_constrained_tables(self, mock_load_dotenv, mock_logger_info):
+        runner = CliRunner()
+        for _ in range(2):
+            result = runner.invoke(db_create, ["food-types", "5"])
+            self.assertEqual(result.exit_code, 0, result.output)
+        inserted = [call.args[1] for call in mock_logger_info.call_args_list if call.args[0].startswith("Inserted")]
+        self.assertEqual(len(inserted), 2)
+        self.assertEqual(self._count(FoodType.__table__), sum(inserted))
+
+        # The same seed again writes the same keys, which are all skipped
+        for _ in range(2):
+            result = runner.invoke(db_create, ["franchises", "5", "--seed", "7"])
+            self.assertEqual(result.exit_code, 0, result.output)
+        mock_logger_info.assert_called_with("Inserted %s, updated %s and skipped %s existing %s", 0, 0, 5, "Franchises")
+        self.assertEqual(self._count(Franchise.__table__), 5)
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_stats_file_has_each_stage(self, mock_load_dotenv):
+        stats_file = os.path.join(self.directory.name, "stats.json")
+        result = CliRunner().invoke(db_create, ["franchises", "30", "--batch-size", "10", "--stats-file", stats_file])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with open(stats_file) as file:
+            stages = json.load(file)["stages"]
+        self.assertEqual(stages["generate"]["items"], 30)
+        self.assertEqual(stages["insert"]["items"], 30)
+        self.assertEqual(stages["insert"]["calls"], 3)
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_batched_dry_run_rolls_back(self, mock_load_dotenv):
+        result = CliRunner().invoke(db_create, ["franchises", "5", "--batch-size", "2", "--dry-run"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self._count(Franchise.__table__), 0)
+
+    @patch("data_util.create_db_records.insert_batches")
+    @patch("data_util.create_db_records.logger.info")
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_batched_unknown_model(self, mock_load_dotenv, mock_logger_info, mock_insert_batches):
+        CliRunner().invoke(db_create, ["unknown_model", "5", "--batch-size", "2"])
+        mock_insert_batches.assert_not_called()
+        mock_logger_info.assert_called_with("Unknown model %s", "unknown_model")
+
+    @patch("data_util.create_db_records.plan_run")
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_copy_loader_requires_postgresql(self, mock_load_dotenv, mock_plan_run):
+        result = CliRunner().invoke(db_create, ["franchises", "5", "--loader", "copy"])
+        self.assertEqual(result.exit_code, 2, result.output)
+        self.assertIn("PostgreSQL", result.output)
+        mock_plan_run.assert_not_called()
+        self.assertEqual(self._count(Franchise.__table__), 0)
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_workers_split_count(self, mock_load_dotenv):
+        result = CliRunner().invoke(
+            db_create, ["franchises", "25", "--batch-size", "10", "--workers", "2", "--seed", "7"]
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self._count(Franchise.__table__), 25)
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_seed_makes_rows_reproducible(self, mock_load_dotenv):
+        runner = CliRunner()
+        names = []
+        for _ in range(2):
+            with self.engine.begin() as connection:
+                connection.execute(Franchise.__table__.delete())
+            runner.invoke(db_create, ["franchises", "5", "--batch-size", "5", "--seed", "7"])
+            names.append(self._names())
+        self.assertEqual(len(names[0]), 5)
+        self.assertEqual(names[0], names[1])
+
+    def _names(self, column=Franchise.franchise_name):
+        with self.engine.connect() as connection:
+            return connection.execute(select(column).order_by(column.table.c.id)).scalars().all()
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_shards_and_workers_create_the_same_records(self, mock_load_dotenv):
+        runner = CliRunner()
+        runner.invoke(db_create, ["franchises", "30", "--batch-size", "10", "--seed", "7"])
+        expected = self._names()
+        with self.engine.begin() as connection:
+            connection.execute(Franchise.__table__.delete())
+        for shard in ("1/2", "0/2"):
+            result = runner.invoke(
+                db_create, ["franchises", "30", "--batch-size", "4", "--seed", "7", "--shard", shard, "--workers", "2"]
+            )
+            self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(sorted(self._names()), sorted(expected))
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_unique_keys_do_not_depend_on_workers(self, mock_load_dotenv):
+        runner = CliRunner()
+        names = []
+        for workers in ("1", "3"):
+            with self.engine.begin() as connection:
+                connection.execute(FoodType.__table__.delete())
+            arguments = ["food-types", "90", "--batch-size", "10", "--seed", "7", "--unique", "--workers", workers]
+            result = runner.invoke(db_create, arguments)
+            self.assertEqual(result.exit_code, 0, result.output)
+            with self.engine.connect() as connection:
+                names.append(sorted(connection.execute(select(FoodType.type_name)).scalars()))
+        self.assertEqual(len(set(names[0])), 90)
+        self.assertEqual(names[0], names[1])
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_checkpoint_resumes_after_a_failure(self, mock_load_dotenv):
+        checkpoint = os.path.join(self.directory.name, "run.checkpoint")
+        arguments = ["menus", "25", "--batch-size", "10", "--unique", "--checkpoint", checkpoint]
+        runner = CliRunner()
+
+        def insert_one_batch_then_fail(engine, table, rows, batch_size, **kwargs):
+            insert_batches(engine, table, islice(rows, batch_size), batch_size, **kwargs)
+            raise RuntimeError("database went away")
+
+        with patch("data_util.create_db_records.insert_batches", side_effect=insert_one_batch_then_fail):
+            result = runner.invoke(db_create, arguments)
+            self.assertEqual(result.exit_code, 1)
+        self.assertEqual(self._count(Menu.__table__), 10)
+
+        result = runner.invoke(db_create, arguments)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self._count(Menu.__table__), 25)
+        self.assertEqual(len(set(self._names(Menu.menu_name))), 25)
+
+        result = runner.invoke(db_create, ["menus", "30", "--batch-size", "10", "--unique", "--checkpoint", checkpoint])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("count=25", result.output)
+
+    @patch("data_util.create_db_records.logger.error")
+    @patch("data_util.create_db_records.insert_batches", side_effect=RuntimeError("database went away"))
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_failed_worker_is_reported(self, mock_load_dotenv, mock_insert_batches, mock_logger_error):
+        result = CliRunner().invoke(db_create, ["menus", "5", "--batch-size", "2"])
+        self.assertEqual(result.exit_code, 1)
+        mock_logger_error.assert_called_with(
+            "Created %s of %s %s; %s rows were not created by failed workers %s", 0, 5, "Menus", 5, "0"
+        )
+
+
+class TestUpsert(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.directory.name, 'kantin.db')}"
+        self.engine = create_engine(self.connection_string)
+        Base.metadata.create_all(self.engine)
+        self.env = patch.dict(os.environ, {"DATABASE_URI": self.connection_string})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    @patch("data_util.create_db_records.logger.info")
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_rerun_skips_existing_rows(self, mock_load_dotenv, mock_logger_info):
+        runner = CliRunner()
+        result = runner.invoke(db_create, ["franchises", "20", "--seed", "7", "--unique", "--upsert"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        mock_logger_info.assert_any_call("Inserted %s, updated %s and skipped %s existing %s", 20, 0, 0, "Franchises")
+
+        result = runner.invoke(db_create, ["franchises", "30", "--seed", "7", "--unique", "--upsert", "skip"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        mock_logger_info.assert_any_call("Inserted %s, updated %s and skipped %s existing %s", 10, 0, 20, "Franchises")
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(select(func.count()).select_from(Franchise)).scalar_one(), 30)
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_upsert_option_errors(self, mock_load_dotenv):
+        runner = CliRunner()
+        for arguments in (["menus", "5", "--upsert"], ["franchises", "5", "--upsert", "--loader", "copy"]):
+            result = runner.invoke(db_create, arguments)
+            self.assertEqual(result.exit_code, 2, result.output)
+
+
+class TestGraphCreate(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.connection_string = f"sqlite:///{os.path.join(self.directory.name, 'kantin.db')}"
+        self.engine = create_engine(self.connection_string)
+        Base.metadata.create_all(self.engine)
+        self.env = patch.dict(os.environ, {"DATABASE_URI": self.connection_string})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def _children_per_parent(self, column):
+        with self.engine.connect() as connection:
+            return Counter(connection.execute(select(column)).scalars())
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_graph_fans_out_from_each_parent(self, mock_load_dotenv):
+        arguments = ["graph", "7", "--batch-size", "3", "--fan-out", "restaurants=2", "--fan-out", "menu-items=4"]
+        result = CliRunner().invoke(db_create, [*arguments, "--fan-out", "menus=5"])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        with self.engine.connect() as connection:
+            owner_ids = connection.execute(select(RestaurantOwner.id)).scalars().all()
+            category_ids = connection.execute(select(MenuCategory.id)).scalars().all()
+            menu_ids = connection.execute(select(Menu.id)).scalars().all()
+        self.assertEqual(len(owner_ids), 7)
+        self.assertEqual(self._children_per_parent(Restaurant.restaurant_owner_id), dict.fromkeys(owner_ids, 2))
+        self.assertEqual(len(category_ids), 7)
+        self.assertEqual(self._children_per_parent(Menu.menu_category_id), dict.fromkeys(category_ids, 5))
+        self.assertEqual(self._children_per_parent(MenuItem.menu_id), dict.fromkeys(menu_ids, 4))
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_graph_dry_run_rolls_back(self, mock_load_dotenv):
+        result = CliRunner().invoke(db_create, ["graph", "4", "--batch-size", "2", "--dry-run"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self._children_per_parent(MenuItem.menu_id), {})
+
+    @patch("data_util.create_db_records.load_dotenv")
+    def test_graph_option_errors(self, mock_load_dotenv):
+        runner = CliRunner()
+        for arguments in (["--workers", "2"], ["--fan-out", "franchises=2"], ["--fan-out", "menus=-1"]):
+            result = runner.invoke(db_create, ["graph", "4", *arguments])
+            self.assertEqual(result.exit_code, 2, result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
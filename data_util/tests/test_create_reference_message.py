@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+import tempfile
 import time
 from unittest import TestCase, mock
 from unittest.mock import MagicMock, call, patch
@@ -13,10 +14,10 @@ from data_util.create_reference_message import (
     _create_food_type_message,
     _create_franchise_message,
     _create_menu_message,
-    _publish_messages_for_model,
     queue_create,
 )
 from data_util.providers.FoodTypeProvider import FoodTypeProvider
+from data_util.queue_publishing import publish_messages_for_model
 
 MODEL_FRANCHISES = "franchises"
 MODEL_FOOD_TYPES = "food-types"
@@ -33,25 +34,25 @@ class TestCreateReferenceMessage(TestCase):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.DEBUG)
 
-    @patch("data_util.create_reference_message.logger.info")
+    @patch("data_util.queue_publishing.logger.info")
     def test_publish_messages_for_model_franchises(self, mock_logger_info):
-        _publish_messages_for_model(self.channel, MODEL_FRANCHISES, self.count, self.faker, self.exchange)
+        publish_messages_for_model(self.channel, MODEL_FRANCHISES, self.count, self.faker, self.exchange)
 
         self.channel.basic_publish.assert_called()
         self.assertEqual(mock_logger_info.call_count, 2)
         self.assertEqual(
             mock_logger_info.call_args_list,
             [
-                call("Creating %s Franchises", self.count),
-                call("Created %s Franchises", self.count),
+                call("Creating %s %s", self.count, "Franchises"),
+                call("Created %s %s", self.count, "Franchises"),
             ],
         )
 
-    @patch("data_util.create_reference_message.logger.info")
+    @patch("data_util.queue_publishing.logger.info")
     def test_publish_messages_for_model_food_types(self, mock_logger_info):
         food_type_provider = FoodTypeProvider()
         message_body = _create_food_type_message(food_type_provider, self.faker)
-        _publish_messages_for_model(
+        publish_messages_for_model(
             self.channel,
             MODEL_FOOD_TYPES,
             self.count,
@@ -64,25 +65,25 @@ class TestCreateReferenceMessage(TestCase):
         self.assertEqual(
             mock_logger_info.call_args_list,
             [
-                call("Creating %s Food Types", self.count),
-                call("Created %s Food Types", self.count),
+                call("Creating %s %s", self.count, "Food Types"),
+                call("Created %s %s", self.count, "Food Types"),
             ],
         )
 
-    @patch("data_util.create_reference_message.logger.info")
+    @patch("data_util.queue_publishing.logger.info")
     def test_publish_messages_for_model_menus(self, mock_logger_info):
-        _publish_messages_for_model(self.channel, MODEL_MENUS, self.count, self.faker, self.exchange)
+        publish_messages_for_model(self.channel, MODEL_MENUS, self.count, self.faker, self.exchange)
 
         self.channel.basic_publish.assert_called()
         self.assertEqual(mock_logger_info.call_count, 2)
         self.assertEqual(
             mock_logger_info.call_args_list,
-            [call("Creating %s Menus", self.count), call("Created %s Menus", self.count)],
+            [call("Creating %s %s", self.count, "Menus"), call("Created %s %s", self.count, "Menus")],
         )
 
-    @patch("data_util.create_reference_message.logger.error")
+    @patch("data_util.queue_publishing.logger.error")
     def test_publish_messages_for_model_unknown_model(self, mock_logger_info):
-        _publish_messages_for_model(self.channel, "unknown_model", self.count, self.faker, self.exchange)
+        publish_messages_for_model(self.channel, "unknown_model", self.count, self.faker, self.exchange)
 
         self.channel.basic_publish.assert_not_called()
         self.assertEqual(
@@ -90,9 +91,9 @@ class TestCreateReferenceMessage(TestCase):
             [call("Unknown model: %s", "unknown_model")],
         )
 
-    @patch("data_util.create_reference_message.publish_message_to_exchange")
+    @patch("data_util.queue_publishing.publish_message_to_exchange")
     @patch("data_util.providers.FoodTypeProvider.FoodTypeProvider")
-    @patch("data_util.create_reference_message._publish_messages_for_model")
+    @patch("data_util.queue_publishing.publish_messages_for_model")
     def test_queue_create_periodic_run(
         self,
         mock_publish_messages_for_model,
@@ -112,11 +113,11 @@ class TestCreateReferenceMessage(TestCase):
 
         # time.sleep(1)
 
-    @patch("data_util.create_reference_message.logger.info")
-    @patch("data_util.create_reference_message.load_dotenv")
-    @patch("data_util.create_reference_message.publish_message_to_exchange")
+    @patch("data_util.queue_publishing.logger.info")
+    @patch("data_util.queue_publishing.load_dotenv")
+    @patch("data_util.queue_publishing.publish_message_to_exchange")
     @patch("data_util.providers.FoodTypeProvider.FoodTypeProvider")
-    @patch("data_util.create_reference_message._publish_messages_for_model")
+    @patch("data_util.queue_publishing.publish_messages_for_model")
     def test_queue_create_once(
         self,
         mock_publish_messages_for_model,
@@ -141,3 +142,26 @@ class TestCreateReferenceMessage(TestCase):
         result = runner.invoke(queue_create, ["food-type", "15", "-c", "data_util/tests/test_config.env"])
         mock_load_dotenv.assert_called_with("data_util/tests/test_config.env")
         mock_publish_messages_for_model.assert_not_called()
+
+    @patch("data_util.queue_publishing.close_connection_pool")
+    @patch("data_util.queue_publishing.load_dotenv")
+    @patch("data_util.queue_publishing.publish_message_to_exchange")
+    def test_queue_create_checkpoint_resumes_the_run(
+        self, mock_publish_message_to_exchange, mock_load_dotenv, mock_close_connection_pool
+    ):
+        channel = MagicMock(spec=["basic_publish"])
+        mock_publish_message_to_exchange.return_value = channel
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "run.checkpoint")
+            arguments = ["franchises", "12", "--seed", "7", "--shard", "1/2", "--checkpoint", checkpoint]
+            runner = CliRunner()
+            result = runner.invoke(queue_create, arguments)
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(channel.basic_publish.call_count, 6)
+            with open(checkpoint) as file:
+                self.assertEqual(json.loads(file.readlines()[-1]), {"start": 6, "next": 12})
+
+            channel.reset_mock()
+            result = runner.invoke(queue_create, arguments)
+            self.assertEqual(result.exit_code, 0, result.output)
+            channel.basic_publish.assert_not_called()
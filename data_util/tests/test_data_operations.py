@@ -0,0 +1,127 @@
+import unittest
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from data_util.model.data_operations import (
+    UPSERT_UPDATE,
+    UpsertCounts,
+    copy_rows,
+    dispose_engines,
+    get_engine,
+    get_session,
+    upsert_batches,
+)
+from data_util.model.kantin_models import Base, Franchise
+
+CONNECTION_STRING = "sqlite://"
+
+
+class TestEngineRegistry(unittest.TestCase):
+    def tearDown(self):
+        dispose_engines()
+
+    def test_get_engine_without_connection_string(self):
+        self.assertIsNone(get_engine(None))
+
+    def test_engine_is_shared_per_connection_string(self):
+        engine = get_engine(CONNECTION_STRING, pool_size=2, echo=False)
+        self.assertIs(get_engine(CONNECTION_STRING), engine)
+        self.assertFalse(engine.echo)
+
+    def test_models_share_one_session(self):
+        Base.metadata.create_all(get_engine(CONNECTION_STRING), tables=[Franchise.__table__])
+        first = Franchise(CONNECTION_STRING, franchise_name="First", description="One")
+        second = Franchise(CONNECTION_STRING, franchise_name="Second", description="Two")
+        self.assertIs(first.session, second.session)
+        self.assertIs(first.session, get_session(CONNECTION_STRING))
+
+        first.create()
+        second.create()
+        self.assertEqual(get_session(CONNECTION_STRING).query(Franchise).count(), 2)
+
+    def test_dispose_engines_resets_registry(self):
+        engine = get_engine(CONNECTION_STRING)
+        dispose_engines()
+        self.assertIsNot(get_engine(CONNECTION_STRING), engine)
+
+
+class TestCopyRows(unittest.TestCase):
+    def setUp(self):
+        self.engine = MagicMock()
+        self.engine.dialect = postgresql.dialect()
+        self.connection = self.engine.raw_connection.return_value
+        self.cursor = self.connection.cursor.return_value
+        self.chunks = []
+        self.cursor.copy_expert.side_effect = lambda statement, buffer: self.chunks.append((statement, buffer.read()))
+
+    def test_rows_are_streamed_in_chunks(self):
+        rows = ({"franchise_name": f"Franchise {i}", "description": None} for i in range(5))
+        self.assertEqual(copy_rows(self.engine, Franchise.__table__, rows, chunk_size=2), 5)
+
+        self.assertEqual(len(self.chunks), 3)
+        statement, first_chunk = self.chunks[0]
+        self.assertEqual(
+            statement,
+            "COPY franchises (franchise_name, description) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        )
+        self.assertEqual(first_chunk, "Franchise 0,\\N\r\nFranchise 1,\\N\r\n")
+        self.assertEqual(self.chunks[2][1], "Franchise 4,\\N\r\n")
+        self.connection.commit.assert_called_once()
+        self.connection.close.assert_called_once()
+
+    def test_values_are_csv_quoted(self):
+        rows = [{"franchise_name": 'Smith, Jones and "Sons"', "description": ""}]
+        copy_rows(self.engine, Franchise.__table__, rows)
+        self.assertEqual(self.chunks[0][1], '"Smith, Jones and ""Sons""",\r\n')
+
+    def test_failed_copy_rolls_back(self):
+        self.cursor.copy_expert.side_effect = RuntimeError("copy failed")
+        with self.assertRaises(RuntimeError):
+            copy_rows(self.engine, Franchise.__table__, [{"franchise_name": "Name"}])
+        self.connection.rollback.assert_called_once()
+        self.connection.commit.assert_not_called()
+        self.connection.close.assert_called_once()
+
+    def test_requires_postgresql(self):
+        with self.assertRaises(ValueError):
+            copy_rows(MagicMock(dialect=MagicMock()), Franchise.__table__, [])
+
+
+class TestUpsertBatches(unittest.TestCase):
+    def test_update_counts_inserted_rows_by_xmax(self):
+        engine = MagicMock()
+        engine.dialect = postgresql.dialect()
+        connection = engine.connect.return_value.__enter__.return_value
+        captured = []
+
+        def execute(statement, rows):
+            captured.append((str(statement.compile(dialect=engine.dialect)), rows))
+            return MagicMock(scalars=MagicMock(return_value=MagicMock(all=MagicMock(return_value=[True, False]))))
+
+        connection.execute.side_effect = execute
+        rows = [
+            {"franchise_name": "First", "description": "One"},
+            {"franchise_name": "Second", "description": "Two"},
+            {"franchise_name": "First", "description": "Three"},
+        ]
+        counts = upsert_batches(engine, Franchise.__table__, rows, 10, ("franchise_name",), UPSERT_UPDATE)
+
+        self.assertEqual(counts, UpsertCounts(inserted=1, updated=1, skipped=1))
+        statement, written = captured[0]
+        self.assertIn("ON CONFLICT (franchise_name) DO UPDATE SET description = excluded.description", statement)
+        self.assertIn("RETURNING xmax = 0", statement)
+        self.assertEqual([row["description"] for row in written], ["Three", "Two"])
+        connection.commit.assert_called_once()
+
+    def test_update_needs_postgresql(self):
+        engine = get_engine(CONNECTION_STRING)
+        with self.assertRaises(ValueError):
+            upsert_batches(
+                engine, Franchise.__table__, [{"franchise_name": "First"}], 10, ("franchise_name",), UPSERT_UPDATE
+            )
+        dispose_engines()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import importlib.util
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from click.testing import CliRunner
+
+from data_util.create_reference_message import queue_create
+from data_util.envelopes import (
+    ENVELOPE_ARRAY,
+    ENVELOPE_FRAMES,
+    Envelope,
+    decompress,
+    envelope_from_options,
+    iter_envelope_frames,
+    record_count,
+)
+from data_util.generators import generate_record_range
+from data_util.publish_workers import run_publish_job, split_publish_jobs
+from data_util.queue_publishing import publish_messages_for_model, publish_records
+from data_util.runs import RunPlan
+from data_util.serializers import JSON_SERIALIZER
+
+RECORDS = [{"franchise_name": f"Franchise {index}"} for index in range(5)]
+
+
+class TestEnvelope(unittest.TestCase):
+    def test_array_envelope(self):
+        body, properties = Envelope(ENVELOPE_ARRAY).message(RECORDS, JSON_SERIALIZER, persistent=True)
+        self.assertEqual(json.loads(body), RECORDS)
+        self.assertEqual(properties.headers, {"x-envelope": "array", "x-record-count": 5})
+        self.assertEqual(properties.content_type, "application/json")
+        self.assertIsNone(properties.content_encoding)
+        self.assertEqual(properties.delivery_mode, 2)
+
+    def test_frames_envelope(self):
+        body = Envelope(ENVELOPE_FRAMES).pack(RECORDS, JSON_SERIALIZER)
+        self.assertEqual([json.loads(frame) for frame in iter_envelope_frames(body)], RECORDS)
+        with self.assertRaises(ValueError):
+            list(iter_envelope_frames(body[:-1]))
+
+    def test_zlib_envelope(self):
+        envelope = envelope_from_options(ENVELOPE_FRAMES, 10, "zlib")
+        body, properties = envelope.message(RECORDS, JSON_SERIALIZER)
+        self.assertEqual(properties.content_encoding, "zlib")
+        unpacked = decompress(body, properties.content_encoding)
+        self.assertEqual(len(unpacked), properties.headers["x-uncompressed-size"])
+        self.assertEqual([json.loads(frame) for frame in iter_envelope_frames(unpacked)], RECORDS)
+
+    @unittest.skipUnless(importlib.util.find_spec("lz4"), "lz4 is not installed")
+    def test_lz4_envelope(self):
+        body, properties = envelope_from_options(ENVELOPE_ARRAY, 10, "lz4").message(RECORDS, JSON_SERIALIZER)
+        self.assertEqual(json.loads(decompress(body, properties.content_encoding)), RECORDS)
+
+    @unittest.skipIf(importlib.util.find_spec("lz4"), "lz4 is installed")
+    def test_lz4_requires_the_package(self):
+        with self.assertRaises(ValueError):
+            envelope_from_options(ENVELOPE_ARRAY, 10, "lz4")
+
+    def test_options(self):
+        self.assertIsNone(envelope_from_options(None))
+        with self.assertRaises(ValueError):
+            envelope_from_options(None, 10, "zlib")
+        self.assertEqual(record_count(None), 1)
+
+
+class TestPublishEnvelopes(unittest.TestCase):
+    def setUp(self):
+        self.channel = MagicMock(spec=["basic_publish"])
+
+    def test_records_are_packed_per_envelope(self):
+        records = generate_record_range("menus", 0, 250, 7)
+        publish_messages_for_model(
+            self.channel, "menus", 250, None, "test", records=records, envelope=Envelope(ENVELOPE_ARRAY)
+        )
+        calls = self.channel.basic_publish.call_args_list
+        self.assertEqual([call.kwargs["properties"].headers["x-record-count"] for call in calls], [100, 100, 50])
+        self.assertEqual(json.loads(calls[2].kwargs["body"]), list(generate_record_range("menus", 200, 250, 7)))
+        self.assertEqual({call.kwargs["routing_key"] for call in calls}, {"menus"})
+
+    @patch("data_util.publish_workers.close_connection_pool")
+    @patch("data_util.publish_workers.publish_message_to_exchange")
+    def test_workers_count_records(self, mock_publish_message_to_exchange, _mock_close):
+        mock_publish_message_to_exchange.return_value = self.channel
+        (job,) = split_publish_jobs(
+            RunPlan(7, 0, 0, 30), 1, model="menus", publish_records=publish_records, envelope=Envelope("frames", 8)
+        )
+        result = run_publish_job(job)
+        self.assertEqual(self.channel.basic_publish.call_count, 4)
+        self.assertEqual(result.published, 30)
+        self.assertFalse(result.interrupted)
+
+    def test_envelopes_cannot_be_checkpointed(self):
+        arguments = ["menus", "10", "--envelope", "array", "--checkpoint", "run.checkpoint"]
+        result = CliRunner().invoke(queue_create, arguments)
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("--envelope", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
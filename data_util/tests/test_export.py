@@ -0,0 +1,87 @@
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from data_util.export import COMPRESSION_GZIP, FORMAT_CSV, FORMAT_PARQUET, default_output, export
+from data_util.generators import (
+    MODEL_FRANCHISES,
+    MODEL_MENU_ITEMS,
+    MODEL_PERSON,
+    MODEL_RESTAURANTS,
+    generate_record_range,
+)
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _export(self, *arguments):
+        result = CliRunner().invoke(export, list(arguments))
+        self.assertEqual(result.exit_code, 0, result.output)
+
+    def test_ndjson_holds_the_seeded_records(self):
+        output = os.path.join(self.directory.name, "franchises.ndjson")
+        self._export(MODEL_FRANCHISES, "25", "-o", output, "--seed", "7", "--chunk-size", "10")
+        with open(output) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(records, list(generate_record_range(MODEL_FRANCHISES, 0, 25, 7)))
+
+    def test_gzip_output_is_reproducible(self):
+        outputs = [os.path.join(self.directory.name, f"{index}.ndjson.gz") for index in range(2)]
+        for output in outputs:
+            self._export(MODEL_FRANCHISES, "30", "-o", output, "-z", COMPRESSION_GZIP, "--seed", "7")
+        with open(outputs[0], "rb") as first, open(outputs[1], "rb") as second:
+            self.assertEqual(first.read(), second.read())
+        with gzip.open(outputs[0], "rt") as file:
+            self.assertEqual(len(file.readlines()), 30)
+
+    def test_csv_has_one_header_row(self):
+        output = os.path.join(self.directory.name, "people.csv")
+        self._export(MODEL_PERSON, "25", "-f", FORMAT_CSV, "-o", output, "--seed", "7", "--chunk-size", "10")
+        with open(output, newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(rows, list(generate_record_range(MODEL_PERSON, 0, 25, 7)))
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow"), "pyarrow is installed")
+    def test_parquet_without_pyarrow_is_a_usage_error(self):
+        output = os.path.join(self.directory.name, "franchises.parquet")
+        result = CliRunner().invoke(export, [MODEL_FRANCHISES, "5", "-f", FORMAT_PARQUET, "-o", output])
+        self.assertEqual(result.exit_code, 2)
+        self.assertFalse(os.path.exists(output))
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet_row_groups(self):
+        import pyarrow.parquet as pq
+
+        output = os.path.join(self.directory.name, "franchises.parquet")
+        self._export(MODEL_FRANCHISES, "25", "-f", FORMAT_PARQUET, "-o", output, "--chunk-size", "10")
+        parquet_file = pq.ParquetFile(output)
+        self.assertEqual(parquet_file.metadata.num_rows, 25)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet_keeps_non_string_columns(self):
+        import pyarrow.parquet as pq
+
+        for model in (MODEL_MENU_ITEMS, MODEL_RESTAURANTS):
+            output = os.path.join(self.directory.name, f"{model}.parquet")
+            self._export(model, "25", "-f", FORMAT_PARQUET, "-o", output, "--seed", "7", "--chunk-size", "10")
+            self.assertEqual(pq.read_table(output).to_pylist(), list(generate_record_range(model, 0, 25, 7)))
+
+    def test_default_output(self):
+        self.assertEqual(default_output(MODEL_FRANCHISES, "ndjson", COMPRESSION_GZIP), "franchises.ndjson.gz")
+        self.assertEqual(default_output(MODEL_FRANCHISES, FORMAT_PARQUET, COMPRESSION_GZIP), "franchises.parquet")
+
+
+if __name__ == "__main__":
+    unittest.main()
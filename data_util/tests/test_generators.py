@@ -0,0 +1,136 @@
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+from faker import Faker
+
+from data_util.generators import (
+    DATE_EPOCH,
+    GENERATOR_BATCH,
+    GENERATOR_FAKER,
+    MAXIMUM_ITEM_PRICE,
+    MAXIMUM_NAME_LENGTH,
+    MINIMUM_ITEM_PRICE,
+    MODEL_FOOD_TYPES,
+    MODEL_FRANCHISES,
+    MODEL_MENU_CATEGORIES,
+    MODEL_MENU_ITEMS,
+    MODEL_MENUS,
+    MODEL_PERSON,
+    MODEL_RESTAURANT_OWNERS,
+    MODEL_RESTAURANTS,
+    SEED_BLOCK_SIZE,
+    BatchRecordGenerator,
+    generate_record_range,
+    generate_records,
+)
+from data_util.providers.menu_catalog import get_menu_catalog
+
+
+class TestBatchRecordGenerator(unittest.TestCase):
+    def setUp(self):
+        self.faker = Faker()
+        self.faker.seed_instance(1234)
+        self.generator = BatchRecordGenerator(self.faker, pool_size=50)
+
+    def test_records_have_the_faker_fields(self):
+        for model, fields in (
+            (MODEL_FRANCHISES, {"franchise_name", "description"}),
+            (MODEL_FOOD_TYPES, {"type_name", "description"}),
+            (MODEL_MENUS, {"menu_name", "description"}),
+            (MODEL_MENU_CATEGORIES, {"category_name", "description"}),
+            (MODEL_MENU_ITEMS, {"item_name", "description", "item_price"}),
+            (MODEL_PERSON, {"first_name", "last_name", "email", "date_of_birth", "gender"}),
+            (MODEL_RESTAURANT_OWNERS, {"owner_name", "description"}),
+            (MODEL_RESTAURANTS, {"restaurant_name", "allow_pets", "has_smoking_area", "remarks"}),
+        ):
+            records = self.generator.generate(model, 200)
+            self.assertEqual(len(records), 200)
+            self.assertEqual(set(records[0]), fields)
+
+    def test_dates_of_birth_are_iso_dates_before_the_epoch(self):
+        for person in self.generator.people(100):
+            self.assertLessEqual(date.fromisoformat(person["date_of_birth"]), DATE_EPOCH)
+
+    def test_pools_are_built_once(self):
+        self.generator.franchises(10)
+        pool = self.generator._pools["sentence"]
+        self.generator.menus(10)
+        self.assertIs(self.generator._pools["sentence"], pool)
+        self.assertEqual(len(pool), 50)
+
+    def test_seeded_faker_gives_reproducible_batches(self):
+        other_faker = Faker()
+        other_faker.seed_instance(1234)
+        other = BatchRecordGenerator(other_faker, pool_size=50)
+        self.assertEqual(self.generator.people(20), other.people(20))
+
+    def test_menu_records_fit_their_columns(self):
+        catalog = get_menu_catalog()
+        for item in self.generator.menu_items(200):
+            self.assertLessEqual(len(item["item_name"]), MAXIMUM_NAME_LENGTH)
+            self.assertTrue(MINIMUM_ITEM_PRICE <= item["item_price"] <= MAXIMUM_ITEM_PRICE)
+        for category in self.generator.menu_categories(200):
+            self.assertIn(category["category_name"], catalog.categories)
+        for menu in self.generator.menus(200):
+            self.assertLessEqual(len(menu["menu_name"]), MAXIMUM_NAME_LENGTH)
+
+    def test_unknown_model(self):
+        with self.assertRaises(ValueError):
+            self.generator.generate("unknown_model", 1)
+
+
+class TestGenerateRecords(unittest.TestCase):
+    def test_faker_and_batch_paths_yield_count_records(self):
+        faker = Faker()
+        self.assertEqual(len(list(generate_records(MODEL_MENUS, 7, faker))), 7)
+        batch_generator = BatchRecordGenerator(faker, pool_size=10)
+        self.assertEqual(len(list(generate_records(MODEL_MENUS, 25001, faker, batch_generator))), 25001)
+
+    def test_unknown_model(self):
+        with self.assertRaises(ValueError):
+            list(generate_records("unknown_model", 1, Faker(), BatchRecordGenerator(Faker())))
+
+
+class TestGenerateRecordRange(unittest.TestCase):
+    def test_records_do_not_depend_on_where_generation_starts(self):
+        for model, generator in ((MODEL_PERSON, GENERATOR_FAKER), (MODEL_MENUS, GENERATOR_BATCH)):
+            whole = list(generate_record_range(model, 0, SEED_BLOCK_SIZE + 20, 42, generator))
+            self.assertEqual(len(whole), SEED_BLOCK_SIZE + 20)
+            start, stop = SEED_BLOCK_SIZE - 5, SEED_BLOCK_SIZE + 10
+            self.assertEqual(list(generate_record_range(model, start, stop, 42, generator)), whole[start:stop])
+            self.assertEqual(list(generate_record_range(model, 3, 8, 42, generator)), whole[3:8])
+
+    def test_records_do_not_depend_on_the_current_date(self):
+        class FutureDate(date):
+            @classmethod
+            def today(cls):
+                return cls(2040, 6, 1)
+
+        class FutureDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls(2040, 6, 1, tzinfo=tz)
+
+        for generator in (GENERATOR_FAKER, GENERATOR_BATCH):
+            today = list(generate_record_range(MODEL_PERSON, 0, 50, 42, generator))
+            with (
+                patch("data_util.generators.date", FutureDate),
+                patch("faker.providers.date_time.dtdate", FutureDate),
+                patch("faker.providers.date_time.datetime", FutureDatetime),
+            ):
+                self.assertEqual(list(generate_record_range(MODEL_PERSON, 0, 50, 42, generator)), today)
+
+    def test_seeds_give_different_records(self):
+        self.assertNotEqual(
+            list(generate_record_range(MODEL_FRANCHISES, 0, 5, 1)),
+            list(generate_record_range(MODEL_FRANCHISES, 0, 5, 2)),
+        )
+
+    def test_unknown_model(self):
+        with self.assertRaises(ValueError):
+            list(generate_record_range("unknown_model", 0, 1, 42))
+
+
+if __name__ == "__main__":
+    unittest.main()
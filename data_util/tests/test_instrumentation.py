@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from data_util.instrumentation import STAGE_GENERATE, STAGE_PUBLISH, Histogram, Stats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_use_bucket_bounds(self):
+        histogram = Histogram((0.001, 0.01, 0.1))
+        for seconds in (0.0005, 0.0008, 0.005, 0.05):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.counts, [2, 1, 1, 0])
+        self.assertEqual(histogram.quantile(0.5), 0.001)
+        self.assertEqual(histogram.quantile(0.99), 0.1)
+        histogram.observe(3)
+        self.assertEqual(histogram.quantile(1.0), 0.1)
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_timed_batches_count_items(self):
+        stats = Stats(clock=self.clock)
+        batches = list(stats.timed_batches(range(1200), STAGE_GENERATE, 500))
+        self.assertEqual([len(batch) for batch in batches], [500, 500, 200])
+        self.assertEqual(stats.stages[STAGE_GENERATE].items, 1200)
+        self.assertEqual(stats.stages[STAGE_GENERATE].latency.count, 3)
+
+    @patch("data_util.instrumentation.logger.info")
+    def test_progress_lines_report_interval_rates(self, mock_logger_info):
+        stats = Stats(progress_interval=10, clock=self.clock)
+        self.clock.now = 5
+        stats.record(STAGE_PUBLISH, 500, 0.01)
+        mock_logger_info.assert_not_called()
+        self.clock.now = 10
+        stats.record(STAGE_PUBLISH, 500, 0.01)
+        mock_logger_info.assert_called_once_with("Progress after %.0fs: %s", 10, "publish 1000 (100/s, p99 10ms)")
+
+    def test_summary_merge_and_files(self):
+        worker = Stats("db-create", clock=self.clock)
+        worker.record(STAGE_PUBLISH, 100, 0.002)
+        stats = Stats("db-create", clock=self.clock)
+        stats.record(STAGE_PUBLISH, 50, 0.2)
+        stats.merge(worker.summary())
+        self.clock.now = 2
+
+        json_file = os.path.join(self.directory.name, "stats.json")
+        stats.write_json(json_file)
+        with open(json_file) as file:
+            summary = json.load(file)
+        self.assertEqual(summary["stages"][STAGE_PUBLISH]["items"], 150)
+        self.assertEqual(summary["stages"][STAGE_PUBLISH]["calls"], 2)
+        self.assertEqual(summary["stages"][STAGE_PUBLISH]["rate"], 75)
+
+        prometheus_file = os.path.join(self.directory.name, "data_util.prom")
+        stats.write_prometheus(prometheus_file)
+        with open(prometheus_file) as file:
+            metrics = file.read().splitlines()
+        self.assertIn('data_util_stage_items_total{command="db-create",stage="publish"} 150', metrics)
+        self.assertIn(
+            'data_util_stage_latency_seconds_bucket{command="db-create",stage="publish",le="+Inf"} 2', metrics
+        )
+        self.assertIn('data_util_stage_latency_seconds_count{command="db-create",stage="publish"} 2', metrics)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import logging
+import os
+import tempfile
+import unittest
+from logging.handlers import QueueHandler
+from unittest.mock import patch
+
+from data_util.logging_config import CONSOLE_ONLY, configure_logging, stop_logging
+
+
+class TestConfigureLogging(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.directory.name, "utility.log")
+        self.logger = logging.getLogger("data_util")
+        self.level = self.logger.level
+
+    def tearDown(self):
+        stop_logging()
+        for handler in [handler for handler in self.logger.handlers if isinstance(handler, QueueHandler)]:
+            self.logger.removeHandler(handler)
+        self.logger.setLevel(self.level)
+        self.directory.cleanup()
+
+    def test_records_are_written_by_the_listener(self):
+        self.assertEqual(configure_logging("warning", self.log_file), ("WARNING", self.log_file))
+        logging.getLogger("data_util.create_db_records").info("not logged")
+        logging.getLogger("data_util.create_db_records").warning("Created %s Franchises", 5)
+        stop_logging()
+
+        with open(self.log_file) as file:
+            lines = file.read().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith("WARNING - "))
+        self.assertTrue(lines[0].endswith("data_util.create_db_records - Created 5 Franchises"))
+
+    def test_reconfiguring_replaces_the_queue_handler(self):
+        configure_logging(log_file=self.log_file)
+        configure_logging(log_file=CONSOLE_ONLY)
+        self.assertEqual(sum(isinstance(handler, QueueHandler) for handler in self.logger.handlers), 1)
+
+    def test_environment_defaults(self):
+        with patch.dict(os.environ, {"LOG_LEVEL": "debug", "LOG_FILE": self.log_file}):
+            self.assertEqual(configure_logging(), ("DEBUG", self.log_file))
+        self.assertEqual(self.logger.level, logging.DEBUG)
+
+
+if __name__ == "__main__":
+    unittest.main()
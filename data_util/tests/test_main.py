@@ -0,0 +1,85 @@
+import logging
+import os
+import subprocess
+import sys
+import unittest
+from logging.handlers import QueueHandler
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from data_util.__main__ import UTILITY_COMMANDS, cli, utility
+from data_util.logging_config import CONSOLE_ONLY, logging_settings, stop_logging
+
+# Modules that only the commands themselves need
+HEAVY_MODULES = ("faker", "numpy", "pika", "psycopg2", "sqlalchemy")
+# Cumulative import time allowed for data_util.__main__, in microseconds
+STARTUP_BUDGET = 250_000
+
+
+def _run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *options, "-c", code], capture_output=True, text=True, check=True)
+
+
+def _stop_logging() -> None:
+    stop_logging()
+    logger = logging.getLogger("data_util")
+    for handler in [handler for handler in logger.handlers if isinstance(handler, QueueHandler)]:
+        logger.removeHandler(handler)
+
+
+class TestLazyCommands(unittest.TestCase):
+    def test_help_does_not_import_commands(self):
+        result = _run_python(
+            "import sys\n"
+            "from click.testing import CliRunner\n"
+            "from data_util.__main__ import cli\n"
+            f"assert CliRunner().invoke(cli, ['--log-file', '{CONSOLE_ONLY}', 'utility', '--help']).exit_code == 0\n"
+            f"print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+        )
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_import_time_is_within_budget(self):
+        result = _run_python("import data_util.__main__", "-X", "importtime")
+        line = next(line for line in result.stderr.splitlines() if line.endswith("| data_util.__main__"))
+        cumulative = int(line.split("|")[1])
+        self.assertLess(cumulative, STARTUP_BUDGET)
+
+    def test_commands_load_with_matching_help(self):
+        # The cli group configures logging; keep it off the working tree's log file
+        self.addCleanup(_stop_logging)
+        help_output = CliRunner().invoke(cli, ["--log-file", CONSOLE_ONLY, "utility", "--help"]).output
+        for name, (_import_path, short_help) in UTILITY_COMMANDS.items():
+            command = utility.get_command(None, name)
+            self.assertEqual(command.name.replace("_", "-"), name)
+            self.assertEqual(command.get_short_help_str(limit=120), short_help)
+            self.assertIn(name, help_output)
+
+
+class TestLoggingOptions(unittest.TestCase):
+    def setUp(self):
+        logger = logging.getLogger("data_util")
+        level = logger.level
+        self.addCleanup(logger.setLevel, level)
+        self.addCleanup(_stop_logging)
+        environment = patch.dict(os.environ)
+        environment.start()
+        self.addCleanup(environment.stop)
+        os.environ.pop("LOG_LEVEL", None)
+        os.environ.pop("LOG_FILE", None)
+
+    @patch("data_util.__main__.dotenv_values", return_value={"LOG_LEVEL": "warning", "LOG_FILE": CONSOLE_ONLY})
+    def test_dotenv_logging_settings(self, mock_dotenv_values):
+        CliRunner().invoke(cli, ["utility", "--help"])
+        self.assertEqual(logging_settings(), ("WARNING", CONSOLE_ONLY))
+
+        os.environ["LOG_LEVEL"] = "error"
+        CliRunner().invoke(cli, ["utility", "--help"])
+        self.assertEqual(logging_settings(), ("ERROR", CONSOLE_ONLY))
+
+        CliRunner().invoke(cli, ["--log-level", "debug", "utility", "--help"])
+        self.assertEqual(logging_settings(), ("DEBUG", CONSOLE_ONLY))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+from itertools import count
+from unittest.mock import MagicMock, patch
+
+import pika
+from click.testing import CliRunner
+
+from data_util.create_reference_message import queue_create
+from data_util.measure_messages import LatencyMeter, consume, queue_measure
+
+
+def _headers(run: int, sequence: int, published_at: int) -> dict[str, int]:
+    return {"x-run": run, "x-sequence": sequence, "x-published-at": published_at}
+
+
+def _delivery(tag: int, headers: dict[str, int]) -> tuple:
+    return pika.spec.Basic.Deliver(delivery_tag=tag), pika.BasicProperties(headers=headers), b"{}"
+
+
+class TestLatencyMeter(unittest.TestCase):
+    def test_gaps_duplicates_and_latency(self):
+        meter = LatencyMeter()
+        for sequence in (5, 6, 6, 9, 10, 13):
+            meter.observe(_headers(7, sequence, 1_000_000_000), 1_000_000_000 + sequence * 1_000_000)
+        meter.observe(None, 0)
+        meter.observe({"other": 1}, 0)
+        (measurement,) = meter.measurements()
+        self.assertEqual((meter.received, meter.unstamped), (8, 2))
+        self.assertEqual((measurement.received, measurement.duplicates), (6, 1))
+        self.assertEqual((measurement.missing, measurement.gaps), (4, 2))
+        self.assertEqual((measurement.first_sequence, measurement.last_sequence), (5, 13))
+        self.assertAlmostEqual(measurement.latency["p50"], 0.0075)
+        self.assertAlmostEqual(measurement.latency["max"], 0.013)
+        self.assertEqual(list(measurement.latency), ["p50", "p90", "p99", "p99.9", "max"])
+
+    def test_runs_are_measured_apart(self):
+        meter = LatencyMeter()
+        meter.observe(_headers(2, 0, 0), 0)
+        meter.observe(_headers(1, 0, 0), 0)
+        self.assertEqual([(m.run, m.missing, m.duplicates) for m in meter.measurements()], [(1, 0, 0), (2, 0, 0)])
+
+
+class TestConsume(unittest.TestCase):
+    def _channel(self, deliveries: list) -> MagicMock:
+        channel = MagicMock(spec=["consume", "basic_ack", "cancel", "is_open"])
+        channel.consume.return_value = iter(deliveries)
+        channel.is_open = True
+        return channel
+
+    def test_acks_in_batches_and_stops_at_count(self):
+        channel = self._channel([_delivery(tag, _headers(1, tag, 0)) for tag in range(1, 11)])
+        meter = LatencyMeter()
+        consume(channel, "measure", meter, count=5, ack_every=2)
+        self.assertEqual(meter.received, 5)
+        acked = [call.args[0] for call in channel.basic_ack.call_args_list]
+        self.assertEqual(acked, [2, 4, 5])
+        channel.cancel.assert_called_once()
+
+    def test_stops_when_idle(self):
+        channel = self._channel([_delivery(1, _headers(1, 0, 0))] + [(None, None, None)] * 5)
+        meter = LatencyMeter()
+        # One clock reading per delivery or inactivity timeout, 10 seconds apart
+        consume(channel, "measure", meter, idle_timeout=25, report_interval=1000, clock=count(0.0, 10.0).__next__)
+        self.assertEqual(meter.received, 1)
+        self.assertEqual(len(list(channel.consume.return_value)), 2)
+
+
+class TestQueueMeasure(unittest.TestCase):
+    @patch("data_util.queue_publishing.close_connection_pool")
+    @patch("data_util.queue_publishing.load_dotenv")
+    @patch("data_util.queue_publishing.publish_message_to_exchange")
+    def test_stamped_messages_are_measured(self, mock_publish_message_to_exchange, _mock_load_dotenv, _mock_close):
+        published = MagicMock(spec=["basic_publish"])
+        mock_publish_message_to_exchange.return_value = published
+        runner = CliRunner()
+        result = runner.invoke(queue_create, ["franchises", "20", "--seed", "9", "--start-offset", "100", "--stamp"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        deliveries = [
+            _delivery(tag, call.kwargs["properties"].headers)
+            for tag, call in enumerate(published.basic_publish.call_args_list, 1)
+        ]
+        del deliveries[4]
+
+        channel = MagicMock()
+        channel.consume.return_value = iter(deliveries)
+        channel.queue_declare.return_value.method.queue = "amq.gen-test"
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            patch("data_util.measure_messages.get_connection_pool") as mock_get_connection_pool,
+            patch("data_util.measure_messages.close_connection_pool"),
+        ):
+            mock_get_connection_pool.return_value.channel.return_value = channel
+            summary_file = os.path.join(directory, "summary.json")
+            arguments = ["franchises", "--exchange", "test", "--count", "19", "--summary-file", summary_file]
+            result = runner.invoke(queue_measure, arguments)
+            self.assertEqual(result.exit_code, 0, result.output)
+            with open(summary_file) as file:
+                summary = json.load(file)
+
+        channel.queue_bind.assert_called_once_with(queue="amq.gen-test", exchange="test", routing_key="franchises")
+        channel.basic_qos.assert_called_once_with(prefetch_count=1000)
+        (run,) = summary["runs"]
+        self.assertEqual((run["run"], run["received"], run["missing"], run["gaps"]), (9, 19, 1, 1))
+        self.assertEqual((run["first_sequence"], run["last_sequence"]), (100, 119))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from data_util.providers.menu_catalog import (
+    DEFAULT_MENU_FILE,
+    decode_catalog,
+    encode_catalog,
+    load_menu_catalog,
+    parse_menu,
+)
+
+MENU = """**Breakfast Menu**
+
+1. Pancakes (with maple syrup)
+2. Omelette
+
+**Empty Menu**
+
+**Café Menu**
+
+1. Crème brûlée (vanilla)
+"""
+
+
+class TestParseMenu(unittest.TestCase):
+    def test_categories_and_items(self):
+        catalog = parse_menu(MENU.splitlines())
+        self.assertEqual(catalog.categories, ("Breakfast Menu", "Café Menu"))
+        self.assertEqual(catalog.item_names, ("Pancakes", "Omelette", "Crème brûlée"))
+        self.assertEqual(catalog.item_details, ("with maple syrup", "", "vanilla"))
+        self.assertEqual(catalog.category_items(1), range(2, 3))
+        self.assertEqual(catalog.item_categories, (0, 0, 1))
+
+    def test_packaged_menu(self):
+        with open(DEFAULT_MENU_FILE) as file:
+            catalog = parse_menu(file)
+        self.assertTrue(catalog.categories)
+        for category in range(len(catalog.categories)):
+            self.assertTrue(catalog.category_items(category))
+
+    def test_encode_round_trip(self):
+        catalog = parse_menu(MENU.splitlines())
+        digest = bytes(range(32))
+        self.assertEqual(decode_catalog(encode_catalog(catalog, 10, 20, digest)), (catalog, 10, 20, digest))
+
+    def test_decode_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            decode_catalog(b"**Breakfast Menu**\n")
+
+
+class TestLoadMenuCatalog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, "cache")
+        self.menu_file = os.path.join(self.directory.name, "menu.txt")
+        with open(self.menu_file, "w") as file:
+            file.write(MENU)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cached_catalog_is_used_while_the_file_is_unchanged(self):
+        catalog = load_menu_catalog(self.menu_file, self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        with patch("data_util.providers.menu_catalog.parse_menu") as parse:
+            self.assertEqual(load_menu_catalog(self.menu_file, self.cache_dir), catalog)
+        parse.assert_not_called()
+
+    def test_changed_file_is_parsed_again(self):
+        load_menu_catalog(self.menu_file, self.cache_dir)
+        with open(self.menu_file, "a") as file:
+            file.write("2. Crêpe\n")
+        catalog = load_menu_catalog(self.menu_file, self.cache_dir)
+        self.assertEqual(catalog.item_names[-1], "Crêpe")
+
+    def test_touched_file_keeps_its_catalog(self):
+        catalog = load_menu_catalog(self.menu_file, self.cache_dir)
+        status = os.stat(self.menu_file)
+        os.utime(self.menu_file, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+        with patch("data_util.providers.menu_catalog.parse_menu") as parse:
+            self.assertEqual(load_menu_catalog(self.menu_file, self.cache_dir), catalog)
+        parse.assert_not_called()
+
+    def test_corrupt_cache_is_rebuilt(self):
+        catalog = load_menu_catalog(self.menu_file, self.cache_dir)
+        (cache_name,) = os.listdir(self.cache_dir)
+        with open(os.path.join(self.cache_dir, cache_name), "wb") as file:
+            file.write(b"DUMENU1\n\x00")
+        self.assertEqual(load_menu_catalog(self.menu_file, self.cache_dir), catalog)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from data_util.message_files import (
+    count_messages,
+    encode_frame,
+    frames_header,
+    is_frames_file,
+    iter_frames,
+    iter_lines,
+    read_frames_header,
+)
+
+
+class TestMessageFiles(unittest.TestCase):
+    def test_frames_round_trip(self):
+        buffer = (
+            frames_header("application/msgpack")
+            + encode_frame(b"menus", b"\x81\xa1a\x01")
+            + encode_frame(b"people", b"")
+        )
+        self.assertTrue(is_frames_file(buffer))
+        content_type, offset = read_frames_header(buffer)
+        self.assertEqual(content_type, "application/msgpack")
+        self.assertEqual(list(iter_frames(buffer, offset)), [("menus", b"\x81\xa1a\x01"), ("people", b"")])
+        self.assertEqual(count_messages(buffer), 2)
+
+    def test_truncated_frame(self):
+        buffer = frames_header("application/json") + encode_frame(b"menus", b"{}")[:-1]
+        with self.assertRaises(ValueError):
+            list(iter_frames(buffer, read_frames_header(buffer)[1]))
+
+    def test_lines_skip_blank_lines(self):
+        buffer = b'{"a": 1}\n\n{"a": 2}'
+        self.assertFalse(is_frames_file(buffer))
+        self.assertEqual(list(iter_lines(buffer)), [b'{"a": 1}', b'{"a": 2}'])
+        self.assertEqual(count_messages(b'{"a": 1}\n{"a": 2}\n'), 2)
+        self.assertEqual(count_messages(b'{"a": 1}\n{"a": 2}'), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
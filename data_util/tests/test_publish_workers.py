@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pika
+from click.testing import CliRunner
+from pika.frame import Method
+
+from data_util.create_reference_message import queue_create
+from data_util.envelopes import ENVELOPE_FRAMES, Envelope
+from data_util.publish_workers import (
+    EXIT_INTERRUPTED,
+    _log_run_totals,
+    exit_status,
+    run_publish_job,
+    split_publish_jobs,
+)
+from data_util.queue_publishing import publish_records
+from data_util.runs import RunPlan
+
+
+class AckingConnection:
+    """An AsyncioConnection stand-in whose broker acks every message published on its channel."""
+
+    def __init__(self, parameters, on_open_callback, on_open_error_callback, on_close_callback, custom_ioloop):
+        self.loop = custom_ioloop
+        self.on_close_callback = on_close_callback
+        self.is_closed = False
+        self.is_closing = False
+        self.published = 0
+        self._ack_nack_callback = None
+        custom_ioloop.call_soon(on_open_callback, self)
+
+    def channel(self, on_open_callback):
+        self.loop.call_soon(on_open_callback, self)
+
+    def add_on_return_callback(self, callback):
+        pass
+
+    def confirm_delivery(self, ack_nack_callback, callback):
+        self._ack_nack_callback = ack_nack_callback
+        self.loop.call_soon(callback, Method(1, pika.spec.Confirm.SelectOk()))
+
+    def exchange_declare(self, exchange, exchange_type, durable, callback):
+        self.loop.call_soon(callback, Method(1, pika.spec.Exchange.DeclareOk()))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.published += 1
+        ack = pika.spec.Basic.Ack(delivery_tag=self.published, multiple=True)
+        self.loop.call_soon(self._ack_nack_callback, Method(1, ack))
+
+    def close(self):
+        self.is_closed = True
+        self.loop.call_soon(self.on_close_callback, self, None)
+
+
+@patch("data_util.publish_workers.close_connection_pool")
+@patch("data_util.publish_workers.publish_message_to_exchange")
+class TestRunPublishJob(unittest.TestCase):
+    def setUp(self):
+        self.channel = MagicMock(spec=["basic_publish"])
+
+    def _jobs(self, plan: RunPlan, workers: int, **options):
+        return split_publish_jobs(plan, workers, model="franchises", publish_records=publish_records, **options)
+
+    def test_split_follows_checkpoint_progress(self, _mock_publish_message_to_exchange, _mock_close):
+        jobs = self._jobs(RunPlan(7, 10, 15, 40, {10: 15, 30: 40}), 3)
+        self.assertEqual(
+            [(job.index, job.part_start, job.start, job.count) for job in jobs],
+            [(0, 10, 15, 5), (1, 20, 20, 10)],
+        )
+
+    def test_jobs_publish_their_share_and_checkpoint_it(self, mock_publish_message_to_exchange, _mock_close):
+        mock_publish_message_to_exchange.return_value = self.channel
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "run.checkpoint")
+            open(checkpoint, "w").close()
+            results = [run_publish_job(job) for job in self._jobs(RunPlan(7, 0, 0, 30), 2, checkpoint=checkpoint)]
+            with open(checkpoint) as file:
+                entries = [json.loads(line) for line in file]
+        self.assertEqual([result.published for result in results], [15, 15])
+        self.assertEqual(self.channel.basic_publish.call_count, 30)
+        self.assertEqual(entries, [{"start": 0, "next": 15}, {"start": 15, "next": 30}])
+        self.assertEqual(exit_status(results), 0)
+        self.assertIn("generate", results[0].stats["stages"])
+
+    @patch("data_util.connections.rabbit_connection.AsyncioConnection", AckingConnection)
+    @patch.dict(os.environ, {"RABBITMQ_HOST": "localhost", "RABBITMQ_USERNAME": "user", "RABBITMQ_PASSWORD": "secret"})
+    def test_envelope_confirms_count_messages(self, mock_publish_message_to_exchange, _mock_close):
+        mock_publish_message_to_exchange.return_value = self.channel
+        envelope = Envelope(ENVELOPE_FRAMES, 8)
+        (job,) = self._jobs(RunPlan(7, 0, 0, 30), 1, confirm_window=2, envelope=envelope)
+        result = run_publish_job(job)
+        self.assertEqual((result.published, result.messages), (30, 4))
+        self.assertEqual((result.confirmed, result.nacked, result.unconfirmed), (4, 0, 0))
+        with self.assertLogs("data_util.publish_workers", "INFO") as logs:
+            _log_run_totals([result], "Franchises", 1.0, confirms=True)
+        self.assertIn("Confirmed 4 of 4 messages (0 nacked, 0 returned, 0 unconfirmed)", logs.output[-1])
+
+    def test_failed_job_keeps_its_count(self, mock_publish_message_to_exchange, _mock_close):
+        mock_publish_message_to_exchange.return_value = self.channel
+        self.channel.basic_publish.side_effect = [None] * 4 + [ConnectionError("closed")]
+        with self.assertLogs("data_util.publish_workers", "ERROR"):
+            result = run_publish_job(self._jobs(RunPlan(7, 0, 0, 10), 1)[0])
+        self.assertEqual(result.published, 4)
+        self.assertIn("ConnectionError", result.error)
+        self.assertEqual(exit_status([result]), 1)
+
+    def test_stopped_job_reports_an_interruption(self, mock_publish_message_to_exchange, _mock_close):
+        mock_publish_message_to_exchange.return_value = self.channel
+        stop = threading.Event()
+        stop.set()
+        with patch("data_util.publish_workers._stop_event", stop):
+            result = run_publish_job(self._jobs(RunPlan(7, 0, 0, 10), 1)[0])
+        self.channel.basic_publish.assert_not_called()
+        self.assertTrue(result.interrupted)
+        self.assertEqual(exit_status([result]), EXIT_INTERRUPTED)
+
+
+class TestQueueCreateWorkers(unittest.TestCase):
+    @patch("data_util.queue_publishing.load_dotenv")
+    @patch("data_util.queue_publishing.run_publish_jobs")
+    def test_workers_split_the_run(self, mock_run_publish_jobs, _mock_load_dotenv):
+        mock_run_publish_jobs.return_value = []
+        result = CliRunner().invoke(queue_create, ["menus", "10", "--seed", "3", "--workers", "3"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        jobs = mock_run_publish_jobs.call_args.args[0]
+        self.assertEqual([(job.start, job.count, job.seed) for job in jobs], [(0, 4, 3), (4, 3, 3), (7, 3, 3)])
+
+    def test_workers_need_the_blocking_engine(self):
+        result = CliRunner().invoke(queue_create, ["menus", "10", "--workers", "2", "--engine", "async"])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("--workers", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pika
+from pika.frame import Method
+
+from data_util.connections.rabbit_connection import (
+    CheckpointingPublisher,
+    ConfirmedPublisher,
+    ConfirmTracker,
+    RabbitConnectionPool,
+    StampingPublisher,
+)
+
+
+class TestConfirmTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = ConfirmTracker()
+        for _ in range(5):
+            self.tracker.on_publish()
+
+    def test_single_and_multiple_acks(self):
+        self.tracker.on_confirm(2, multiple=False, ack=True)
+        self.tracker.on_confirm(4, multiple=True, ack=True)
+        self.assertEqual(self.tracker.acked, 4)
+        self.assertEqual(self.tracker.in_flight, 1)
+
+    def test_nacks_and_returns_are_failures(self):
+        self.tracker.on_confirm(1, multiple=False, ack=False)
+        self.tracker.on_return()
+        self.tracker.on_confirm(5, multiple=True, ack=True)
+        self.assertEqual(self.tracker.nacked, 1)
+        self.assertEqual(self.tracker.confirmed, 3)
+        self.assertEqual(self.tracker.failed, 2)
+        self.assertEqual(self.tracker.in_flight, 0)
+
+    def test_repeated_confirms_are_ignored(self):
+        self.tracker.on_confirm(3, multiple=True, ack=True)
+        self.tracker.on_confirm(3, multiple=False, ack=True)
+        self.tracker.on_confirm(2, multiple=True, ack=True)
+        self.assertEqual(self.tracker.acked, 3)
+
+    def test_settled_stops_at_the_first_unconfirmed_message(self):
+        self.tracker.on_confirm(1, multiple=False, ack=True)
+        self.tracker.on_confirm(3, multiple=False, ack=True)
+        self.assertEqual(self.tracker.settled, 1)
+        self.tracker.on_confirm(5, multiple=True, ack=True)
+        self.assertEqual(self.tracker.settled, 5)
+
+
+class TestCheckpointingPublisher(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.directory.name, "run.checkpoint")
+        with open(self.checkpoint, "w") as file:
+            file.write(json.dumps({"params": {}}) + "\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _entries(self):
+        with open(self.checkpoint) as file:
+            return [json.loads(line) for line in file.readlines()[1:]]
+
+    def test_published_messages_are_recorded_every_interval(self):
+        publisher = CheckpointingPublisher(MagicMock(spec=["basic_publish"]), self.checkpoint, 100, 120, interval=2)
+        for _ in range(5):
+            publisher.basic_publish(exchange="test_exchange", routing_key="franchises", body="{}")
+        publisher.save()
+        self.assertEqual(
+            self._entries(), [{"start": 100, "next": 122}, {"start": 100, "next": 124}, {"start": 100, "next": 125}]
+        )
+
+    def test_only_confirmed_messages_are_recorded(self):
+        confirmed = MagicMock(spec=["basic_publish", "settled"])
+        confirmed.settled = 0
+        publisher = CheckpointingPublisher(confirmed, self.checkpoint, 0)
+        for _ in range(3):
+            publisher.basic_publish(exchange="test_exchange", routing_key="franchises", body="{}")
+        confirmed.settled = 2
+        publisher.save()
+        self.assertEqual(self._entries(), [{"start": 0, "next": 2}])
+
+
+class TestStampingPublisher(unittest.TestCase):
+    def test_messages_are_numbered_from_the_first_sequence(self):
+        channel = MagicMock(spec=["basic_publish"])
+        properties = pika.BasicProperties(content_type="application/json", headers={"source": "test"})
+        publisher = StampingPublisher(channel, 7, 40)
+        for _ in range(2):
+            publisher.basic_publish(exchange="test", routing_key="franchises", body="{}", properties=properties)
+        stamped = [call.kwargs["properties"] for call in channel.basic_publish.call_args_list]
+        self.assertEqual([message.headers["x-sequence"] for message in stamped], [40, 41])
+        self.assertEqual(stamped[0].headers["x-run"], 7)
+        self.assertEqual(stamped[0].headers["source"], "test")
+        self.assertEqual(stamped[0].content_type, "application/json")
+        self.assertLessEqual(stamped[0].headers["x-published-at"], stamped[1].headers["x-published-at"])
+        self.assertEqual(properties.headers, {"source": "test"})
+
+
+class FakeConfirmingChannel:
+    """An AsyncioConnection channel stand-in whose broker acks each message, unless acks are held."""
+
+    def __init__(self, loop, ack=True):
+        self.loop = loop
+        self.ack = ack
+        self.published = []
+        self.return_callback = None
+        self._ack_nack_callback = None
+
+    def add_on_return_callback(self, callback):
+        self.return_callback = callback
+
+    def confirm_delivery(self, ack_nack_callback, callback):
+        self._ack_nack_callback = ack_nack_callback
+        self.loop.call_soon(callback, Method(1, pika.spec.Confirm.SelectOk()))
+
+    def exchange_declare(self, exchange, exchange_type, durable, callback):
+        self.loop.call_soon(callback, Method(1, pika.spec.Exchange.DeclareOk()))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, mandatory=False):
+        self.published.append({"exchange": exchange, "routing_key": routing_key, "mandatory": mandatory})
+        if routing_key == "nowhere":
+            self.return_callback(self, pika.spec.Basic.Return(312, "NO_ROUTE"), properties, body)
+        if self.ack:
+            self.confirm(len(self.published))
+
+    def confirm(self, delivery_tag):
+        ack = pika.spec.Basic.Ack(delivery_tag=delivery_tag, multiple=True)
+        self.loop.call_soon_threadsafe(self._ack_nack_callback, Method(1, ack))
+
+
+class FakeAsyncioConnection:
+    """An AsyncioConnection that opens at once on its event loop with one FakeConfirmingChannel."""
+
+    ack = True
+
+    def __init__(self, parameters, on_open_callback, on_open_error_callback, on_close_callback, custom_ioloop):
+        self.loop = custom_ioloop
+        self.on_close_callback = on_close_callback
+        self.is_closed = False
+        self.is_closing = False
+        self.fake_channel = FakeConfirmingChannel(custom_ioloop, self.ack)
+        custom_ioloop.call_soon(on_open_callback, self)
+
+    def channel(self, on_open_callback):
+        self.loop.call_soon(on_open_callback, self.fake_channel)
+
+    def close(self, reason=None):
+        self.is_closed = True
+        self.loop.call_soon_threadsafe(self.on_close_callback, self, reason)
+
+
+@patch("data_util.connections.rabbit_connection.AsyncioConnection", FakeAsyncioConnection)
+class TestConfirmedPublisher(unittest.TestCase):
+    def _publisher(self, window, ack=True, **kwargs):
+        with patch.object(FakeAsyncioConnection, "ack", ack):
+            publisher = ConfirmedPublisher("test_exchange", window, parameters=pika.ConnectionParameters(), **kwargs)
+        self.addCleanup(publisher.close)
+        return publisher, publisher._connection.fake_channel
+
+    def test_window_limits_unconfirmed_messages(self):
+        publisher, channel = self._publisher(3)
+        in_flight = []
+        for index in range(10):
+            publisher.basic_publish(exchange="test_exchange", routing_key="franchises", body=str(index))
+            in_flight.append(publisher.tracker.in_flight)
+        self.assertLessEqual(max(in_flight), 3)
+
+        tracker = publisher.wait_for_confirms()
+        self.assertEqual(tracker.published, 10)
+        self.assertEqual(tracker.confirmed, 10)
+        self.assertEqual(tracker.in_flight, 0)
+        self.assertTrue(all(message["mandatory"] for message in channel.published))
+
+    def test_full_window_waits_for_acks(self):
+        publisher, channel = self._publisher(2, ack=False, timeout=0.05)
+        for _ in range(2):
+            publisher.basic_publish(exchange="test_exchange", routing_key="franchises", body="{}")
+        with self.assertRaises(TimeoutError):
+            publisher.basic_publish(exchange="test_exchange", routing_key="franchises", body="{}")
+
+        channel.confirm(1)
+        publisher.basic_publish(exchange="test_exchange", routing_key="franchises", body="{}")
+        self.assertEqual(publisher.settled, 1)
+        self.assertEqual(publisher.tracker.published, 3)
+
+    def test_returned_messages_are_counted(self):
+        publisher, _channel = self._publisher(10)
+        publisher.basic_publish(exchange="test_exchange", routing_key="nowhere", body="{}")
+
+        tracker = publisher.wait_for_confirms()
+        self.assertEqual(tracker.returned, 1)
+        self.assertEqual(tracker.confirmed, 0)
+        self.assertEqual(tracker.failed, 1)
+
+    def test_closed_connection_fails_publishes(self):
+        publisher, _channel = self._publisher(1, ack=False)
+        publisher.basic_publish(exchange="test_exchange", routing_key="franchises", body="{}")
+        publisher._connection.close(pika.exceptions.ConnectionClosedByBroker(320, "CONNECTION_FORCED"))
+        with self.assertRaises(pika.exceptions.AMQPConnectionError):
+            publisher.basic_publish(exchange="test_exchange", routing_key="franchises", body="{}")
+        self.assertEqual(publisher.wait_for_confirms().in_flight, 1)
+
+
+@patch("data_util.connections.rabbit_connection.pika.BlockingConnection")
+class TestRabbitConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.parameters = pika.ConnectionParameters(host="localhost")
+
+    def test_released_channels_are_reused(self, mock_connection_class):
+        with RabbitConnectionPool(self.parameters) as pool:
+            channel = pool.channel("test_exchange")
+            pool.release(channel)
+            self.assertIs(pool.channel("test_exchange"), channel)
+            mock_connection_class.assert_called_once_with(self.parameters)
+
+    def test_exchange_is_declared_once(self, mock_connection_class):
+        with RabbitConnectionPool(self.parameters) as pool:
+            first = pool.channel("test_exchange")
+            pool.channel("test_exchange")
+            first.exchange_declare.assert_called_once_with(
+                exchange="test_exchange", exchange_type="topic", durable=True
+            )
+            self.assertEqual(mock_connection_class.return_value.channel.call_count, 2)
+
+    def test_channels_are_spread_over_connections(self, mock_connection_class):
+        connections = [MagicMock(), MagicMock()]
+        mock_connection_class.side_effect = connections
+        pool = RabbitConnectionPool(self.parameters, max_connections=2)
+        for _ in range(4):
+            pool.channel()
+        self.assertEqual([connection.channel.call_count for connection in connections], [2, 2])
+
+    def test_close_closes_connections(self, mock_connection_class):
+        with RabbitConnectionPool(self.parameters) as pool:
+            pool.channel()
+        mock_connection_class.return_value.close.assert_called_once()
+        self.assertEqual(pool._connections, [])
+
+    def test_sleep_services_heartbeats(self, mock_connection_class):
+        pool = RabbitConnectionPool(self.parameters)
+        pool.channel()
+        connection = mock_connection_class.return_value
+        connection.sleep.side_effect = lambda seconds: None
+        with patch("data_util.connections.rabbit_connection.time.monotonic", side_effect=[0, 0, 0.5, 1.5]):
+            pool.sleep(1)
+        self.assertEqual(connection.process_data_events.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from click.testing import CliRunner
+
+from data_util.export import FORMAT_FRAMES, export
+from data_util.generators import MODEL_MENUS, MODEL_PERSON
+from data_util.message_files import encode_frame, frames_header
+from data_util.replay_messages import queue_replay
+
+
+@patch("data_util.replay_messages.load_dotenv")
+@patch("data_util.replay_messages.get_connection_pool")
+class TestQueueReplay(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {"EXCHANGE": "test_exchange", "ACTOR_EXCHANGE": "test_actor_exchange"})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.directory.cleanup()
+
+    def _channel(self, mock_get_connection_pool):
+        channel = MagicMock(spec=["basic_publish"])
+        mock_get_connection_pool.return_value.channel.return_value = channel
+        return channel
+
+    def _bodies(self, channel):
+        return [call.kwargs["body"] for call in channel.basic_publish.call_args_list]
+
+    def test_ndjson_lines_are_published_as_they_are(self, mock_get_connection_pool, mock_load_dotenv):
+        channel = self._channel(mock_get_connection_pool)
+        path = os.path.join(self.directory.name, "menus.ndjson")
+        with open(path, "wb") as file:
+            file.write(b'{"menu_name": "A"}\n{"menu_name":"B"}\n')
+
+        result = CliRunner().invoke(queue_replay, [path])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("--model", result.output)
+
+        result = CliRunner().invoke(queue_replay, [path, "--model", MODEL_MENUS])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self._bodies(channel), [b'{"menu_name": "A"}', b'{"menu_name":"B"}'])
+        self.assertEqual(channel.basic_publish.call_args.kwargs["routing_key"], MODEL_MENUS)
+        self.assertEqual(channel.basic_publish.call_args.kwargs["exchange"], "test_exchange")
+
+    def test_exported_frames_replay_the_exported_records(self, mock_get_connection_pool, mock_load_dotenv):
+        channel = self._channel(mock_get_connection_pool)
+        frames = os.path.join(self.directory.name, "menus.frames")
+        ndjson = os.path.join(self.directory.name, "menus.ndjson")
+        runner = CliRunner()
+        runner.invoke(export, [MODEL_MENUS, "30", "-f", FORMAT_FRAMES, "-o", frames, "--seed", "7"])
+        runner.invoke(export, [MODEL_MENUS, "30", "-o", ndjson, "--seed", "7"])
+
+        result = runner.invoke(queue_replay, [frames, "--count", "20"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        with open(ndjson, "rb") as file:
+            self.assertEqual(self._bodies(channel), file.read().splitlines()[:20])
+        self.assertEqual(channel.basic_publish.call_args.kwargs["properties"].content_type, "application/json")
+
+    def test_mixed_model_files_publish_each_model_to_its_exchange(self, mock_get_connection_pool, mock_load_dotenv):
+        channel = self._channel(mock_get_connection_pool)
+        path = os.path.join(self.directory.name, "mixed.frames")
+        with open(path, "wb") as file:
+            file.write(frames_header("application/json"))
+            for routing_key in (MODEL_MENUS, MODEL_PERSON, MODEL_MENUS):
+                file.write(encode_frame(routing_key.encode(), b"{}"))
+
+        result = CliRunner().invoke(queue_replay, [path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        routes = [
+            (call.kwargs["routing_key"], call.kwargs["exchange"]) for call in channel.basic_publish.call_args_list
+        ]
+        self.assertEqual(
+            routes,
+            [(MODEL_MENUS, "test_exchange"), (MODEL_PERSON, "test_actor_exchange"), (MODEL_MENUS, "test_exchange")],
+        )
+        mock_get_connection_pool.return_value.channel.assert_any_call("test_actor_exchange")
+
+        channel.basic_publish.reset_mock()
+        result = CliRunner().invoke(queue_replay, [path, "--exchange", "replay"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual({call.kwargs["exchange"] for call in channel.basic_publish.call_args_list}, {"replay"})
+
+    def test_compressed_files_are_refused(self, mock_get_connection_pool, mock_load_dotenv):
+        channel = self._channel(mock_get_connection_pool)
+        path = os.path.join(self.directory.name, "menus.ndjson.gz")
+        with gzip.open(path, "wb") as file:
+            file.write(b'{"menu_name": "A"}\n')
+        result = CliRunner().invoke(queue_replay, [path, "--model", MODEL_MENUS])
+        self.assertEqual(result.exit_code, 2)
+        channel.basic_publish.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
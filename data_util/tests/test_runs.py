@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+
+from data_util.runs import (
+    derive_seed,
+    load_checkpoint,
+    parse_shard,
+    plan_run,
+    record_checkpoint,
+    shard_range,
+    split_count,
+    split_range,
+)
+
+
+class TestRuns(unittest.TestCase):
+    def test_split_count(self):
+        self.assertEqual(split_count(10, 3), [4, 3, 3])
+        self.assertEqual(split_count(2, 4), [1, 1, 0, 0])
+        self.assertEqual(sum(split_count(1000003, 7)), 1000003)
+
+    def test_derive_seed_is_deterministic(self):
+        self.assertEqual(derive_seed(42, 1), derive_seed(42, 1))
+        self.assertNotEqual(derive_seed(42, 1), derive_seed(42, 2))
+        self.assertNotEqual(derive_seed(42, 1), derive_seed(43, 1))
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ("4/4", "-1/4", "1/0", "1", "a/b"):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_shards_cover_the_run(self):
+        self.assertEqual([shard_range(10, 100, (index, 3)) for index in range(3)], [(100, 104), (104, 107), (107, 110)])
+        self.assertEqual(split_range(104, 107, 2), [(104, 106), (106, 107)])
+
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.directory.name, "run.checkpoint")
+        self.params = {"model": "franchises", "count": 10, "seed": None, "start_offset": 0}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_new_run_picks_a_seed_and_keeps_it(self):
+        params, progress = load_checkpoint(self.checkpoint, self.params)
+        self.assertIsNotNone(params["seed"])
+        self.assertEqual(progress, {})
+        self.assertEqual(load_checkpoint(self.checkpoint, self.params)[0], params)
+
+    def test_progress_is_the_furthest_record_per_part(self):
+        load_checkpoint(self.checkpoint, {**self.params, "seed": 7})
+        record_checkpoint(self.checkpoint, 0, 3)
+        record_checkpoint(self.checkpoint, 5, 8)
+        record_checkpoint(self.checkpoint, 0, 5)
+        self.assertEqual(load_checkpoint(self.checkpoint, self.params)[1], {0: 5, 5: 8})
+
+    def test_other_parameters_are_refused(self):
+        load_checkpoint(self.checkpoint, {**self.params, "seed": 7})
+        with self.assertRaisesRegex(ValueError, "count=10"):
+            load_checkpoint(self.checkpoint, {**self.params, "count": 20})
+        with self.assertRaisesRegex(ValueError, "seed=7"):
+            load_checkpoint(self.checkpoint, {**self.params, "seed": 8})
+
+    def test_plan_run_resumes_the_shard(self):
+        plan = plan_run({**self.params, "seed": 7}, "1/2", self.checkpoint)
+        self.assertEqual((plan.seed, plan.first, plan.start, plan.stop), (7, 5, 5, 10))
+        record_checkpoint(self.checkpoint, 5, 8)
+        self.assertEqual(plan_run(self.params, "1/2", self.checkpoint).start, 8)
+        with open(self.checkpoint) as file:
+            self.assertEqual(json.loads(file.readline())["params"]["shard"], "1/2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import math
+import tempfile
+import unittest
+
+from data_util.scheduler import RateProfile, TokenBucket, profile_from_options, run_schedule
+
+
+class FakeClock:
+    """A clock that only moves when slept on or when sending costs time."""
+
+    def __init__(self, send_cost=0.0):
+        self.now = 0.0
+        self.send_cost = send_cost
+        self.batches = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def send(self, count):
+        self.batches.append(count)
+        self.now += self.send_cost
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refills_from_elapsed_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, 5, clock, full=False)
+        self.assertEqual(bucket.take(1, 5), 0)
+        clock.sleep(0.35)
+        self.assertEqual(bucket.take(1, 5), 3)
+        self.assertAlmostEqual(bucket.time_until(1), 0.05)
+        clock.sleep(10)
+        self.assertEqual(bucket.take(1, 100), 5)
+
+    def test_minimum_batch(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, 10, clock, full=False)
+        clock.sleep(0.5)
+        self.assertEqual(bucket.take(10, 10), 0)
+        clock.sleep(0.5)
+        self.assertEqual(bucket.take(10, 10), 10)
+
+
+class TestRateProfile(unittest.TestCase):
+    def test_parse_segments(self):
+        profile = RateProfile.parse("ramp:0:100:10; step:10,20:5 # two steps\nsine:50:50:4:8;constant:7")
+        self.assertTrue(math.isinf(profile.duration))
+        self.assertAlmostEqual(profile.rate_at(5), 50)
+        self.assertEqual(profile.rate_at(12), 10)
+        self.assertEqual(profile.rate_at(16), 20)
+        self.assertAlmostEqual(profile.rate_at(21), 100)
+        self.assertAlmostEqual(profile.rate_at(23), 0)
+        self.assertEqual(profile.rate_at(1000), 7)
+
+    def test_parse_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as file:
+            file.write("# warm up\nconstant:10:60\nramp:10:20:60\n")
+            file.flush()
+            profile = RateProfile.parse(f"@{file.name}")
+        self.assertEqual(profile.duration, 120)
+        self.assertEqual(profile.rate_at(120), 0)
+
+    def test_invalid_specs(self):
+        for spec in ("", "burst:10", "ramp:10:20", "constant:fast", "constant:10;constant:20"):
+            with self.assertRaises(ValueError, msg=spec):
+                RateProfile.parse(spec)
+        with self.assertRaises(ValueError):
+            profile_from_options(10, "constant:10")
+        self.assertIsNone(profile_from_options())
+
+
+class TestRunSchedule(unittest.TestCase):
+    def _run(self, profile, total, clock, **kwargs):
+        return run_schedule(profile, clock.send, total, clock=clock, sleep=clock.sleep, **kwargs)
+
+    def test_constant_rate(self):
+        clock = FakeClock()
+        report = self._run(RateProfile.constant(100), 1000, clock, report_interval=2)
+        self.assertEqual(report.sent, 1000)
+        self.assertEqual(sum(clock.batches), 1000)
+        self.assertAlmostEqual(report.elapsed, 10, delta=0.2)
+        for _offset, target, achieved in report.intervals:
+            self.assertAlmostEqual(target, 100, delta=1)
+            self.assertAlmostEqual(achieved, 100, delta=10)
+
+    def test_slow_sends_do_not_lower_the_rate(self):
+        clock = FakeClock(send_cost=0.05)
+        report = self._run(RateProfile.constant(100), 1000, clock)
+        self.assertAlmostEqual(report.sent / report.elapsed, 100, delta=3)
+
+    def test_default_profile_sends_fixed_batches(self):
+        clock = FakeClock()
+        report = self._run(RateProfile.default(), 100, clock, min_batch=10, max_batch=10)
+        self.assertEqual(clock.batches, [10] * 10)
+        self.assertAlmostEqual(report.elapsed, 45, delta=0.2)
+
+    def test_stops_when_the_profile_ends(self):
+        clock = FakeClock()
+        report = self._run(RateProfile.parse("ramp:0:100:10"), 10000, clock)
+        self.assertAlmostEqual(report.sent, 500, delta=15)
+        self.assertAlmostEqual(report.elapsed, 10, delta=0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
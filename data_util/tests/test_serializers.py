@@ -0,0 +1,51 @@
+import importlib.util
+import json
+import unittest
+
+import pika
+
+from data_util.serializers import (
+    SERIALIZER_JSON,
+    SERIALIZER_MSGPACK,
+    SERIALIZER_ORJSON,
+    get_serializer,
+)
+
+RECORD = {"name": "Kantin Express", "address": "Ünter den Linden 1"}
+
+
+class TestSerializers(unittest.TestCase):
+    def test_json(self):
+        serializer = get_serializer(SERIALIZER_JSON)
+        self.assertEqual(json.loads(serializer.dumps(RECORD)), RECORD)
+        self.assertEqual(serializer.content_type, "application/json")
+
+    @unittest.skipUnless(importlib.util.find_spec("orjson"), "orjson is not installed")
+    def test_orjson(self):
+        serializer = get_serializer(SERIALIZER_ORJSON)
+        self.assertEqual(json.loads(serializer.dumps(RECORD)), RECORD)
+        self.assertEqual(serializer.content_type, "application/json")
+
+    @unittest.skipUnless(importlib.util.find_spec("msgpack"), "msgpack is not installed")
+    def test_msgpack(self):
+        import msgpack
+
+        serializer = get_serializer(SERIALIZER_MSGPACK)
+        self.assertEqual(msgpack.unpackb(serializer.dumps(RECORD)), RECORD)
+        self.assertEqual(serializer.content_type, "application/msgpack")
+
+    def test_unknown_serializer(self):
+        with self.assertRaises(ValueError):
+            get_serializer("pickle")
+
+    def test_properties_are_shared(self):
+        serializer = get_serializer(SERIALIZER_JSON)
+        properties = serializer.properties(persistent=True)
+        self.assertIs(serializer.properties(persistent=True), properties)
+        self.assertEqual(properties.delivery_mode, pika.DeliveryMode.Persistent.value)
+        self.assertEqual(properties.content_type, "application/json")
+        self.assertIsNone(serializer.properties().delivery_mode)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+
+from data_util.generators import (
+    GENERATOR_BATCH,
+    MODEL_FOOD_TYPES,
+    MODEL_MENU_ITEMS,
+    MODEL_PERSON,
+    generate_record_range,
+)
+from data_util.uniqueness import BloomFilter, suffixed, unique_record_range
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_added_keys_are_always_found(self):
+        key_filter = BloomFilter(5000)
+        keys = [f"key {index}" for index in range(5000)]
+        self.assertFalse(key_filter.add_many(keys).any())
+        self.assertTrue(key_filter.add_many(keys).all())
+        self.assertIn("key 42", key_filter)
+
+    def test_false_positive_rate(self):
+        key_filter = BloomFilter(20000, 0.01)
+        key_filter.add_many([f"key {index}" for index in range(20000)])
+        false_positives = sum(f"other {index}" in key_filter for index in range(10000))
+        self.assertLess(false_positives, 200)
+
+    def test_size_follows_capacity(self):
+        self.assertAlmostEqual(BloomFilter(1_000_000).nbytes / 1_000_000, 1.8, delta=0.01)
+        with self.assertRaises(ValueError):
+            BloomFilter(10, 0)
+
+
+class TestUniqueRecordRange(unittest.TestCase):
+    def test_suffixed(self):
+        self.assertEqual(suffixed("ann@example.com", 42), "ann+42@example.com")
+        self.assertEqual(suffixed("Fish and Chips", 1234), "Fish and Chips #1234")
+        self.assertEqual(suffixed("Chicken Stir Fry", 1234, 15), "Chicken S #1234")
+        self.assertEqual(suffixed("Fish and Chips", "b3"), "Fish and Chips #b3")
+
+    def test_keys_are_unique(self):
+        # There are far fewer dish types than records
+        records = list(unique_record_range(MODEL_FOOD_TYPES, 0, 500, 7))
+        names = [record["type_name"] for record in records]
+        self.assertEqual(len(set(names)), 500)
+        self.assertLessEqual(max(len(name) for name in names), 25)
+        emails = [record["email"] for record in unique_record_range(MODEL_PERSON, 0, 500, 7, GENERATOR_BATCH)]
+        self.assertEqual(len(set(emails)), 500)
+
+    def test_keys_are_unique_across_blocks(self):
+        names = [record["type_name"] for record in unique_record_range(MODEL_FOOD_TYPES, 0, 500, 7, block_size=50)]
+        self.assertEqual(len(set(names)), 500)
+        self.assertLessEqual(max(len(name) for name in names), 25)
+        self.assertTrue(any(name.endswith(" #b9") for name in names[450:]))
+        self.assertEqual(names[0], next(generate_record_range(MODEL_FOOD_TYPES, 0, 1, 7))["type_name"])
+
+    def test_parts_match_the_whole_range(self):
+        whole = list(unique_record_range(MODEL_FOOD_TYPES, 10, 300, 7, block_size=100))
+        parts = [*unique_record_range(MODEL_FOOD_TYPES, 10, 130, 7, block_size=100)]
+        parts += unique_record_range(MODEL_FOOD_TYPES, 130, 300, 7, block_size=100)
+        self.assertEqual(parts, whole)
+
+    def test_late_parts_only_regenerate_their_block(self):
+        generated = []
+
+        def counting_range(model, start, stop, *args):
+            generated.append(stop - start)
+            return generate_record_range(model, start, stop, *args)
+
+        with patch("data_util.uniqueness.generate_record_range", side_effect=counting_range):
+            records = list(unique_record_range(MODEL_FOOD_TYPES, 9950, 10000, 7, block_size=100))
+        self.assertEqual(len(records), 50)
+        self.assertEqual(sum(generated), 100)
+
+    def test_models_without_a_natural_key_are_unchanged(self):
+        self.assertEqual(
+            list(unique_record_range(MODEL_MENU_ITEMS, 5, 50, 7)),
+            list(generate_record_range(MODEL_MENU_ITEMS, 5, 50, 7)),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
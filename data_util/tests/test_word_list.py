@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+from random import Random
+
+from data_util.providers.FoodTypeProvider import DISH_TYPES_FILE, FoodTypeProvider
+from data_util.providers.word_list import WordList
+
+
+class TestWordList(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _csv(self, content: str) -> str:
+        path = os.path.join(self.directory.name, "words.csv")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def test_words_round_trip(self):
+        words = WordList(["Pho", "Crème brûlée", "", "Pad Thai"])
+        self.assertEqual(list(words), ["Pho", "Crème brûlée", "", "Pad Thai"])
+        self.assertEqual(words[-1], "Pad Thai")
+        self.assertFalse(words.weighted)
+        with self.assertRaises(IndexError):
+            words[4]
+
+    def test_single_row_csv(self):
+        words = WordList.from_csv(DISH_TYPES_FILE)
+        self.assertEqual(words[0], "Pizza")
+        self.assertIn("Mac and Cheese", list(words))
+        self.assertFalse(words.weighted)
+
+    def test_weighted_csv(self):
+        words = WordList.from_csv(self._csv("Ramen,3\nPho,0\nTacos,1\nPasta\n\n"))
+        self.assertEqual(list(words), ["Ramen", "Pho", "Tacos", "Pasta"])
+        self.assertTrue(words.weighted)
+        random = Random(7)
+        counts = Counter(words.sample(random) for _ in range(5000))
+        self.assertNotIn("Pho", counts)
+        self.assertAlmostEqual(counts["Ramen"] / 5000, 0.6, delta=0.03)
+
+    def test_two_words_are_not_a_weight(self):
+        self.assertEqual(list(WordList.from_csv(self._csv("Pizza,Burger\n"))), ["Pizza", "Burger"])
+
+    def test_invalid_weights(self):
+        for words in ([("Pho", -1)], [("Pho", 0), ("Ramen", 0)], [("Pho", float("nan"))]):
+            with self.assertRaises(ValueError):
+                WordList(words)
+
+    def test_sampling_follows_the_random(self):
+        words = WordList([("Pho", 1), ("Ramen", 2), ("Tacos", 3)])
+        first, second = Random(3), Random(3)
+        self.assertEqual([words.sample(first) for _ in range(10)], [words.sample(second) for _ in range(10)])
+
+
+class TestFoodTypeProvider(unittest.TestCase):
+    def test_custom_dish_types(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dish_types.csv")
+            with open(path, "w") as file:
+                file.write("Ramen,1\nPho,0\n")
+            provider = FoodTypeProvider(dish_types_file=path)
+        provider.seed_instance(5)
+        self.assertEqual({provider.dish_type() for _ in range(20)}, {"Ramen"})
+        self.assertIn(provider.cuisine(), ("Italian", "Chinese", "Indian", "Mexican", "Japanese"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""Unique natural keys for generated records, checked against a Bloom filter of bounded size."""
+
+import hashlib
+import logging
+import math
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+from data_util.generators import GENERATOR_FAKER, NATURAL_KEYS, generate_record_range
+
+logger = logging.getLogger(__name__)
+
+# With this false positive rate a filter takes about 14.4 bits, under 2 bytes, per key
+DEFAULT_FALSE_POSITIVE_RATE = 0.001
+# Keys checked against the filter at a time. Changing it can change which keys get a suffix.
+DEFAULT_UNIQUE_CHUNK_SIZE = 10000
+# Records whose keys are made unique together, by absolute record index. Changing it changes
+# the keys every seed produces.
+DEFAULT_UNIQUE_BLOCK_SIZE = 100000
+
+
+class BloomFilter:
+    """
+    A Bloom filter sized for a number of keys and a false positive rate.
+
+    Its memory use is fixed when it is created: -capacity * ln(rate) / ln(2)^2 bits,
+    about 86 MiB for 50 million keys at the default rate. Membership tests never miss a
+    key that was added, and wrongly report an absent key as present with about the given
+    probability once capacity keys were added. Keys are hashed with BLAKE2b, so a filter
+    fills the same way in every process, and checked in NumPy batches.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE):
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(f"Invalid false positive rate {false_positive_rate}")
+        capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the filter's bit array."""
+        return self._bits.nbytes
+
+    def _positions(self, keys: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        # Double hashing: k positions per key from the two halves of one 128-bit digest
+        digests = b"".join(hashlib.blake2b(key.encode(), digest_size=16).digest() for key in keys)
+        halves = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        positions = (halves[:, :1] + (halves[:, 1:] | np.uint64(1)) * steps) % np.uint64(self.size)
+        return positions >> np.uint64(3), (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+
+    def add_many(self, keys: list[str]) -> np.ndarray:
+        """
+        Add keys, returning whether each may have been added before.
+
+        Only keys added by earlier calls count, so duplicates within keys are not reported.
+        """
+        if not keys:
+            return np.zeros(0, dtype=bool)
+        indexes, masks = self._positions(keys)
+        present = (self._bits[indexes] & masks).all(axis=1)
+        np.bitwise_or.at(self._bits, indexes.ravel(), masks.ravel())
+        return present
+
+    def __contains__(self, key: str) -> bool:
+        indexes, masks = self._positions([key])
+        return bool((self._bits[indexes] & masks).all())
+
+
+def suffixed(key: str, tag: int | str, max_length: int = None) -> str:
+    """
+    Make a key unique by a tag, such as the index of its record, which is unique within a run.
+
+    Emails get the tag as a +tag ("name+42@example.com"); other keys end with " #42",
+    with the key shortened so the result fits in max_length.
+    """
+    local, at, domain = key.rpartition("@")
+    if at:
+        return f"{local}+{tag}@{domain}"
+    suffix = f" #{tag}"
+    if max_length is not None:
+        key = key[: max(max_length - len(suffix), 0)]
+    return f"{key}{suffix}"
+
+
+def _block_key(key: str, block: int, index: int, max_length: int = None) -> str:
+    # Keys of the first block keep their form. Later blocks tag theirs with the block number,
+    # unless the key would have to be shortened, which could make two tagged keys equal.
+    if block == 0:
+        return key
+    tagged = suffixed(key, f"b{block}")
+    if max_length is not None and len(tagged) > max_length:
+        return suffixed(key, index, max_length)
+    return tagged
+
+
+def unique_keys(
+    records: Iterable[dict[str, Any]],
+    model: str,
+    start: int,
+    key_filter: BloomFilter,
+    block: int = 0,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield the records of one block of a run, from record start on, with their natural key made unique.
+
+    The first key of each value in a block is tagged with the block number ("name #b3"),
+    except in block 0, where it is kept as it is. A key that key_filter may have seen
+    before in the block is suffixed with its record's index instead ("name #42"). Generated
+    keys never hold " #" or a +tag, so tagged and suffixed keys are unique across the run.
+    False positives only cost a key its first form. Keys are checked in chunks of
+    DEFAULT_UNIQUE_CHUNK_SIZE records from start, so the same records always get the same keys.
+    """
+    field, max_length = NATURAL_KEYS[model]
+    suffixes = 0
+    iterator = iter(records)
+    index = start
+    while chunk := list(islice(iterator, DEFAULT_UNIQUE_CHUNK_SIZE)):
+        keys = [record[field] for record in chunk]
+        present = key_filter.add_many(keys).tolist()
+        seen = set()
+        for offset, (record, key) in enumerate(zip(chunk, keys)):
+            if present[offset] or key in seen:
+                record[field] = suffixed(key, index + offset, max_length)
+                suffixes += 1
+            else:
+                record[field] = _block_key(key, block, index + offset, max_length)
+            seen.add(key)
+        index += len(chunk)
+        yield from chunk
+    logger.debug("Suffixed %s %s values", suffixes, field)
+
+
+def unique_record_range(  # noqa: PLR0913
+    model: str,
+    start: int,
+    stop: int,
+    seed: int,
+    generator: str = GENERATOR_FAKER,
+    block_size: int = DEFAULT_UNIQUE_BLOCK_SIZE,
+    false_positive_rate: float = DEFAULT_FALSE_POSITIVE_RATE,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield records start to stop - 1 of a seeded run, with natural keys unique among all its records.
+
+    Keys are made unique within blocks of block_size records by absolute record index, each
+    with its own filter and key space, so a record's key only depends on the seed and its
+    index. Any split of a run into workers, shards or resumed parts, and any start offset,
+    yields the same unique keys. Only the records from the start of start's block up to
+    start are generated again to fill the filter, fewer than block_size. Models without a
+    natural key are yielded as they are.
+    """
+    if model not in NATURAL_KEYS:
+        yield from generate_record_range(model, start, stop, seed, generator)
+        return
+
+    first = start - start % block_size
+    key_filter = BloomFilter(block_size, false_positive_rate)
+    logger.info(
+        "Checking keys for uniqueness in blocks of %s records with a %.1f MiB filter",
+        block_size,
+        key_filter.nbytes / 2**20,
+    )
+    for block_start in range(first, stop, block_size):
+        if block_start > first:
+            key_filter = BloomFilter(block_size, false_positive_rate)
+        block_stop = min(block_start + block_size, stop)
+        records = generate_record_range(model, block_start, block_stop, seed, generator)
+        records = unique_keys(records, model, block_start, key_filter, block_start // block_size)
+        yield from islice(records, max(start - block_start, 0), None)
+
+
+def record_range(  # noqa: PLR0913
+    model: str,
+    start: int,
+    stop: int,
+    seed: int,
+    generator: str = GENERATOR_FAKER,
+    unique: bool = False,
+) -> Iterator[dict[str, Any]]:
+    """Yield records start to stop - 1 of a seeded run, from unique_record_range when unique is set."""
+    if unique:
+        return unique_record_range(model, start, stop, seed, generator)
+    return generate_record_range(model, start, stop, seed, generator)
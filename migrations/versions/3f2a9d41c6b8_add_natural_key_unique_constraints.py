@@ -0,0 +1,56 @@
+"""Add unique constraints on the natural keys of franchises and food types
+
+Revision ID: 3f2a9d41c6b8
+Revises: 9c1b0e7ff143
+Create Date: 2026-10-18 14:40:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+from alembic.util import CommandError
+
+# revision identifiers, used by Alembic.
+revision: str = "3f2a9d41c6b8"
+down_revision: Union[str, None] = "9c1b0e7ff143"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Number of duplicated names listed when the upgrade refuses to run
+MAXIMUM_LISTED_DUPLICATES = 20
+
+
+def _check_no_duplicates(table: str, column: str) -> None:
+    # Duplicates are left for the operator to resolve rather than deleted here
+    if context.is_offline_mode():
+        return
+    duplicates = (
+        op.get_bind()
+        .execute(
+            sa.text(f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column} HAVING COUNT(*) > 1 ORDER BY {column}")
+        )
+        .all()
+    )
+    if not duplicates:
+        return
+    listed = ", ".join(f"{name!r} ({count} rows)" for name, count in duplicates[:MAXIMUM_LISTED_DUPLICATES])
+    if len(duplicates) > MAXIMUM_LISTED_DUPLICATES:
+        listed += f" and {len(duplicates) - MAXIMUM_LISTED_DUPLICATES} more"
+    raise CommandError(
+        f"Cannot add a unique constraint on {table}.{column}: {len(duplicates)} values are duplicated: {listed}. "
+        "Rename or delete the duplicate rows and run the upgrade again."
+    )
+
+
+def upgrade() -> None:
+    _check_no_duplicates("franchises", "franchise_name")
+    _check_no_duplicates("food_types", "type_name")
+    op.create_unique_constraint("uq_franchises_franchise_name", "franchises", ["franchise_name"])
+    op.create_unique_constraint("uq_food_types_type_name", "food_types", ["type_name"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_food_types_type_name", "food_types", type_="unique")
+    op.drop_constraint("uq_franchises_franchise_name", "franchises", type_="unique")